@@ -0,0 +1,152 @@
+"""
+In-process timeline index of annotations for video scrubbing.
+
+Replay and AnnotatedVideoExport seek by recording time, often many times a
+second while the scrub bar moves. For recently used meetings the index
+keeps every stored annotation row sorted by (timestamp_ms, id), so a seek
+is a bisect plus a short scan instead of a database round trip. Meetings
+are loaded on first use and evicted least-recently-used; rows written by
+this process's AnnotationWriter are added as they are committed.
+
+Nothing else invalidates a loaded meeting, so rows written by another
+worker, a migration or a script are missing until it is evicted, and
+every row is held with its content. The index is therefore off by
+default (ANNOTATION_INDEX_MEETINGS=0); enable it only when one process
+writes all annotations.
+"""
+import asyncio
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlmodel import select
+
+from backend.config import settings
+from backend.models.annotations import Annotation
+
+# (timestamp_ms, id)
+TimelineKey = Tuple[int, int]
+
+STORED_FIELDS = (
+    "id", "meeting_id", "participant_id", "annotation_type",
+    "content", "content_packed", "timestamp_ms", "created_at",
+)
+
+
+class _MeetingTimeline:
+    def __init__(self):
+        self.keys: List[TimelineKey] = []
+        self.rows: List[dict] = []
+
+    def add(self, row: dict):
+        key = (row["timestamp_ms"], row["id"])
+        position = bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            return
+        self.keys.insert(position, key)
+        self.rows.insert(position, row)
+
+
+class AnnotationTimeIndex:
+    def __init__(self, max_meetings: Optional[int] = None):
+        self.max_meetings = settings.ANNOTATION_INDEX_MEETINGS if max_meetings is None else max_meetings
+        self._meetings: "OrderedDict[int, _MeetingTimeline]" = OrderedDict()
+        # meeting_id -> load in progress, and rows written while it runs
+        self._loading: Dict[int, asyncio.Future] = {}
+        self._written_during_load: Dict[int, List[dict]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_meetings > 0
+
+    def add(self, rows: List[dict]):
+        """Record freshly committed annotation rows"""
+        for row in rows:
+            meeting_id = row["meeting_id"]
+            if meeting_id in self._loading:
+                self._written_during_load[meeting_id].append(row)
+            timeline = self._meetings.get(meeting_id)
+            if timeline is not None:
+                timeline.add(row)
+
+    def evict(self, meeting_id: int):
+        self._meetings.pop(meeting_id, None)
+
+    async def query(
+        self,
+        db,
+        meeting_id: int,
+        from_ms: Optional[int] = None,
+        to_ms: Optional[int] = None,
+        annotation_type: Optional[str] = None,
+        participant_id: Optional[int] = None,
+        after: Optional[TimelineKey] = None,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        """Stored rows in (timestamp_ms, id) order matching the filters, at most ``limit``"""
+        timeline = await self._timeline(db, meeting_id)
+
+        start = 0
+        if from_ms is not None:
+            start = bisect_left(timeline.keys, (from_ms, -1))
+        if after is not None:
+            start = max(start, bisect_left(timeline.keys, (after[0], after[1] + 1)))
+
+        matches = []
+        for position in range(start, len(timeline.keys)):
+            if to_ms is not None and timeline.keys[position][0] > to_ms:
+                break
+            row = timeline.rows[position]
+            if annotation_type is not None and row["annotation_type"] != annotation_type:
+                continue
+            if participant_id is not None and row["participant_id"] != participant_id:
+                continue
+            matches.append(row)
+            if limit is not None and len(matches) >= limit:
+                break
+        return matches
+
+    async def _timeline(self, db, meeting_id: int) -> _MeetingTimeline:
+        timeline = self._meetings.get(meeting_id)
+        if timeline is not None:
+            self._meetings.move_to_end(meeting_id)
+            return timeline
+
+        pending = self._loading.get(meeting_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[meeting_id] = future
+        self._written_during_load[meeting_id] = []
+        try:
+            columns = [getattr(Annotation, field) for field in STORED_FIELDS]
+            result = await db.exec(
+                select(*columns)
+                .where(Annotation.meeting_id == meeting_id)
+                .order_by(Annotation.timestamp_ms, Annotation.id)
+            )
+            timeline = _MeetingTimeline()
+            for row in result:
+                timeline.keys.append((row.timestamp_ms, row.id))
+                timeline.rows.append(dict(zip(STORED_FIELDS, row)))
+            for row in self._written_during_load[meeting_id]:
+                timeline.add(row)
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieve it so waiter-less failures are not reported as unhandled
+            future.exception()
+            raise
+        finally:
+            del self._loading[meeting_id]
+            del self._written_during_load[meeting_id]
+
+        self._meetings[meeting_id] = timeline
+        while len(self._meetings) > self.max_meetings:
+            self._meetings.popitem(last=False)
+        future.set_result(timeline)
+        return timeline
+
+
+# Global annotation timeline index
+annotation_index = AnnotationTimeIndex()
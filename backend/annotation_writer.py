@@ -0,0 +1,169 @@
+"""
+Group-commit writer for canvas annotations.
+
+Drawing sessions produce many small annotation writes. Instead of one
+INSERT + COMMIT per stroke, callers hand rows to the writer, which waits a
+short window for concurrent requests, then writes everything pending with
+one multi-row INSERT ... RETURNING in a single transaction.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from backend.annotation_index import annotation_index
+from backend.config import settings
+from backend.models.annotations import Annotation, AnnotationCreate
+from backend.utils.annotation_codec import encode_content
+
+logger = logging.getLogger(__name__)
+
+# (rows of one request, future resolved with those rows and their ids)
+_Pending = Tuple[List[dict], asyncio.Future]
+
+
+def annotation_row(meeting_id: int, annotation: AnnotationCreate) -> dict:
+    """Build the insert row for an AnnotationCreate posted to a meeting"""
+    now = datetime.utcnow()
+    content, content_packed = encode_content(
+        annotation.annotation_type,
+        annotation.content,
+        settings.ANNOTATION_COMPRESSION,
+        settings.ANNOTATION_COMPRESSION_LEVEL,
+    )
+    return {
+        "meeting_id": meeting_id,
+        "participant_id": annotation.participant_id,
+        "annotation_type": annotation.annotation_type,
+        "content": content,
+        "content_packed": content_packed,
+        "timestamp_ms": annotation.timestamp_ms,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+class AnnotationWriter:
+    def __init__(self, window_ms: Optional[float] = None, max_batch: Optional[int] = None):
+        self.window = (settings.ANNOTATION_COMMIT_WINDOW_MS if window_ms is None else window_ms) / 1000
+        self.max_batch = max_batch or settings.ANNOTATION_BATCH_MAX
+        self._engine = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.batches_written = 0
+        self.rows_written = 0
+
+    def start(self, engine=None):
+        """Start the writer task on the running event loop"""
+        if engine is None:
+            from backend.database import async_write_engine
+            engine = async_write_engine
+        self._engine = engine
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write whatever is pending and stop the writer task"""
+        if self._task is not None and not self._task.done():
+            self._queue.put_nowait(None)
+            await self._task
+        self._task = None
+
+    async def write(self, rows: List[dict]) -> List[dict]:
+        """Queue rows for the next group commit and wait until they are durable.
+
+        Returns the rows with their assigned ``id``, ready for AnnotationRead.
+        """
+        if not rows:
+            return []
+        if self._task is None or self._task.done() or self._loop is not asyncio.get_running_loop():
+            self.start(self._engine)
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((rows, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            if self.window > 0:
+                await asyncio.sleep(self.window)
+
+            pending: List[_Pending] = [item]
+            count = len(item[0])
+            stopping = False
+            while count < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                pending.append(item)
+                count += len(item[0])
+
+            await self._commit(pending)
+            if stopping:
+                return
+
+    async def _commit(self, pending: List[_Pending]):
+        rows = [row for request_rows, _ in pending for row in request_rows]
+        try:
+            ids = await self._insert(rows)
+        except Exception as e:
+            if len(pending) == 1:
+                self._resolve(pending[0], exception=e)
+                return
+            # Retry one request at a time so a bad row only fails its own request
+            logger.warning(f"Group commit of {len(rows)} annotations failed, retrying per request: {e}")
+            for entry in pending:
+                try:
+                    self._resolve(entry, ids=await self._insert(entry[0]))
+                except Exception as request_error:
+                    self._resolve(entry, exception=request_error)
+            return
+
+        offset = 0
+        for entry in pending:
+            size = len(entry[0])
+            self._resolve(entry, ids=ids[offset:offset + size])
+            offset += size
+
+    async def _insert(self, rows: List[dict]) -> List[int]:
+        # Ordered RETURNING makes SQLite fall back to one statement per row.
+        # It is not needed there: inside the write transaction each new rowid
+        # is max(rowid) + 1, so sorting the ids restores insertion order.
+        is_sqlite = self._engine.dialect.name == "sqlite"
+        async with self._engine.begin() as conn:
+            result = await conn.execute(
+                insert(Annotation).returning(Annotation.id, sort_by_parameter_order=not is_sqlite),
+                rows,
+            )
+            ids = list(result.scalars())
+        if is_sqlite:
+            ids.sort()
+        self.batches_written += 1
+        self.rows_written += len(rows)
+        return ids
+
+    @staticmethod
+    def _resolve(entry: _Pending, ids: Optional[List[int]] = None, exception: Optional[Exception] = None):
+        rows, future = entry
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            stored = [{"id": annotation_id, **row} for annotation_id, row in zip(ids, rows)]
+            annotation_index.add(stored)
+            future.set_result(stored)
+
+
+# Global annotation writer instance
+annotation_writer = AnnotationWriter()
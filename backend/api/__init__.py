@@ -9,6 +9,7 @@ from backend.api.stats import router as stats_router
 from backend.api.websocket import router as websocket_router
 from backend.api.webrtc import router as webrtc_router
 from backend.api.invitations import router as invitations_router
+from backend.api.diagnostics import router as diagnostics_router
 
 api_router = APIRouter()
 
@@ -22,4 +23,5 @@ api_router.include_router(decisions_router, prefix="/decisions", tags=["decision
 api_router.include_router(stats_router, prefix="/stats", tags=["stats"])
 api_router.include_router(websocket_router, prefix="/ws", tags=["websocket"])
 api_router.include_router(webrtc_router, prefix="/webrtc", tags=["webrtc"])
-api_router.include_router(invitations_router, prefix="/invitations", tags=["invitations"])
\ No newline at end of file
+api_router.include_router(invitations_router, prefix="/invitations", tags=["invitations"])
+api_router.include_router(diagnostics_router, prefix="/diagnostics", tags=["diagnostics"])
\ No newline at end of file
@@ -1,39 +1,111 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import tuple_
+from types import SimpleNamespace
+from typing import List, Optional, Tuple
 from backend.models.annotations import Annotation, AnnotationCreate, AnnotationRead
-from backend.database import get_db
+from backend.database import get_async_session
+from backend.annotation_writer import annotation_writer, annotation_row
+from backend.annotation_index import annotation_index
+from backend.config import settings
+from backend.utils.annotation_codec import BINARY_MEDIA_TYPE, pack_annotation_records
 from backend.utils.auth import get_current_active_user
 
 router = APIRouter()
 
 @router.post("/meetings/{meeting_id}", response_model=AnnotationRead)
-def create_annotation(
+async def create_annotation(
     meeting_id: int,
     annotation: AnnotationCreate,
-    db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Create a new annotation"""
     # In a real implementation, you would check if the user has the token
-    db_annotation = Annotation(
-        meeting_id=meeting_id,
-        participant_id=annotation.participant_id,
-        annotation_type=annotation.annotation_type,
-        content=annotation.content,
-        timestamp_ms=annotation.timestamp_ms
-    )
-    db.add(db_annotation)
-    db.commit()
-    db.refresh(db_annotation)
-
-    return db_annotation
+    created = await annotation_writer.write([annotation_row(meeting_id, annotation)])
+    return created[0]
+
+@router.post("/meetings/{meeting_id}/batch", response_model=List[AnnotationRead])
+async def create_annotations_batch(
+    meeting_id: int,
+    annotations: List[AnnotationCreate],
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Create several annotations with a single multi-row insert"""
+    if not annotations:
+        raise HTTPException(status_code=400, detail="No annotations to create")
+    if len(annotations) > settings.ANNOTATION_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {settings.ANNOTATION_BATCH_MAX} annotations per batch")
+
+    return await annotation_writer.write([annotation_row(meeting_id, annotation) for annotation in annotations])
+
+def parse_timeline_cursor(cursor: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Parse a ``cursor=<timestamp_ms>,<id>`` pagination cursor"""
+    if not cursor:
+        return None
+    try:
+        timestamp_ms, annotation_id = cursor.split(",")
+        return int(timestamp_ms), int(annotation_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor, expected <timestamp_ms>,<id>")
 
 @router.get("/meetings/{meeting_id}", response_model=List[AnnotationRead])
-def get_annotations(
+async def get_annotations(
     meeting_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    from_ms: Optional[int] = None,
+    to_ms: Optional[int] = None,
+    annotation_type: Optional[str] = Query(None, alias="type"),
+    participant_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    cursor: Optional[str] = None,
+    response_format: str = Query("json", alias="format"),
+    db: AsyncSession = Depends(get_async_session),
     current_user: dict = Depends(get_current_active_user)
 ):
-    """Get all annotations for a meeting"""
-    return db.query(Annotation).filter(Annotation.meeting_id == meeting_id).all()
\ No newline at end of file
+    """Get the annotations of a meeting in recording-time order.
+
+    ``from_ms``/``to_ms`` select an inclusive window of the recording,
+    ``type`` and ``participant_id`` filter, and ``limit`` pages the result;
+    the next page's ``cursor`` is returned in the X-Next-Cursor header.
+    ``format=binary`` returns the stored records in the compact binary list
+    format (see annotation_codec) instead of decoding them to JSON.
+    """
+    if response_format not in ("json", "binary"):
+        raise HTTPException(status_code=400, detail="Unsupported format, use json or binary")
+    after = parse_timeline_cursor(cursor)
+    fetch = limit + 1 if limit is not None else None
+
+    if annotation_index.enabled:
+        annotations = await annotation_index.query(
+            db, meeting_id, from_ms, to_ms, annotation_type, participant_id, after, fetch
+        )
+    else:
+        statement = select(Annotation).where(Annotation.meeting_id == meeting_id)
+        if from_ms is not None:
+            statement = statement.where(Annotation.timestamp_ms >= from_ms)
+        if to_ms is not None:
+            statement = statement.where(Annotation.timestamp_ms <= to_ms)
+        if annotation_type is not None:
+            statement = statement.where(Annotation.annotation_type == annotation_type)
+        if participant_id is not None:
+            statement = statement.where(Annotation.participant_id == participant_id)
+        if after is not None:
+            statement = statement.where(tuple_(Annotation.timestamp_ms, Annotation.id) > tuple_(*after))
+        statement = statement.order_by(Annotation.timestamp_ms, Annotation.id)
+        if fetch is not None:
+            statement = statement.limit(fetch)
+        annotations = (await db.exec(statement)).all()
+
+    headers = {}
+    if limit is not None and len(annotations) > limit:
+        annotations = annotations[:limit]
+        last = annotations[-1]
+        last_id, last_ms = (last["id"], last["timestamp_ms"]) if isinstance(last, dict) else (last.id, last.timestamp_ms)
+        headers["X-Next-Cursor"] = f"{last_ms},{last_id}"
+
+    if response_format == "binary":
+        records = [SimpleNamespace(**row) if isinstance(row, dict) else row for row in annotations]
+        return Response(content=pack_annotation_records(records), media_type=BINARY_MEDIA_TYPE, headers=headers)
+    response.headers.update(headers)
+    return annotations
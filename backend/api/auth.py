@@ -3,24 +3,31 @@ from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
 from typing import Annotated
 from pydantic import BaseModel
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from backend.utils.auth import (
     create_access_token,
     get_current_active_user,
     Token,
     User,
-    hash_password,
-    verify_password,
     validate_password
 )
 from backend.config import settings
+from backend.password_hasher import password_hasher, PasswordHasherBusy
 from backend.models.users import User as DBUser
-from backend.database import get_session, get_db
+from backend.database import get_async_session
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+def _too_many_logins() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many logins in progress, please retry",
+        headers={"Retry-After": "1"},
+    )
+
 class UserCreate(BaseModel):
     email: str
     password: str
@@ -29,7 +36,7 @@ class UserCreate(BaseModel):
 @router.post("/token", response_model=Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ):
     """
     Login endpoint that validates credentials against the database
@@ -38,7 +45,7 @@ async def login_for_access_token(
     statement = select(DBUser).where(
         (DBUser.email == form_data.username) | (DBUser.username == form_data.username)
     )
-    db_user = db.exec(statement).first()
+    db_user = (await db.exec(statement)).first()
     
     if not db_user:
         logger.warning(f"Login failed: user {form_data.username} not found")
@@ -48,8 +55,16 @@ async def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Hand the connection back to the pool before the slow password check
+    await db.close()
+
     # Verify password
-    if not verify_password(form_data.password, db_user.hashed_password):
+    try:
+        password_valid = await password_hasher.verify(form_data.password, db_user.hashed_password)
+    except PasswordHasherBusy:
+        logger.warning("Login rejected: password hasher saturated")
+        raise _too_many_logins()
+    if not password_valid:
         logger.warning(f"Login failed: invalid password for user {form_data.username}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -78,10 +93,10 @@ async def login_for_access_token(
 @router.get("/users/me/", response_model=dict)
 async def read_users_me(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ):
     """Get current user info"""
-    db_user = db.get(DBUser, current_user.id)
+    db_user = await db.get(DBUser, current_user.id)
     if not db_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -96,13 +111,13 @@ async def read_users_me(
     }
 
 @router.post("/signup")
-async def signup(user_data: UserCreate, db: Session = Depends(get_session)):
+async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_async_session)):
     """
     Register a new user with email validation and password hashing
     """
     # Check if email already exists
     statement = select(DBUser).where(DBUser.email == user_data.email)
-    existing_user = db.exec(statement).first()
+    existing_user = (await db.exec(statement)).first()
 
     if existing_user:
         logger.warning(f"Signup failed: email {user_data.email} already registered")
@@ -127,12 +142,17 @@ async def signup(user_data: UserCreate, db: Session = Depends(get_session)):
     # Ensure username is unique
     counter = 1
     original_username = username
-    while db.exec(select(DBUser).where(DBUser.username == username)).first():
+    while (await db.exec(select(DBUser).where(DBUser.username == username))).first():
         username = f"{original_username}{counter}"
         counter += 1
 
-    # Hash the password
-    hashed_password = hash_password(user_data.password)
+    # Hash the password (the connection goes back to the pool meanwhile)
+    await db.close()
+    try:
+        hashed_password = await password_hasher.hash(user_data.password)
+    except PasswordHasherBusy:
+        logger.warning("Signup rejected: password hasher saturated")
+        raise _too_many_logins()
 
     # Create new user
     new_user = DBUser(
@@ -145,8 +165,8 @@ async def signup(user_data: UserCreate, db: Session = Depends(get_session)):
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     # Create JWT token for auto-login after signup
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
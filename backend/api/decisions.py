@@ -1,17 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List
 from backend.models.decisions import Decision, DecisionCreate, DecisionRead
-from backend.database import get_db
+from backend.database import get_async_session
 from backend.utils.auth import get_current_active_user
 
 router = APIRouter()
 
 @router.post("/meetings/{meeting_id}", response_model=DecisionRead)
-def create_decision(
+async def create_decision(
     meeting_id: int,
     decision: DecisionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Create a new decision"""
@@ -23,16 +24,16 @@ def create_decision(
         phase=decision.phase
     )
     db.add(db_decision)
-    db.commit()
-    db.refresh(db_decision)
+    await db.commit()
+    await db.refresh(db_decision)
 
     return db_decision
 
 @router.get("/meetings/{meeting_id}", response_model=List[DecisionRead])
-def get_decisions(
+async def get_decisions(
     meeting_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Get all decisions for a meeting"""
-    return db.query(Decision).filter(Decision.meeting_id == meeting_id).all()
\ No newline at end of file
+    return (await db.exec(select(Decision).where(Decision.meeting_id == meeting_id))).all()
\ No newline at end of file
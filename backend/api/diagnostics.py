@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from backend.diagnostics import profiler, stall_detector
+from backend.utils.auth import get_current_admin_user
+
+router = APIRouter()
+
+@router.get("/")
+async def get_diagnostics(current_user: dict = Depends(get_current_admin_user)):
+    """State of the stall detector and the profiler"""
+    return {
+        "stall_detector": {
+            "running": stall_detector.running,
+            "threshold_ms": stall_detector.threshold * 1000,
+            "stalls": stall_detector.stall_count,
+        },
+        "profiler": {
+            "running": profiler.running,
+            "interval_ms": profiler.interval * 1000,
+            "samples": profiler.samples,
+            "started_at": profiler.started_at.isoformat() if profiler.running else None,
+        },
+    }
+
+@router.get("/stalls")
+async def get_stalls(current_user: dict = Depends(get_current_admin_user)):
+    """Recent event-loop stalls with the stack that was blocking, newest last"""
+    return list(stall_detector.stalls)
+
+@router.post("/stall-detector/start")
+async def start_stall_detector(
+    threshold_ms: Optional[float] = None,
+    current_user: dict = Depends(get_current_admin_user)
+):
+    """Start watching the event loop for stalls over threshold_ms"""
+    if threshold_ms is not None and threshold_ms <= 0:
+        raise HTTPException(status_code=400, detail="threshold_ms must be positive")
+    stall_detector.start(threshold_ms)
+    return {"running": True, "threshold_ms": stall_detector.threshold * 1000}
+
+@router.post("/stall-detector/stop")
+async def stop_stall_detector(current_user: dict = Depends(get_current_admin_user)):
+    await stall_detector.stop()
+    return {"running": False, "stalls": stall_detector.stall_count}
+
+@router.post("/profiler/start")
+async def start_profiler(
+    interval_ms: Optional[float] = None,
+    current_user: dict = Depends(get_current_admin_user)
+):
+    """Start sampling the stacks of every thread every interval_ms"""
+    if interval_ms is not None and interval_ms <= 0:
+        raise HTTPException(status_code=400, detail="interval_ms must be positive")
+    if profiler.running:
+        raise HTTPException(status_code=409, detail="Profiler is already running")
+    profiler.start(interval_ms)
+    return {"running": True, "interval_ms": profiler.interval * 1000}
+
+@router.post("/profiler/stop")
+async def stop_profiler(current_user: dict = Depends(get_current_admin_user)):
+    """Stop the profiler and write the collapsed stacks for a flame graph"""
+    if not profiler.running:
+        raise HTTPException(status_code=409, detail="Profiler is not running")
+    path = profiler.stop()
+    return {"running": False, "path": path, "samples": profiler.samples, "stacks": len(profiler.stacks)}
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List
 import secrets
 from datetime import datetime
@@ -8,7 +9,7 @@ from backend.models.invitations import Invitation
 from backend.models.meetings import Meeting
 from backend.models.users import User as DBUser
 from backend.models.participants import Participant
-from backend.database import get_session
+from backend.database import get_async_session
 from backend.utils.auth import get_current_active_user
 
 router = APIRouter()
@@ -18,14 +19,13 @@ async def invite_to_meeting(
     meeting_id: int,
     email: str,
     role: str = "participant",
-    current_user: DBUser = Depends(get_current_active_user)
+    current_user: DBUser = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_async_session)
 ):
-    session = get_session()
-
     # Vérifier que la réunion existe
-    meeting = session.exec(
+    meeting = (await session.exec(
         select(Meeting).where(Meeting.id == meeting_id)
-    ).first()
+    )).first()
 
     if not meeting:
         raise HTTPException(
@@ -50,8 +50,8 @@ async def invite_to_meeting(
     )
 
     session.add(invitation)
-    session.commit()
-    session.refresh(invitation)
+    await session.commit()
+    await session.refresh(invitation)
 
     # Dans une implémentation complète, envoyez un email ici
     # Pour l'instant, nous retournons simplement les informations
@@ -70,14 +70,13 @@ async def invite_to_meeting(
 
 @router.get("/invitations")
 async def get_user_invitations(
-    current_user: DBUser = Depends(get_current_active_user)
+    current_user: DBUser = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_async_session)
 ):
-    session = get_session()
-
     # Récupérer toutes les invitations pour cet utilisateur
-    invitations = session.exec(
+    invitations = (await session.exec(
         select(Invitation).where(Invitation.email == current_user.email)
-    ).all()
+    )).all()
 
     return {
         "invitations": [
@@ -96,12 +95,13 @@ async def get_user_invitations(
     }
 
 @router.get("/invitations/{invitation_token}")
-async def get_invitation_by_token(invitation_token: str):
-    session = get_session()
-
-    invitation = session.exec(
+async def get_invitation_by_token(
+    invitation_token: str,
+    session: AsyncSession = Depends(get_async_session)
+):
+    invitation = (await session.exec(
         select(Invitation).where(Invitation.token == invitation_token)
-    ).first()
+    )).first()
 
     if not invitation:
         raise HTTPException(
@@ -122,13 +122,12 @@ async def get_invitation_by_token(invitation_token: str):
 @router.post("/invitations/{invitation_token}/accept")
 async def accept_invitation(
     invitation_token: str,
-    current_user: DBUser = Depends(get_current_active_user)
+    current_user: DBUser = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_async_session)
 ):
-    session = get_session()
-
-    invitation = session.exec(
+    invitation = (await session.exec(
         select(Invitation).where(Invitation.token == invitation_token)
-    ).first()
+    )).first()
 
     if not invitation:
         raise HTTPException(
@@ -162,7 +161,7 @@ async def accept_invitation(
     )
 
     session.add(participant)
-    session.commit()
+    await session.commit()
 
     return {
         "message": "Invitation accepted successfully",
@@ -180,13 +179,12 @@ async def accept_invitation(
 @router.post("/invitations/{invitation_token}/decline")
 async def decline_invitation(
     invitation_token: str,
-    current_user: DBUser = Depends(get_current_active_user)
+    current_user: DBUser = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_async_session)
 ):
-    session = get_session()
-
-    invitation = session.exec(
+    invitation = (await session.exec(
         select(Invitation).where(Invitation.token == invitation_token)
-    ).first()
+    )).first()
 
     if not invitation:
         raise HTTPException(
@@ -210,8 +208,8 @@ async def decline_invitation(
     invitation.status = "declined"
     invitation.updated_at = datetime.utcnow()
 
-    session.commit()
-    session.refresh(invitation)
+    await session.commit()
+    await session.refresh(invitation)
 
     return {
         "message": "Invitation declined successfully",
@@ -224,14 +222,13 @@ async def decline_invitation(
 @router.get("/meetings/{meeting_id}/invitations")
 async def get_meeting_invitations(
     meeting_id: int,
-    current_user: DBUser = Depends(get_current_active_user)
+    current_user: DBUser = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_async_session)
 ):
-    session = get_session()
-
     # Vérifier que la réunion existe
-    meeting = session.exec(
+    meeting = (await session.exec(
         select(Meeting).where(Meeting.id == meeting_id)
-    ).first()
+    )).first()
 
     if not meeting:
         raise HTTPException(
@@ -240,9 +237,9 @@ async def get_meeting_invitations(
         )
 
     # Récupérer les invitations pour cette réunion
-    invitations = session.exec(
+    invitations = (await session.exec(
         select(Invitation).where(Invitation.meeting_id == meeting_id)
-    ).all()
+    )).all()
 
     return {
         "invitations": [
@@ -0,0 +1,151 @@
+"""
+GET /metrics: process metrics in the Prometheus text exposition format.
+
+Renders the request/database/event-loop instrumentation of
+backend.metrics together with the counters the other components already
+keep (token cache, backplane, WebSocket rooms, heartbeat, token queue,
+stroke relay, annotation writer, password hasher and query log).
+"""
+from typing import List
+
+import anyio.to_thread
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from backend.annotation_writer import annotation_writer
+from backend.api.webrtc import webrtc_manager
+from backend.backplane import backplane
+from backend.diagnostics import stall_detector
+from backend.heartbeat import heartbeat
+from backend.metrics import format_labels, metrics
+from backend.password_hasher import password_hasher
+from backend.query_log import query_log
+from backend.stroke_relay import stroke_relay
+from backend.token_arbiter import token_arbiter
+from backend.token_queue import token_queue
+from backend.utils.auth import token_cache
+from backend.websocket import manager
+
+router = APIRouter()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "nexchamps_"
+
+
+class Exposition:
+    """Lines of a text exposition, one HELP/TYPE header per metric family"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def family(self, name: str, kind: str, help_text: str) -> str:
+        name = PREFIX + name
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+        return name
+
+    def value(self, name: str, kind: str, help_text: str, value, **labels):
+        name = self.family(name, kind, help_text)
+        self.lines.append(f"{name}{format_labels(**labels)} {value}")
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def _requests(out: Exposition):
+    name = out.family("http_request_duration_seconds", "histogram", "HTTP request latency by route template")
+    for (method, route), route_metrics in sorted(metrics.routes.items()):
+        out.lines.extend(route_metrics.latency.render(name, method=method, route=route))
+    name = out.family("http_requests_total", "counter", "HTTP requests by route template and status class")
+    for (method, route), route_metrics in sorted(metrics.routes.items()):
+        for status, count in sorted(route_metrics.statuses.items()):
+            out.lines.append(f"{name}{format_labels(method=method, route=route, status=status)} {count}")
+    name = out.family("http_db_statements_total", "counter", "Database statements run by requests, by route template")
+    for (method, route), route_metrics in sorted(metrics.routes.items()):
+        out.lines.append(f"{name}{format_labels(method=method, route=route)} {route_metrics.db_statements}")
+    name = out.family("http_db_seconds_total", "counter", "Time requests spent in database statements, by route template")
+    for (method, route), route_metrics in sorted(metrics.routes.items()):
+        out.lines.append(f"{name}{format_labels(method=method, route=route)} {route_metrics.db_seconds}")
+    name = out.family("db_statement_duration_seconds", "histogram", "Duration of every database statement")
+    out.lines.extend(metrics.db_statements.render(name))
+
+
+def _runtime(out: Exposition):
+    name = out.family("event_loop_lag_seconds", "histogram", "How late the event loop woke a sleeping probe task")
+    out.lines.extend(metrics.loop.lag.render(name))
+    out.value("event_loop_stalls_total", "counter", "Event-loop stalls caught by the stall detector",
+              stall_detector.stall_count)
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    out.value("threadpool_size", "gauge", "Threads available to sync endpoints and dependencies",
+              limiter.total_tokens)
+    out.value("threadpool_busy", "gauge", "Threads running sync endpoints and dependencies",
+              limiter.borrowed_tokens)
+    out.value("threadpool_waiting", "gauge", "Calls waiting for a free thread", limiter.statistics().tasks_waiting)
+    out.value("password_hash_pending", "gauge", "Password hash/verify operations in flight",
+              password_hasher.pending)
+    out.value("password_hash_rejected_total", "counter", "Logins turned away because the hasher was full",
+              password_hasher.rejected)
+
+
+def _websockets(out: Exposition):
+    rooms = [manager.room_metrics(meeting_id) for meeting_id in sorted(manager.active_connections)]
+    out.value("ws_rooms", "gauge", "Meeting rooms with connections on this worker", len(rooms))
+    out.value("ws_connections", "gauge", "Meeting WebSocket connections on this worker",
+              sum(room["connections"] for room in rooms))
+    for field, kind, help_text in (
+        ("connections", "gauge", "Connections of a meeting room"),
+        ("queue_depth_max", "gauge", "Longest outbound queue of a meeting room"),
+        ("messages_sent", "counter", "Messages written to the sockets of a meeting room"),
+        ("messages_dropped", "counter", "Messages dropped by the slow-consumer policy"),
+        ("messages_coalesced", "counter", "Messages replaced by a newer one with the same key"),
+        ("slow_disconnects", "counter", "Connections dropped for falling behind"),
+    ):
+        name = out.family(f"ws_room_{field}", kind, help_text)
+        for room in rooms:
+            out.lines.append(f"{name}{format_labels(meeting_id=room['meeting_id'])} {room[field]}")
+    name = out.family("ws_send_latency_seconds", "histogram", "Time from queueing a room message to writing it")
+    out.lines.extend(manager.send_latency.render(name))
+    out.value("webrtc_connections", "gauge", "Signaling WebSocket connections on this worker",
+              sum(webrtc_manager.connection_counts().values()))
+    out.value("ws_pings_sent_total", "counter", "Heartbeat pings sent", heartbeat.pings_sent)
+    out.value("ws_connections_reaped_total", "counter", "Connections dropped after missed heartbeats",
+              heartbeat.connections_reaped)
+    out.value("backplane_published_total", "counter", "Messages published to other workers", backplane.published)
+    out.value("backplane_delivered_total", "counter", "Messages delivered from other workers", backplane.delivered)
+    out.value("backplane_duplicates_total", "counter", "Duplicate backplane messages ignored", backplane.duplicates)
+    out.value("stroke_events_total", "counter", "Live stroke events received", stroke_relay.events_received)
+    out.value("stroke_messages_total", "counter", "Live stroke delta messages broadcast",
+              stroke_relay.messages_broadcast)
+
+
+def _components(out: Exposition):
+    cache = token_cache.stats()
+    out.value("auth_token_cache_size", "gauge", "Verified access tokens cached", cache["size"])
+    out.value("auth_token_cache_hits_total", "counter", "Access token cache hits", cache["hits"])
+    out.value("auth_token_cache_misses_total", "counter", "Access token cache misses", cache["misses"])
+    out.value("token_hand_offs_total", "counter", "Expression tokens passed to the next waiter", token_queue.hand_offs)
+    out.value("token_timeouts_total", "counter", "Expression tokens taken back at the hold-time limit",
+              token_queue.timeouts)
+    out.value("token_log_failures_total", "counter", "Token events the log writer could not persist",
+              token_arbiter.failed_events)
+    out.value("annotation_batches_total", "counter", "Annotation group commits", annotation_writer.batches_written)
+    out.value("annotation_rows_total", "counter", "Annotations written by group commits", annotation_writer.rows_written)
+    log = query_log.stats()
+    out.value("query_log_statements_total", "counter", "Statements timed by the query log", log["statements"])
+    out.value("query_log_slow_total", "counter", "Statements over the slow-query threshold", log["slow_statements"])
+    out.value("query_log_dropped_total", "counter", "Query log records dropped with a full queue", log["dropped"])
+
+
+def render_metrics() -> str:
+    out = Exposition()
+    _requests(out)
+    _runtime(out)
+    _websockets(out)
+    _components(out)
+    return out.render()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    """Prometheus text exposition of the process metrics"""
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
-from typing import List
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Dict, List, Optional
+import asyncio
 from backend.models.phases import Phase, PhaseCreate, PhaseRead
 from backend.models.meetings import Meeting
-from backend.database import get_db
+from backend.database import get_async_session
 from backend.utils.auth import get_current_active_user
+from backend.websocket import manager
 
 router = APIRouter()
 
@@ -16,45 +19,62 @@ PHASE_TRANSITIONS = {
     "feedback": []
 }
 
+# One phase change at a time per meeting, so two requests cannot both become current
+_phase_locks: Dict[int, asyncio.Lock] = {}
+
+async def change_meeting_phase(
+    db: AsyncSession,
+    meeting_id: int,
+    phase_name: str,
+    started_by: Optional[int] = None
+) -> Phase:
+    """Record a phase change and make it current; raises HTTPException when not allowed"""
+    async with _phase_locks.setdefault(meeting_id, asyncio.Lock()):
+        meeting = await db.get(Meeting, meeting_id)
+        if not meeting:
+            raise HTTPException(status_code=404, detail="Meeting not found")
+
+        if phase_name not in VALID_PHASES:
+            raise HTTPException(status_code=400, detail="Invalid phase")
+
+        if meeting.current_phase and phase_name not in PHASE_TRANSITIONS.get(meeting.current_phase, []):
+            raise HTTPException(status_code=400, detail=f"Cannot transition from {meeting.current_phase} to {phase_name}")
+
+        # Mark previous phase as not current
+        if meeting.current_phase:
+            previous_phase = (await db.exec(
+                select(Phase).where(Phase.meeting_id == meeting_id, Phase.is_current == True)
+            )).first()
+            if previous_phase:
+                previous_phase.is_current = False
+
+        # Create new phase
+        new_phase = Phase(
+            meeting_id=meeting_id,
+            phase_name=phase_name,
+            started_by=started_by,
+            is_current=True
+        )
+        db.add(new_phase)
+
+        # Update meeting current phase
+        meeting.current_phase = phase_name
+        await db.commit()
+        await db.refresh(new_phase)
+
+    room = manager.meeting_rooms.get(meeting_id)
+    if room is not None:
+        room["current_phase"] = phase_name
+    return new_phase
+
 @router.post("/meetings/{meeting_id}/change", response_model=PhaseRead)
-def change_phase(
+async def change_phase(
     meeting_id: int,
     phase_data: PhaseCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: dict = Depends(get_current_active_user)
 ):
-    """Change the current phase of a meeting"""
-    meeting = db.query(Meeting).filter(Meeting.id == meeting_id).first()
-    if not meeting:
-        raise HTTPException(status_code=404, detail="Meeting not found")
-
-    if phase_data.phase_name not in VALID_PHASES:
-        raise HTTPException(status_code=400, detail="Invalid phase")
-
-    if meeting.current_phase and meeting.current_phase not in PHASE_TRANSITIONS.get(phase_data.phase_name, []):
-        raise HTTPException(status_code=400, detail=f"Cannot transition from {meeting.current_phase} to {phase_data.phase_name}")
-
-    # Mark previous phase as not current
-    if meeting.current_phase:
-        previous_phase = db.query(Phase).filter(
-            Phase.meeting_id == meeting_id,
-            Phase.is_current == True
-        ).first()
-        if previous_phase:
-            previous_phase.is_current = False
-
-    # Create new phase
-    new_phase = Phase(
-        meeting_id=meeting_id,
-        phase_name=phase_data.phase_name,
-        started_by=phase_data.started_by,
-        is_current=True
-    )
-    db.add(new_phase)
-
-    # Update meeting current phase
-    meeting.current_phase = phase_data.phase_name
-    db.commit()
-    db.refresh(new_phase)
-
-    return new_phase
\ No newline at end of file
+    """Change the current phase of a meeting and notify the room"""
+    new_phase = await change_meeting_phase(db, meeting_id, phase_data.phase_name, phase_data.started_by)
+    await manager.broadcast_phase_change(meeting_id, new_phase)
+    return new_phase
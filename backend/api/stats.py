@@ -1,121 +1,306 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, func
-from typing import Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import tuple_
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Dict, Any, AsyncIterator, Optional, Tuple
 from datetime import datetime
+import csv
+import io
+import json
 from backend.models.tokens import TokenEvent
 from backend.models.annotations import Annotation
 from backend.models.participants import Participant
-from backend.database import get_db
+from backend.database import get_async_session, async_session_maker
 from backend.utils.auth import get_current_active_user
 
 router = APIRouter()
 
-@router.get("/meetings/{meeting_id}/stats", response_model=Dict[str, Any])
-def get_meeting_stats(
-    meeting_id: int,
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_active_user)
-):
-    """Get statistics for a meeting"""
+# Token events that end a hold started by a claim; "timeout" is a force
+# release by the hold-time limit
+RELEASE_EVENTS = ("release", "force_release", "timeout")
 
-    # Get all participants
-    participants = db.query(Participant).filter(Participant.meeting_id == meeting_id).all()
+# Rows fetched per round trip when streaming large result sets
+STREAM_BATCH_SIZE = 1000
+
+# Bytes buffered before a CSV export chunk is flushed to the client
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+async def compute_meeting_stats(db: AsyncSession, meeting_id: int) -> Dict[str, Any]:
+    """Aggregate token and annotation statistics for a meeting.
+
+    Claim and annotation counts are grouped in SQL; hold durations come from
+    a single ordered pass over the token log pairing each claim with the
+    release that follows it. Cost is linear in the number of events and
+    independent of the participant count.
+    """
+    now = datetime.utcnow()
+
+    participants = (await db.exec(
+        select(Participant.id, Participant.name).where(Participant.meeting_id == meeting_id)
+    )).all()
 
     stats = {
         "meeting_id": meeting_id,
         "participant_count": len(participants),
         "token_stats": {},
         "annotation_stats": {},
-        "generated_at": datetime.utcnow().isoformat()
+        "generated_at": now.isoformat()
     }
 
-    # Calculate token statistics
-    token_events = db.query(TokenEvent).filter(TokenEvent.meeting_id == meeting_id).all()
+    # participant_id -> [claim_count, total_hold_seconds, last_claim_at]
+    token_totals: Dict[Optional[int], list] = {}
+    holder: Optional[int] = None
+    held_since: Optional[datetime] = None
+    token_rows = await db.stream(
+        select(TokenEvent.participant_id, TokenEvent.event_type, TokenEvent.created_at)
+        .where(TokenEvent.meeting_id == meeting_id)
+        .order_by(TokenEvent.created_at, TokenEvent.id)
+    )
+    async for partition in token_rows.partitions(STREAM_BATCH_SIZE):
+        for participant_id, event_type, created_at in partition:
+            if event_type == "claim":
+                totals = token_totals.setdefault(participant_id, [0, 0.0, None])
+                totals[0] += 1
+                totals[2] = created_at
+                holder, held_since = participant_id, created_at
+            elif event_type in RELEASE_EVENTS and held_since is not None:
+                token_totals[holder][1] += (created_at - held_since).total_seconds()
+                holder, held_since = None, None
+            elif event_type == "release":
+                # Legacy rows: older releases rewrote the claim row in place,
+                # so the claim is counted but its duration is unknown
+                totals = token_totals.setdefault(participant_id, [0, 0.0, None])
+                totals[0] += 1
+                totals[2] = created_at
 
-    for participant in participants:
-        participant_id = participant.id
-        participant_stats = {
-            "claim_count": 0,
-            "total_hold_time_seconds": 0,
-            "last_hold_timestamp": None
+    # A token still held counts up to now
+    if held_since is not None:
+        token_totals[holder][1] += (now - held_since).total_seconds()
+
+    annotation_counts: Dict[Optional[int], Dict[str, int]] = {}
+    annotation_rows = (await db.exec(
+        select(Annotation.participant_id, Annotation.annotation_type, func.count())
+        .where(Annotation.meeting_id == meeting_id)
+        .group_by(Annotation.participant_id, Annotation.annotation_type)
+    )).all()
+    for participant_id, annotation_type, count in annotation_rows:
+        annotation_counts.setdefault(participant_id, {})[annotation_type] = count
+
+    for participant_id, name in participants:
+        claim_count, hold_seconds, last_claim = token_totals.get(participant_id, (0, 0.0, None))
+        stats["token_stats"][name] = {
+            "claim_count": claim_count,
+            "total_hold_time_seconds": round(hold_seconds, 3),
+            "last_hold_timestamp": last_claim.isoformat() if last_claim else None
         }
 
-        # Filter token events for this participant
-        participant_tokens = [t for t in token_events if t.participant_id == participant_id]
+        annotation_types = annotation_counts.get(participant_id, {})
+        stats["annotation_stats"][name] = {
+            "annotation_count": sum(annotation_types.values()),
+            "annotation_types": annotation_types
+        }
 
-        if participant_tokens:
-            participant_stats["claim_count"] = len(participant_tokens)
+    return stats
 
-            # Calculate total hold time (simplified - in real implementation would track actual durations)
-            for token in participant_tokens:
-                if token.event_type == "claim":
-                    participant_stats["total_hold_time_seconds"] += 60  # Assume 60 seconds per claim for demo
-                    participant_stats["last_hold_timestamp"] = token.created_at.isoformat()
+@router.get("/meetings/{meeting_id}/stats", response_model=Dict[str, Any])
+async def get_meeting_stats(
+    meeting_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Get statistics for a meeting"""
+    return await compute_meeting_stats(db, meeting_id)
 
-        stats["token_stats"][participant.name] = participant_stats
+# Audit cursor: (created_at, source, id) of the last event returned. Both
+# tables number their rows independently, so the source (an index into
+# AUDIT_SOURCES) breaks ties between rows with the same created_at and id.
+AuditKey = Tuple[datetime, int, int]
+AUDIT_SOURCES = ("token_event", "annotation")
 
-    # Calculate annotation statistics
-    annotations = db.query(Annotation).filter(Annotation.meeting_id == meeting_id).all()
+EXPORT_FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+CSV_COLUMNS = [
+    "type", "event_id", "annotation_id", "participant_id", "event_type",
+    "annotation_type", "is_active", "timestamp_ms", "timestamp",
+]
 
-    for participant in participants:
-        participant_id = participant.id
-        participant_annotations = [a for a in annotations if a.participant_id == participant_id]
+def parse_audit_cursor(after: Optional[str]) -> Optional[AuditKey]:
+    """Parse an ``after=<timestamp>,<source>,<id>`` cursor.
 
-        stats["annotation_stats"][participant.name] = {
-            "annotation_count": len(participant_annotations),
-            "annotation_types": {}
-        }
+    Older ``<timestamp>,<id>`` cursors do not say which table they came
+    from; they resume after the token event and may repeat annotations
+    created at the same instant, but never skip one.
+    """
+    if not after:
+        return None
+    try:
+        parts = after.split(",")
+        if len(parts) == 2:
+            return datetime.fromisoformat(parts[0]), 0, int(parts[1])
+        timestamp, source, event_id = parts
+        return datetime.fromisoformat(timestamp), AUDIT_SOURCES.index(source), int(event_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor, expected <timestamp>,<source>,<id>")
 
-        # Count annotation types
-        for annotation in participant_annotations:
-            annotation_type = annotation.annotation_type
-            if annotation_type not in stats["annotation_stats"][participant.name]["annotation_types"]:
-                stats["annotation_stats"][participant.name]["annotation_types"][annotation_type] = 0
-            stats["annotation_stats"][participant.name]["annotation_types"][annotation_type] += 1
+def format_audit_cursor(key: AuditKey) -> str:
+    return f"{key[0].isoformat()},{AUDIT_SOURCES[key[1]]},{key[2]}"
 
-    return stats
+def _token_audit_event(row) -> Dict[str, Any]:
+    return {
+        "type": "token_event",
+        "event_id": row.id,
+        "participant_id": row.participant_id,
+        "event_type": row.event_type,
+        "is_active": row.is_active,
+        "timestamp": row.created_at.isoformat()
+    }
+
+def _annotation_audit_event(row) -> Dict[str, Any]:
+    return {
+        "type": "annotation",
+        "annotation_id": row.id,
+        "participant_id": row.participant_id,
+        "annotation_type": row.annotation_type,
+        "timestamp_ms": row.timestamp_ms,
+        "timestamp": row.created_at.isoformat()
+    }
+
+async def _stream_audit_source(db: AsyncSession, model, source: int, columns, meeting_id: int,
+                               after: Optional[AuditKey], to_event):
+    statement = select(model.id, model.created_at, *columns).where(model.meeting_id == meeting_id)
+    if after is not None:
+        created_at, after_source, after_id = after
+        if source < after_source:
+            statement = statement.where(model.created_at > created_at)
+        elif source > after_source:
+            statement = statement.where(model.created_at >= created_at)
+        else:
+            statement = statement.where(tuple_(model.created_at, model.id) > tuple_(created_at, after_id))
+    result = await db.stream(statement.order_by(model.created_at, model.id))
+    try:
+        async for partition in result.partitions(STREAM_BATCH_SIZE):
+            for row in partition:
+                yield (row.created_at, source, row.id), to_event(row)
+    finally:
+        await result.close()
+
+async def _next_or_none(source):
+    try:
+        return await source.__anext__()
+    except StopAsyncIteration:
+        return None
+
+async def iter_audit_events(
+    db: AsyncSession,
+    meeting_id: int,
+    after: Optional[AuditKey] = None,
+    limit: Optional[int] = None,
+) -> AsyncIterator[Tuple[AuditKey, Dict[str, Any]]]:
+    """Yield (cursor key, event) for token events and annotations in time order.
+
+    Both tables are read through ordered, batched cursors and merged lazily,
+    so memory stays constant whatever the size of the meeting.
+    """
+    sources = [
+        _stream_audit_source(
+            db, TokenEvent, 0, (TokenEvent.participant_id, TokenEvent.event_type, TokenEvent.is_active),
+            meeting_id, after, _token_audit_event,
+        ),
+        _stream_audit_source(
+            db, Annotation, 1, (Annotation.participant_id, Annotation.annotation_type, Annotation.timestamp_ms),
+            meeting_id, after, _annotation_audit_event,
+        ),
+    ]
+    heads = [await _next_or_none(source) for source in sources]
+
+    yielded = 0
+    try:
+        while limit is None or yielded < limit:
+            candidates = [i for i, head in enumerate(heads) if head is not None]
+            if not candidates:
+                break
+            index = min(candidates, key=lambda i: heads[i][0])
+            yield heads[index]
+            yielded += 1
+            heads[index] = await _next_or_none(sources[index])
+    finally:
+        for source in sources:
+            await source.aclose()
 
 @router.get("/meetings/{meeting_id}/audit", response_model=Dict[str, Any])
-def get_meeting_audit(
+async def get_meeting_audit(
     meeting_id: int,
-    db: Session = Depends(get_db),
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    db: AsyncSession = Depends(get_async_session),
     current_user: dict = Depends(get_current_active_user)
 ):
-    """Get audit data for a meeting"""
+    """Get audit data for a meeting, optionally one page at a time.
 
+    Pass the returned ``next_cursor`` as ``after`` to fetch the next page.
+    """
     audit_data = {
         "meeting_id": meeting_id,
         "events": [],
+        "next_cursor": None,
         "generated_at": datetime.utcnow().isoformat()
     }
 
-    # Get all token events
-    token_events = db.query(TokenEvent).filter(TokenEvent.meeting_id == meeting_id).all()
-
-    for event in token_events:
-        audit_data["events"].append({
-            "type": "token_event",
-            "event_id": event.id,
-            "participant_id": event.participant_id,
-            "event_type": event.event_type,
-            "is_active": event.is_active,
-            "timestamp": event.created_at.isoformat()
-        })
-
-    # Get all annotations
-    annotations = db.query(Annotation).filter(Annotation.meeting_id == meeting_id).all()
-
-    for annotation in annotations:
-        audit_data["events"].append({
-            "type": "annotation",
-            "annotation_id": annotation.id,
-            "participant_id": annotation.participant_id,
-            "annotation_type": annotation.annotation_type,
-            "timestamp_ms": annotation.timestamp_ms,
-            "timestamp": annotation.created_at.isoformat()
-        })
-
-    # Sort events by timestamp
-    audit_data["events"].sort(key=lambda x: x["timestamp"])
-
-    return audit_data
\ No newline at end of file
+    fetch = limit + 1 if limit is not None else None
+    last_key = None
+    async for key, event in iter_audit_events(db, meeting_id, parse_audit_cursor(after), fetch):
+        if limit is not None and len(audit_data["events"]) == limit:
+            audit_data["next_cursor"] = format_audit_cursor(last_key)
+            break
+        audit_data["events"].append(event)
+        last_key = key
+
+    return audit_data
+
+async def _export_audit(meeting_id: int, export_format: str, after: Optional[AuditKey]) -> AsyncIterator[str]:
+    # The request-scoped session is closed before a streaming body is sent,
+    # so the export owns its session
+    async with async_session_maker() as db:
+        events = iter_audit_events(db, meeting_id, after)
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+            async for _, event in events:
+                writer.writerow(event)
+                if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        elif export_format == "ndjson":
+            async for _, event in events:
+                yield json.dumps(event) + "\n"
+        else:
+            yield f'{{"meeting_id": {meeting_id}, "events": ['
+            separator = ""
+            async for _, event in events:
+                yield separator + json.dumps(event)
+                separator = ", "
+            yield f'], "generated_at": {json.dumps(datetime.utcnow().isoformat())}}}'
+
+@router.get("/meetings/{meeting_id}/export")
+async def export_meeting_audit(
+    meeting_id: int,
+    export_format: str = Query("json", alias="format"),
+    after: Optional[str] = None,
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Stream the meeting audit trail as JSON, NDJSON or CSV"""
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format, use one of {', '.join(EXPORT_FORMATS)}")
+
+    return StreamingResponse(
+        _export_audit(meeting_id, export_format, parse_audit_cursor(after)),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="meeting-{meeting_id}-audit.{export_format}"'}
+    )
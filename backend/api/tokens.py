@@ -1,63 +1,64 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
-from typing import List
-from backend.models.tokens import TokenEvent, TokenEventCreate, TokenEventRead
-from backend.database import get_db
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from backend.models.tokens import TokenEventCreate, TokenEventRead
+from backend.models.participants import Participant
+from backend.database import get_async_session
+from backend.token_arbiter import token_arbiter
+from backend.token_queue import token_queue
 from backend.utils.auth import get_current_active_user
+from backend.utils.roles import ROLE_PERMISSIONS
 
 router = APIRouter()
 
 @router.post("/meetings/{meeting_id}/claim", response_model=TokenEventRead)
-def claim_token(
+async def claim_token(
     meeting_id: int,
     token_data: TokenEventCreate,
-    db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Claim the expression token"""
-    # Check if there's already an active token
-    active_token = db.query(TokenEvent).filter(
-        TokenEvent.meeting_id == meeting_id,
-        TokenEvent.is_active == True
-    ).first()
-
-    if active_token:
+    token_event, _ = await token_queue.claim(meeting_id, token_data.participant_id)
+    if token_event is None:
         raise HTTPException(status_code=400, detail="Token is already claimed")
 
-    # Create new token event
-    token_event = TokenEvent(
-        meeting_id=meeting_id,
-        participant_id=token_data.participant_id,
-        event_type="claim",
-        is_active=True
-    )
-    db.add(token_event)
-    db.commit()
-    db.refresh(token_event)
-
     return token_event
 
 @router.post("/meetings/{meeting_id}/release", response_model=TokenEventRead)
-def release_token(
+async def release_token(
     meeting_id: int,
     token_data: TokenEventCreate,
-    db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Release the expression token"""
-    # Find the active token
-    active_token = db.query(TokenEvent).filter(
-        TokenEvent.meeting_id == meeting_id,
-        TokenEvent.is_active == True
-    ).first()
-
-    if not active_token:
+    if token_arbiter.current_holder(meeting_id) is None:
         raise HTTPException(status_code=400, detail="No active token to release")
 
-    # Mark as released
-    active_token.is_active = False
-    active_token.event_type = "release"
-    db.commit()
-    db.refresh(active_token)
+    token_event = await token_queue.release(meeting_id, token_data.participant_id)
+    if token_event is None:
+        raise HTTPException(status_code=403, detail="Token is held by another participant")
 
-    return active_token
\ No newline at end of file
+    return token_event
+
+@router.post("/meetings/{meeting_id}/force-release", response_model=TokenEventRead)
+async def force_release_token(
+    meeting_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Force the release of the expression token (facilitators only)"""
+    participant = (await db.exec(
+        select(Participant).where(
+            Participant.meeting_id == meeting_id,
+            Participant.user_id == current_user.username
+        )
+    )).first()
+
+    if not participant or not ROLE_PERMISSIONS.get(participant.role, {}).get("force_token_release"):
+        raise HTTPException(status_code=403, detail="You don't have permission to perform this action")
+
+    token_event = await token_queue.force_release(meeting_id, released_by=participant.id)
+    if token_event is None:
+        raise HTTPException(status_code=400, detail="No active token to release")
+
+    return token_event
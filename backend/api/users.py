@@ -1,21 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
-from backend.database import get_session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from backend.database import get_async_session
 from backend.models.users import User, UserRead, UserUpdate, UserDelete, UserCreate
-from backend.utils.auth import get_current_active_user, get_password_hash, verify_password
+from backend.password_hasher import password_hasher, PasswordHasherBusy
+from backend.utils.auth import get_current_active_user, token_cache
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/users", tags=["users"])
 
+def _password_checks_busy() -> HTTPException:
+    # The same answer as a login turned away by a saturated hasher
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many password checks in progress, please retry",
+        headers={"Retry-After": "1"},
+    )
+
 @router.get("/me", response_model=UserRead)
 async def get_current_user_profile(
     current_user: User = Depends(get_current_active_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Get current user profile"""
     # Get fresh data from database
-    user = session.get(User, current_user.id)
+    user = await session.get(User, current_user.id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -27,10 +37,10 @@ async def get_current_user_profile(
 async def update_user_profile(
     user_update: UserUpdate,
     current_user: User = Depends(get_current_active_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Update current user profile"""
-    user = session.get(User, current_user.id)
+    user = await session.get(User, current_user.id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -43,9 +53,9 @@ async def update_user_profile(
     
     if user_update.email is not None:
         # Check if email is already taken
-        existing = session.exec(
+        existing = (await session.exec(
             select(User).where(User.email == user_update.email)
-        ).first()
+        )).first()
         if existing and existing.id != user.id:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -65,11 +75,15 @@ async def update_user_profile(
         user.language_preference = user_update.language_preference
     
     if user_update.password is not None:
-        user.hashed_password = get_password_hash(user_update.password)
+        try:
+            user.hashed_password = await password_hasher.hash(user_update.password)
+        except PasswordHasherBusy:
+            logger.warning("Password change rejected: password hasher saturated")
+            raise _password_checks_busy()
     
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
     
     logger.info(f"User {user.username} profile updated")
     return user
@@ -78,13 +92,13 @@ async def update_user_profile(
 async def delete_user_account(
     deletion_request: UserDelete,
     current_user: User = Depends(get_current_active_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     Delete user account (GDPR compliant).
     Requires password confirmation for security.
     """
-    user = session.get(User, current_user.id)
+    user = await session.get(User, current_user.id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -92,7 +106,12 @@ async def delete_user_account(
         )
     
     # Verify password
-    if not verify_password(deletion_request.password, user.hashed_password):
+    try:
+        password_valid = await password_hasher.verify(deletion_request.password, user.hashed_password)
+    except PasswordHasherBusy:
+        logger.warning("Account deletion rejected: password hasher saturated")
+        raise _password_checks_busy()
+    if not password_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid password"
@@ -103,7 +122,8 @@ async def delete_user_account(
     # Mark user as inactive instead of deleting (data retention)
     user.is_active = False
     session.add(user)
-    session.commit()
+    await session.commit()
+    token_cache.revoke_user(user.id)
     
     logger.warning(f"User {username} account deleted (GDPR)")
     return None
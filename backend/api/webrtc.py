@@ -1,29 +1,156 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+import asyncio
 import json
+import logging
+import time
+from backend.backplane import Backplane, backplane as default_backplane
+from backend.config import settings
+from backend.heartbeat import PING_MESSAGE, TIMEOUT_CLOSE_CODE
+from backend.utils import frame_codec
+from backend.utils.frame_codec import DEFAULT_FORMAT, Frame, FrameCache, WireFormat
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 class WebRTCManager:
-    def __init__(self):
+    def __init__(self, backplane: Optional[Backplane] = None, ice_batch_ms: Optional[float] = None):
         self.meeting_rooms: Dict[int, Dict[str, WebSocket]] = {}  # meeting_id -> {user_id: websocket}
+        self.formats: Dict[WebSocket, WireFormat] = {}  # negotiated frame format per connection
+        self.last_seen: Dict[WebSocket, float] = {}  # last frame received, for the heartbeat
+        # Trickled ICE candidates waiting for the batch window: (meeting_id, sender, to) -> candidates
+        self.ice_batches: Dict[Tuple[int, str, str], List[dict]] = {}
+        self.ice_batch_window = (settings.WEBRTC_ICE_BATCH_MS if ice_batch_ms is None else ice_batch_ms) / 1000
+        # Peers of a room may be connected to other workers; see backend.backplane
+        self.backplane = backplane or default_backplane
+        self.backplane.subscribe("webrtc_broadcast", self._on_remote_broadcast)
+        self.backplane.subscribe("webrtc_direct", self._on_remote_direct)
 
-    async def connect(self, websocket: WebSocket, meeting_id: int, user_id: str):
+    async def connect(self, websocket: WebSocket, meeting_id: int, user_id: str,
+                      wire_format: WireFormat = DEFAULT_FORMAT):
         await websocket.accept()
         if meeting_id not in self.meeting_rooms:
             self.meeting_rooms[meeting_id] = {}
         self.meeting_rooms[meeting_id][user_id] = websocket
+        self.formats[websocket] = wire_format
+        self.last_seen[websocket] = time.monotonic()
 
-    def disconnect(self, meeting_id: int, user_id: str):
+    def disconnect(self, meeting_id: int, user_id: str, websocket: Optional[WebSocket] = None):
+        """Forget a peer's connection; with ``websocket``, only if it is still that one"""
+        if websocket is not None:
+            self.formats.pop(websocket, None)
+            self.last_seen.pop(websocket, None)
         if meeting_id in self.meeting_rooms and user_id in self.meeting_rooms[meeting_id]:
+            current = self.meeting_rooms[meeting_id][user_id]
+            if websocket is not None and current is not websocket:
+                # The peer has reconnected since; keep the new connection
+                return
+            self.formats.pop(current, None)
+            self.last_seen.pop(current, None)
             del self.meeting_rooms[meeting_id][user_id]
             if not self.meeting_rooms[meeting_id]:
                 del self.meeting_rooms[meeting_id]
 
+    def touch(self, websocket: WebSocket):
+        """Record that a frame arrived from a connection"""
+        if websocket in self.last_seen:
+            self.last_seen[websocket] = time.monotonic()
+
+    def ping(self, idle_since: float) -> int:
+        """Heartbeat: ping every peer silent since idle_since"""
+        frames = FrameCache(PING_MESSAGE)
+        quiet = [websocket for websocket, seen in self.last_seen.items() if seen < idle_since]
+        for websocket in quiet:
+            asyncio.create_task(self._ping(websocket, frames.frame(self.formats.get(websocket, DEFAULT_FORMAT))))
+        return len(quiet)
+
+    def reap(self, cutoff: float) -> int:
+        """Heartbeat: drop and close the peers silent since cutoff"""
+        stale = [
+            (meeting_id, user_id, websocket)
+            for meeting_id, peers in self.meeting_rooms.items()
+            for user_id, websocket in peers.items()
+            if self.last_seen.get(websocket, cutoff) < cutoff
+        ]
+        for meeting_id, user_id, websocket in stale:
+            logger.info(f"Dropping signaling connection of {user_id} in meeting {meeting_id} after missed heartbeats")
+            self.disconnect(meeting_id, user_id, websocket)
+            asyncio.create_task(self._close(websocket))
+        return len(stale)
+
+    def connection_counts(self) -> Dict[int, int]:
+        """Live signaling connections per meeting room on this worker"""
+        return {meeting_id: len(peers) for meeting_id, peers in self.meeting_rooms.items()}
+
+    async def _ping(self, websocket: WebSocket, frame: Frame):
+        try:
+            await self._send_frame(websocket, frame)
+        except Exception:
+            # A dead peer is reaped once its timeout passes
+            pass
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int = TIMEOUT_CLOSE_CODE):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
     async def send_to_user(self, meeting_id: int, user_id: str, message: str):
+        """Send to one peer; a dead peer's error is logged, not raised to the sender"""
         if meeting_id in self.meeting_rooms and user_id in self.meeting_rooms[meeting_id]:
             websocket = self.meeting_rooms[meeting_id][user_id]
-            await websocket.send_text(message)
+            await self._deliver(meeting_id, user_id, websocket,
+                                frame_codec.encode(message, self.formats.get(websocket, DEFAULT_FORMAT)))
+        else:
+            # The peer may be connected to another worker
+            self.backplane.publish("webrtc_direct", {"meeting_id": meeting_id, "to": user_id, "message": message})
+
+    async def send_sdp(self, meeting_id: int, sender_id: str, to: str, sdp: dict):
+        """Send an offer or answer to one peer"""
+        message = {
+            "type": "sdp",
+            "sender": sender_id,
+            "sdp": sdp
+        }
+        await self.send_to_user(meeting_id, to, json.dumps(message))
+
+    def send_ice_candidates(self, meeting_id: int, sender_id: str, to: str, candidates: List[dict]):
+        """
+        Queue trickled ICE candidates for one peer.
+
+        Candidates for the same peer arriving within the batch window go out
+        as one ``ice_candidates`` message; a lone candidate keeps the
+        ``ice_candidate`` shape.
+        """
+        key = (meeting_id, sender_id, to)
+        batch = self.ice_batches.get(key)
+        if batch is None:
+            batch = self.ice_batches[key] = []
+            if self.ice_batch_window > 0:
+                asyncio.get_running_loop().call_later(self.ice_batch_window, self._flush_ice_candidates, key)
+            else:
+                asyncio.get_running_loop().call_soon(self._flush_ice_candidates, key)
+        batch.extend(candidates)
+
+    def _flush_ice_candidates(self, key: Tuple[int, str, str]):
+        candidates = self.ice_batches.pop(key, None)
+        if not candidates:
+            return
+        meeting_id, sender_id, to = key
+        if len(candidates) == 1:
+            message = {"type": "ice_candidate", "sender": sender_id, "candidate": candidates[0]}
+        else:
+            message = {"type": "ice_candidates", "sender": sender_id, "candidates": candidates}
+        asyncio.create_task(self.send_to_user(meeting_id, to, json.dumps(message)))
+
+    async def _deliver(self, meeting_id: int, user_id: str, websocket: WebSocket, frame: Frame):
+        try:
+            await self._send_frame(websocket, frame)
+        except Exception as e:
+            # A dead peer is reaped by the heartbeat
+            logger.info(f"Could not deliver signaling message to {user_id} in meeting {meeting_id}: {e}")
 
     async def broadcast_sdp(self, meeting_id: int, sender_id: str, sdp: dict):
         message = {
@@ -31,10 +158,7 @@ class WebRTCManager:
             "sender": sender_id,
             "sdp": sdp
         }
-        if meeting_id in self.meeting_rooms:
-            for user_id, websocket in self.meeting_rooms[meeting_id].items():
-                if user_id != sender_id:
-                    await websocket.send_text(json.dumps(message))
+        await self._broadcast(meeting_id, sender_id, json.dumps(message))
 
     async def broadcast_ice_candidate(self, meeting_id: int, sender_id: str, candidate: dict):
         message = {
@@ -42,10 +166,37 @@ class WebRTCManager:
             "sender": sender_id,
             "candidate": candidate
         }
-        if meeting_id in self.meeting_rooms:
-            for user_id, websocket in self.meeting_rooms[meeting_id].items():
-                if user_id != sender_id:
-                    await websocket.send_text(json.dumps(message))
+        await self._broadcast(meeting_id, sender_id, json.dumps(message))
+
+    async def _broadcast(self, meeting_id: int, sender_id: str, message: str):
+        """Send to every peer of the room but the sender, on this worker and the others"""
+        self.backplane.publish("webrtc_broadcast", {"meeting_id": meeting_id, "sender": sender_id, "message": message})
+        await self._send_local(meeting_id, sender_id, message)
+
+    async def _send_local(self, meeting_id: int, sender_id: str, message: str):
+        # Encoded once per frame format, not once per peer; sent concurrently so
+        # a slow peer does not hold up the others
+        frames = FrameCache(message)
+        await asyncio.gather(*(
+            self._deliver(meeting_id, user_id, websocket, frames.frame(self.formats.get(websocket, DEFAULT_FORMAT)))
+            for user_id, websocket in list(self.meeting_rooms.get(meeting_id, {}).items())
+            if user_id != sender_id
+        ))
+
+    @staticmethod
+    async def _send_frame(websocket: WebSocket, frame: Frame):
+        if isinstance(frame, bytes):
+            await websocket.send_bytes(frame)
+        else:
+            await websocket.send_text(frame)
+
+    def _on_remote_broadcast(self, data: Dict):
+        if data["meeting_id"] in self.meeting_rooms:
+            asyncio.create_task(self._send_local(data["meeting_id"], data["sender"], data["message"]))
+
+    def _on_remote_direct(self, data: Dict):
+        if data["to"] in self.meeting_rooms.get(data["meeting_id"], {}):
+            asyncio.create_task(self.send_to_user(data["meeting_id"], data["to"], data["message"]))
 
 webrtc_manager = WebRTCManager()
 
@@ -53,21 +204,68 @@ webrtc_manager = WebRTCManager()
 async def webrtc_signaling(
     websocket: WebSocket,
     meeting_id: int,
-    user_id: str
+    user_id: str,
+    encoding: Optional[str] = None,
+    compression: Optional[str] = None
 ):
-    """WebRTC signaling endpoint for video/audio communication"""
-    await webrtc_manager.connect(websocket, meeting_id, user_id)
+    """
+    WebRTC signaling endpoint for video/audio communication.
+
+    Messages with a ``to`` peer id go to that peer only; ICE candidates for
+    a peer are batched over WEBRTC_ICE_BATCH_MS. Messages without ``to``
+    are still broadcast to the whole room for older clients. ``encoding``
+    and ``compression`` select the frame format as on the meeting socket.
+    The server sends ``ping`` to quiet peers; answer with ``pong``.
+    """
+    try:
+        wire_format = frame_codec.negotiate(encoding, compression)
+    except ValueError:
+        wire_format = DEFAULT_FORMAT
+    await webrtc_manager.connect(websocket, meeting_id, user_id, wire_format)
 
     try:
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            try:
+                message = await frame_codec.receive(websocket)
+            except ValueError:
+                # Malformed frame: ignore it, the peer is still alive
+                webrtc_manager.touch(websocket)
+                continue
+            webrtc_manager.touch(websocket)
+
+            to = message.get("to")
 
             if message.get("type") == "sdp":
-                await webrtc_manager.broadcast_sdp(meeting_id, user_id, message["sdp"])
+                if to:
+                    await webrtc_manager.send_sdp(meeting_id, user_id, to, message["sdp"])
+                else:
+                    await webrtc_manager.broadcast_sdp(meeting_id, user_id, message["sdp"])
+
+            elif message.get("type") == "ice_candidate" and isinstance(message.get("candidate"), dict):
+                if to:
+                    webrtc_manager.send_ice_candidates(meeting_id, user_id, to, [message["candidate"]])
+                else:
+                    await webrtc_manager.broadcast_ice_candidate(meeting_id, user_id, message["candidate"])
+
+            elif message.get("type") == "ice_candidates" and to:
+                candidates = message.get("candidates")
+                # Only well-formed batches are queued; anything else would be sent on to the peer
+                if isinstance(candidates, list) and candidates and all(isinstance(c, dict) for c in candidates):
+                    webrtc_manager.send_ice_candidates(meeting_id, user_id, to, candidates)
 
-            elif message.get("type") == "ice_candidate":
-                await webrtc_manager.broadcast_ice_candidate(meeting_id, user_id, message["candidate"])
+            elif message.get("type") == "hello":
+                try:
+                    webrtc_manager.formats[websocket] = frame_codec.negotiate(
+                        message.get("encoding"), message.get("compression")
+                    )
+                except ValueError:
+                    pass
 
     except WebSocketDisconnect:
-        webrtc_manager.disconnect(meeting_id, user_id)
\ No newline at end of file
+        pass
+    except Exception as e:
+        logger.exception(f"Signaling handler for {user_id} in meeting {meeting_id} failed: {e}")
+        await webrtc_manager._close(websocket, code=1011)
+    finally:
+        # Also runs when handling a message fails, so the peer never stays registered
+        webrtc_manager.disconnect(meeting_id, user_id, websocket)
\ No newline at end of file
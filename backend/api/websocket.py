@@ -1,30 +1,250 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from backend.websocket import manager
-from backend.utils.auth import get_current_active_user
-from typing import Optional
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from backend.database import get_async_session
+from backend.models.participants import Participant
+from backend.websocket import ConnectionIdentity, manager
+from backend.api.phases import change_meeting_phase
+from backend.token_arbiter import token_arbiter
+from backend.token_queue import token_queue
+from backend.api.webrtc import webrtc_manager
+from backend.heartbeat import heartbeat
+from backend.annotation_writer import annotation_writer, annotation_row
+from backend.stroke_relay import stroke_relay
+from backend.models.annotations import AnnotationCreate, AnnotationRead
+from backend.models.tokens import TokenEventRead
+from pydantic import ValidationError
+from backend.utils.auth import authenticate_token, get_current_active_user
+from backend.utils import frame_codec
+from typing import Any, Dict, Optional
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+@router.get("/meetings/{meeting_id}/metrics")
+async def get_room_metrics(
+    meeting_id: int,
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Get WebSocket fan-out metrics (queue depth, send latency) for a meeting room"""
+    return manager.room_metrics(meeting_id)
+
+@router.get("/connections")
+async def get_connection_gauge(
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Live WebSocket connections per meeting room on this worker, and heartbeat counters"""
+    meeting_counts = manager.connection_counts()
+    signaling_counts = webrtc_manager.connection_counts()
+    return {
+        "rooms": [
+            {
+                "meeting_id": meeting_id,
+                "connections": meeting_counts.get(meeting_id, 0),
+                "participants": len(manager.meeting_rooms.get(meeting_id, {}).get("participants", {})),
+                "signaling_connections": signaling_counts.get(meeting_id, 0),
+            }
+            for meeting_id in sorted(set(meeting_counts) | set(signaling_counts))
+        ],
+        "connections_total": sum(meeting_counts.values()),
+        "signaling_connections_total": sum(signaling_counts.values()),
+        "pings_sent": heartbeat.pings_sent,
+        "connections_reaped": heartbeat.connections_reaped,
+    }
+
+async def authenticate_connection(
+    websocket: WebSocket,
+    meeting_id: int,
+    token: Optional[str],
+    db: AsyncSession
+) -> Optional[ConnectionIdentity]:
+    """Resolve the caller of a handshake to an active participant of the meeting, or None"""
+    if token is None:
+        # Non-browser clients may send the usual header instead of the query parameter
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and credentials:
+            token = credentials
+    user = authenticate_token(token) if token else None
+    if user is None:
+        return None
+    try:
+        participant = (await db.exec(
+            select(Participant).where(
+                Participant.meeting_id == meeting_id,
+                Participant.user_id == user.username,
+                Participant.is_active == True
+            )
+        )).first()
+    finally:
+        # The connection may live for hours; it must not hold a pooled connection
+        await db.close()
+    if participant is None:
+        return None
+    return ConnectionIdentity(user, participant)
+
+async def send_reply(websocket: WebSocket, request_id: Any, data: Dict[str, Any], error: Optional[str] = None):
+    """Answer a command with an ``ack`` carrying data, or a ``nack`` carrying the error"""
+    if error is None:
+        reply = {"type": "ack", "request_id": request_id, "data": data}
+    else:
+        reply = {"type": "nack", "request_id": request_id, "data": {**data, "error": error}}
+    await manager.send_personal_message(json.dumps(reply), websocket)
+
+async def handle_token_command(websocket: WebSocket, meeting_id: int, identity: ConnectionIdentity, message: Dict):
+    """claim, release, force_release or leave_queue for the connection's participant"""
+    command = message["type"]
+    request_id = message.get("request_id")
+    token_event: Optional[TokenEventRead] = None
+    error = None
+    if command == "claim":
+        if not identity.can("claim_token"):
+            error = "forbidden"
+        else:
+            token_event, position = await token_queue.claim(
+                meeting_id, identity.participant_id, identity.role, wait=bool(message.get("queue"))
+            )
+            if position is not None:
+                await send_reply(websocket, request_id, {"command": command, "queued": True, "position": position})
+                return
+            error = "token_held" if token_event is None else None
+    elif command == "leave_queue":
+        if not token_queue.leave(meeting_id, identity.participant_id):
+            error = "not_queued"
+        await send_reply(websocket, request_id, {"command": command}, error)
+        return
+    elif command == "release":
+        token_event = await token_queue.release(meeting_id, identity.participant_id)
+        if token_event is None:
+            error = "no_token" if token_arbiter.current_holder(meeting_id) is None else "not_holder"
+    elif not identity.can("force_token_release"):
+        error = "forbidden"
+    else:
+        token_event = await token_queue.force_release(meeting_id, released_by=identity.participant_id)
+        error = "no_token" if token_event is None else None
+
+    if token_event is None:
+        await send_reply(websocket, request_id, {"command": command}, error)
+        return
+    # token_changed (and any hand-off) was queued for every member before this ack
+    await send_reply(websocket, request_id, {
+        "command": command,
+        "event_id": token_event.id,
+        "participant_id": token_event.participant_id,
+        "seq": manager.room_seq(meeting_id)
+    })
+
+async def handle_phase_command(
+    websocket: WebSocket,
+    meeting_id: int,
+    identity: ConnectionIdentity,
+    message: Dict,
+    db: AsyncSession
+):
+    """change_phase on behalf of the connection's participant"""
+    request_id = message.get("request_id")
+    if not identity.can("manage_phases"):
+        await send_reply(websocket, request_id, {"command": "change_phase"}, "forbidden")
+        return
+    try:
+        phase = await change_meeting_phase(db, meeting_id, message.get("phase_name"), identity.participant_id)
+    except HTTPException as e:
+        await send_reply(websocket, request_id, {"command": "change_phase", "detail": e.detail}, "rejected")
+        return
+    finally:
+        await db.close()
+    await manager.broadcast_phase_change(meeting_id, phase)
+    await send_reply(websocket, request_id, {
+        "command": "change_phase",
+        "phase_id": phase.id,
+        "phase_name": phase.phase_name,
+        "seq": manager.room_seq(meeting_id)
+    })
+
 @router.websocket("/ws/meetings/{meeting_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
     meeting_id: int,
-    token: Optional[str] = None  # In production, you would validate JWT token
+    token: Optional[str] = None,
+    epoch: Optional[str] = None,
+    last_seq: Optional[int] = None,
+    encoding: Optional[str] = None,
+    compression: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_session)
 ):
-    """WebSocket endpoint for meeting real-time communication"""
-    await manager.connect(websocket, meeting_id)
+    """
+    WebSocket endpoint for meeting real-time communication.
 
+    The access token (``token`` query parameter or an ``Authorization:
+    Bearer`` header) must belong to an active participant of the meeting;
+    otherwise the handshake is refused with 403 before it is accepted.
+    The participant and role are bound to the connection, so messages
+    always act as that participant, whatever ``participant_id`` they carry.
+
+    ``claim``, ``release``, ``force_release``, ``leave_queue`` and
+    ``change_phase`` commands take an optional ``request_id``, echoed in the
+    ``ack`` or ``nack`` reply. The resulting ``token_changed`` /
+    ``phase_changed`` event is queued for the whole room before the ack.
+    ``claim`` with ``"queue": true`` joins the waiting line when the token
+    is held (see backend.token_queue).
+
+    Room broadcasts carry a ``seq``. A client reconnecting with the
+    ``epoch`` and ``last_seq`` it last saw (query parameters or a
+    ``resume`` message) gets the missed events, or a room snapshot when
+    they are no longer buffered.
+
+    ``encoding`` (json, msgpack) and ``compression`` (none, deflate), as
+    query parameters or in a ``hello`` message, select the frame format
+    (see backend.utils.frame_codec).
+
+    The server sends ``ping`` to quiet connections; clients answer with
+    ``pong`` or are dropped after WS_PING_TIMEOUT_SECONDS of silence
+    (see backend.heartbeat).
+    """
+    identity = await authenticate_connection(websocket, meeting_id, token, db)
+    if identity is None:
+        # Closing before accept() answers the upgrade request with 403
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    protocol_error = None
     try:
+        wire_format = frame_codec.negotiate(encoding, compression)
+    except ValueError as e:
+        wire_format, protocol_error = frame_codec.DEFAULT_FORMAT, str(e)
+    await manager.connect(websocket, meeting_id, wire_format, identity)
+
+    try:
+        if protocol_error:
+            await manager.send_personal_message(json.dumps({
+                "type": "error", "data": {"request": "protocol", "detail": protocol_error}
+            }), websocket)
+        if last_seq is not None:
+            await manager.resume(websocket, meeting_id, epoch, last_seq)
+        else:
+            await manager.send_personal_message(json.dumps({
+                "type": "connected",
+                "data": {"epoch": manager.epoch, "seq": manager.room_seq(meeting_id)}
+            }), websocket)
+
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            try:
+                message = await frame_codec.receive(websocket)
+            except ValueError as e:
+                manager.touch(websocket)
+                await manager.send_personal_message(json.dumps({
+                    "type": "error", "data": {"request": "frame", "detail": str(e)}
+                }), websocket)
+                continue
+            manager.touch(websocket)
 
             # Handle different message types
             if message.get("type") == "join":
                 # Add participant to meeting room
-                participant_id = message.get("participant_id")
-                participant_name = message.get("participant_name")
+                participant_id = identity.participant_id
+                participant_name = identity.participant_name
 
                 if meeting_id in manager.meeting_rooms:
                     manager.meeting_rooms[meeting_id]["participants"][participant_id] = {
@@ -40,10 +260,91 @@ async def websocket_endpoint(
                         "participant_name": participant_name
                     }
                 }
-                await manager.broadcast(json.dumps(join_message), meeting_id)
+                await manager.broadcast(join_message, meeting_id)
+
+            elif message.get("type") in ("claim", "release", "force_release", "leave_queue"):
+                await handle_token_command(websocket, meeting_id, identity, message)
+
+            elif message.get("type") == "change_phase":
+                await handle_phase_command(websocket, meeting_id, identity, message, db)
+
+            elif message.get("type") == "annotations":
+                # Batched strokes: one group-committed insert, one broadcast
+                if not identity.can("create_annotations"):
+                    await manager.send_personal_message(json.dumps({
+                        "type": "error", "data": {"request": "annotations", "detail": "forbidden"}
+                    }), websocket)
+                    continue
+                try:
+                    annotations = [
+                        AnnotationCreate(**{**item, "participant_id": identity.participant_id})
+                        for item in message.get("annotations", [])
+                    ]
+                except (TypeError, ValidationError) as e:
+                    detail = e.errors(include_url=False) if isinstance(e, ValidationError) else str(e)
+                    await manager.send_personal_message(json.dumps({
+                        "type": "error",
+                        "data": {"request": "annotations", "detail": detail}
+                    }, default=str), websocket)
+                    continue
+
+                created = await annotation_writer.write(
+                    [annotation_row(meeting_id, annotation) for annotation in annotations]
+                )
+                if created:
+                    await manager.broadcast_annotations(
+                        meeting_id, [AnnotationRead.model_validate(annotation) for annotation in created]
+                    )
+
+            elif message.get("type") == "stroke_points":
+                # In-progress stroke: relayed as deltas once per tick, not persisted yet
+                message["participant_id"] = identity.participant_id
+                if not identity.can("create_annotations") or not stroke_relay.add_points(meeting_id, websocket, message):
+                    await manager.send_personal_message(json.dumps({
+                        "type": "error",
+                        "data": {"request": "stroke_points", "stroke_id": message.get("stroke_id")}
+                    }), websocket)
+
+            elif message.get("type") == "stroke_end":
+                await stroke_relay.end(meeting_id, websocket, message.get("stroke_id"), message.get("points"))
+
+            elif message.get("type") == "cursor":
+                stroke_relay.move_cursor(meeting_id, identity.participant_id, message)
+
+            elif message.get("type") == "hello":
+                try:
+                    wire_format = frame_codec.negotiate(message.get("encoding"), message.get("compression"))
+                except ValueError as e:
+                    await manager.send_personal_message(json.dumps({
+                        "type": "error", "data": {"request": "hello", "detail": str(e)}
+                    }), websocket)
+                    continue
+                manager.set_format(websocket, wire_format)
+                await manager.send_personal_message(json.dumps({
+                    "type": "protocol", "data": wire_format._asdict()
+                }), websocket)
+
+            elif message.get("type") == "pong":
+                # Heartbeat answer; receiving it was enough
+                pass
+
+            elif message.get("type") == "resume":
+                epoch, last_seq = message.get("epoch"), message.get("last_seq")
+                if not (epoch is None or isinstance(epoch, str)) or not (
+                    last_seq is None or (type(last_seq) is int and last_seq >= 0)
+                ):
+                    await manager.send_personal_message(json.dumps({
+                        "type": "error",
+                        "data": {
+                            "request": "resume",
+                            "detail": "epoch must be a string and last_seq a non-negative integer",
+                        }
+                    }), websocket)
+                    continue
+                await manager.resume(websocket, meeting_id, epoch, last_seq)
 
             elif message.get("type") == "leave":
-                participant_id = message.get("participant_id")
+                participant_id = identity.participant_id
                 if meeting_id in manager.meeting_rooms and participant_id in manager.meeting_rooms[meeting_id]["participants"]:
                     del manager.meeting_rooms[meeting_id]["participants"][participant_id]
 
@@ -51,8 +352,18 @@ async def websocket_endpoint(
                         "type": "participant_left",
                         "data": {"participant_id": participant_id}
                     }
-                    await manager.broadcast(json.dumps(leave_message), meeting_id)
+                    await manager.broadcast(leave_message, meeting_id)
 
     except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.exception(f"WebSocket handler for meeting {meeting_id} failed: {e}")
+        try:
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+    finally:
+        # Every way out of the handler releases the connection and its participants
         manager.disconnect(websocket, meeting_id)
-        # In a real implementation, you would handle cleanup here
\ No newline at end of file
+        token_queue.leave(meeting_id, identity.participant_id)
+        await stroke_relay.drop_owner(meeting_id, websocket)
\ No newline at end of file
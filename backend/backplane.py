@@ -0,0 +1,273 @@
+"""
+Pub/sub backplane for fan-out across worker processes.
+
+Each process keeps its own WebSocket connections, so a broadcast only
+reaches the sockets of the worker that sent it. Managers therefore deliver
+locally and also publish the message on the backplane; every other process
+subscribed to the topic delivers it to its own sockets.
+
+Envelopes carry the publishing process's ``origin`` and a per-origin
+sequence number. A process ignores its own envelopes (it has already
+delivered them locally) and any sequence number it has already seen.
+
+Implementations:
+
+* ``memory://<name>`` -- in-process hub shared by every backplane created
+  with the same name. Single-worker default; lets tests run several
+  managers as if they were separate workers.
+* ``tcp://host:port`` or ``unix:///path`` -- a small relay hub on a local
+  socket. The first worker to bind the address hosts the hub, the others
+  connect to it, and all of them reconnect (or take over the hub) when it
+  goes away. Stands in for Redis between workers on one host.
+
+Only room broadcasts and WebRTC signaling go through the backplane; the
+expression token and the phase locks are owned by the process holding
+them. ``check_sole_worker`` therefore fails in a worker that finds the
+socket hub hosted by another process, and the app refuses to start there
+rather than let two workers grant the token.
+"""
+import asyncio
+import errno
+import itertools
+import json
+import logging
+import os
+import uuid
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set
+from urllib.parse import urlparse
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], None]
+
+# Envelopes kept while the socket backplane is reconnecting
+OUTBOX_SIZE = 10000
+RECONNECT_DELAY = 0.5
+CONNECT_TIMEOUT = 5.0
+# Longest envelope accepted on the socket (StreamReader defaults to 64 KiB)
+MAX_LINE = 16 * 1024 * 1024
+
+
+class Backplane:
+    """Base class: topic subscriptions, envelopes and origin dedupe"""
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self._sequence = itertools.count(1)
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._last_seen: Dict[str, int] = {}  # origin -> highest sequence delivered
+        self.published = 0
+        self.delivered = 0
+        self.duplicates = 0
+
+    def subscribe(self, topic: str, handler: Handler):
+        """Call handler(data) for every message other processes publish on topic"""
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def publish(self, topic: str, data: dict):
+        """Send data to the other processes without waiting"""
+        self.published += 1
+        self._send({"origin": self.origin, "seq": next(self._sequence), "topic": topic, "data": data})
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def check_sole_worker(self):
+        """Raise RuntimeError if another worker process shares this backplane"""
+
+    def _send(self, envelope: dict):
+        raise NotImplementedError
+
+    def _deliver(self, envelope: dict):
+        origin = envelope["origin"]
+        if origin == self.origin:
+            return
+        if envelope["seq"] <= self._last_seen.get(origin, 0):
+            self.duplicates += 1
+            return
+        self._last_seen[origin] = envelope["seq"]
+        self.delivered += 1
+        for handler in self._handlers.get(envelope["topic"], ()):
+            try:
+                handler(envelope["data"])
+            except Exception as e:
+                logger.exception(f"Backplane handler for {envelope['topic']} failed: {e}")
+
+
+class InProcessBackplane(Backplane):
+    """Hub shared by every InProcessBackplane with the same name in this process"""
+
+    _hubs: Dict[str, Set["InProcessBackplane"]] = {}
+
+    def __init__(self, name: str = "default"):
+        super().__init__()
+        self.name = name
+        self._hubs.setdefault(name, set()).add(self)
+
+    async def stop(self):
+        self._hubs.get(self.name, set()).discard(self)
+
+    def _send(self, envelope: dict):
+        loop = asyncio.get_running_loop()
+        for peer in self._hubs.get(self.name, ()):
+            if peer is not self:
+                loop.call_soon(peer._deliver, envelope)
+
+
+class SocketBackplane(Backplane):
+    """Newline-delimited JSON relayed through a hub on a TCP or Unix socket"""
+
+    def __init__(self, url: str):
+        super().__init__()
+        self.url = url
+        parsed = urlparse(url)
+        if parsed.scheme == "unix":
+            self.path: Optional[str] = parsed.path
+        elif parsed.scheme == "tcp":
+            self.path = None
+            self.host = parsed.hostname or "127.0.0.1"
+            self.port = parsed.port
+        else:
+            raise ValueError(f"Unknown backplane URL: {url}")
+        self.is_hub = False
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._hub_clients: Set[asyncio.StreamWriter] = set()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._outbox: Deque[bytes] = deque(maxlen=OUTBOX_SIZE)
+        self._connected = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._connected.wait(), CONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Keep serving local rooms; messages wait in the outbox meanwhile
+            logger.warning(f"Backplane not reachable after {CONNECT_TIMEOUT}s, retrying in the background")
+
+    def check_sole_worker(self):
+        # The first worker to bind the address hosts the hub
+        if not self.is_hub:
+            raise RuntimeError(
+                f"Another worker hosts the backplane at {self.url}; the expression token and phase "
+                "state have one owner per process, so only one worker may run"
+            )
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._close_hub()
+
+    def _send(self, envelope: dict):
+        line = json.dumps(envelope, separators=(",", ":")).encode() + b"\n"
+        if self._writer is not None and not self._writer.is_closing():
+            self._writer.write(line)
+        else:
+            self._outbox.append(line)
+
+    async def _run(self):
+        while True:
+            try:
+                await self._serve_or_connect()
+            except (OSError, ValueError) as e:
+                logger.warning(f"Backplane connection lost: {e}")
+            self._writer = None
+            self._connected.clear()
+            await self._close_hub()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _serve_or_connect(self):
+        if self._server is None:
+            try:
+                self._server = await self._start_hub()
+                self.is_hub = True
+            except OSError as e:
+                if e.errno != errno.EADDRINUSE:
+                    raise
+        try:
+            reader, writer = await self._open_connection()
+        except ConnectionRefusedError:
+            # A Unix socket file left behind by a hub that died
+            if self.path is not None and not self.is_hub and os.path.exists(self.path):
+                os.unlink(self.path)
+            raise
+
+        self._writer = writer
+        while self._outbox:
+            writer.write(self._outbox.popleft())
+        self._connected.set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    raise ConnectionResetError("backplane hub closed the connection")
+                self._deliver(json.loads(line))
+        finally:
+            writer.close()
+
+    async def _start_hub(self) -> asyncio.AbstractServer:
+        if self.path is not None:
+            if os.path.exists(self.path):
+                raise OSError(errno.EADDRINUSE, "backplane socket already exists")
+            return await asyncio.start_unix_server(self._relay, path=self.path, limit=MAX_LINE)
+        return await asyncio.start_server(self._relay, self.host, self.port, limit=MAX_LINE)
+
+    async def _open_connection(self):
+        if self.path is not None:
+            return await asyncio.open_unix_connection(self.path, limit=MAX_LINE)
+        return await asyncio.open_connection(self.host, self.port, limit=MAX_LINE)
+
+    async def _relay(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Hub side: forward every line from one worker to all workers"""
+        self._hub_clients.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                for client in list(self._hub_clients):
+                    if client.is_closing():
+                        self._hub_clients.discard(client)
+                    else:
+                        client.write(line)
+        except (OSError, ValueError):
+            pass
+        finally:
+            self._hub_clients.discard(writer)
+            writer.close()
+
+    async def _close_hub(self):
+        if self._server is None:
+            return
+        self._server.close()
+        for client in list(self._hub_clients):
+            client.close()
+        self._hub_clients.clear()
+        await self._server.wait_closed()
+        self._server = None
+        self.is_hub = False
+        if self.path is not None and os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def create_backplane(url: Optional[str] = None) -> Backplane:
+    """Build the backplane for a URL (memory://, tcp://host:port or unix:///path)"""
+    url = url or settings.BACKPLANE_URL
+    if url.startswith("memory://"):
+        return InProcessBackplane(url[len("memory://"):] or "default")
+    return SocketBackplane(url)
+
+
+# Global backplane shared by the connection managers
+backplane = create_backplane()
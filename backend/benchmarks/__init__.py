@@ -0,0 +1,7 @@
+"""
+Performance benchmarks for the Nex-Champs backend.
+
+Each module is a standalone script, e.g.::
+
+    python -m backend.benchmarks.bench_stats
+"""
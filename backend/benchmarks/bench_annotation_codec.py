@@ -0,0 +1,61 @@
+"""
+Benchmark the packed stroke format against plain JSON content.
+
+Reports stored size and encode/decode throughput for freehand strokes of
+increasing length, with integer and sub-pixel coordinates.
+
+    python -m backend.benchmarks.bench_annotation_codec
+"""
+import json
+import random
+import time
+
+from backend.utils.annotation_codec import encode_content, decode_content
+
+LENGTHS = [100, 1_000, 5_000]
+ROUNDS = 200
+
+
+def freehand_stroke(points: int, subpixel: bool, seed: int = 0):
+    """Random-walk stroke, as produced by a mouse or pen"""
+    rng = random.Random(seed)
+    x, y = 400.0, 300.0
+    stroke = []
+    for _ in range(points):
+        x += rng.uniform(-4, 4)
+        y += rng.uniform(-4, 4)
+        stroke.append([round(x, 2), round(y, 2)] if subpixel else [int(x), int(y)])
+    return {"points": stroke, "color": "#1d4ed8", "lineWidth": 3}
+
+
+def rate(fn, rounds: int = ROUNDS) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return rounds / (time.perf_counter() - start)
+
+
+def main():
+    header = f"{'points':>7} {'coords':>8} {'format':>12} {'bytes':>9} {'ratio':>6} {'enc/s':>9} {'dec/s':>9}"
+    print(header)
+    print("-" * len(header))
+    for length in LENGTHS:
+        for subpixel in (False, True):
+            content = freehand_stroke(length, subpixel)
+            text = json.dumps(content)
+            json_size = len(text.encode())
+            coords = "float" if subpixel else "int"
+            print(f"{length:>7} {coords:>8} {'json':>12} {json_size:>9} {1.0:>6.1f} "
+                  f"{rate(lambda: json.dumps(content)):>9.0f} {rate(lambda: json.loads(text)):>9.0f}")
+            for compression in ("none", "zlib"):
+                stored, packed = encode_content("drawing", content, compression)
+                size = len(stored.encode()) + len(packed)
+                assert decode_content(stored, packed)["points"] == content["points"] or subpixel
+                enc = rate(lambda: encode_content("drawing", content, compression))
+                dec = rate(lambda: decode_content(stored, packed))
+                print(f"{length:>7} {coords:>8} {'packed+' + compression:>12} {size:>9} "
+                      f"{json_size / size:>6.1f} {enc:>9.0f} {dec:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
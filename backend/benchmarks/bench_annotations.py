@@ -0,0 +1,80 @@
+"""
+Benchmark annotation ingestion throughput on a single SQLite file.
+
+Compares one INSERT + COMMIT per stroke (the previous create_annotation)
+with the group-commit writer fed by many concurrent single-stroke
+requests and by batched requests.
+
+    python -m backend.benchmarks.bench_annotations
+"""
+import asyncio
+import json
+import time
+
+from sqlmodel import Session
+
+from backend.annotation_writer import AnnotationWriter, annotation_row
+from backend.benchmarks.common import temp_database
+from backend.models.annotations import Annotation, AnnotationCreate
+
+STROKE = AnnotationCreate(
+    meeting_id=1,
+    participant_id=1,
+    annotation_type="drawing",
+    content={"points": [[i, i * 2] for i in range(32)], "color": "#ff0000", "width": 2},
+    timestamp_ms=0,
+)
+
+
+def per_row_commit(engine, total: int) -> float:
+    start = time.perf_counter()
+    with Session(engine) as db:
+        for _ in range(total):
+            annotation = Annotation(
+                meeting_id=1,
+                participant_id=STROKE.participant_id,
+                annotation_type=STROKE.annotation_type,
+                content=json.dumps(STROKE.content),
+                timestamp_ms=STROKE.timestamp_ms,
+            )
+            db.add(annotation)
+            db.commit()
+            db.refresh(annotation)
+    return total / (time.perf_counter() - start)
+
+
+async def group_commit(async_engine, clients: int, per_client: int, batch: int) -> float:
+    writer = AnnotationWriter()
+    writer.start(async_engine)
+
+    async def client():
+        for _ in range(per_client):
+            await writer.write([annotation_row(1, STROKE) for _ in range(batch)])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    await writer.stop()
+    return clients * per_client * batch / elapsed
+
+
+def main():
+    print(f"{'scenario':<44} {'annotations/s':>14}")
+    with temp_database() as (engine, async_engine):
+        rate = per_row_commit(engine, 500)
+        print(f"{'per-row commit (500 strokes)':<44} {rate:>14,.0f}")
+
+        async def run():
+            results = [
+                ("group commit, 200 clients x 1 stroke", await group_commit(async_engine, 200, 50, 1)),
+                ("group commit, 50 clients x 20-stroke batch", await group_commit(async_engine, 50, 20, 20)),
+            ]
+            await async_engine.dispose()
+            return results
+
+        for name, rate in asyncio.run(run()):
+            print(f"{name:<44} {rate:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
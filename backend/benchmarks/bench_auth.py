@@ -0,0 +1,38 @@
+"""
+Benchmark get_current_user with and without the verified-token cache.
+
+    python -m backend.benchmarks.bench_auth
+"""
+import asyncio
+import time
+
+from backend.utils.auth import create_access_token, get_current_user, token_cache
+
+ROUNDS = 20_000
+USERS = 100
+
+
+async def run(tokens, cached: bool) -> float:
+    token_cache.clear()
+    token_cache.max_size = len(tokens) if cached else 0
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        await get_current_user(tokens[i % len(tokens)])
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def main():
+    tokens = [create_access_token({"sub": f"user{i}", "user_id": i}) for i in range(USERS)]
+    max_size = token_cache.max_size
+    try:
+        uncached = asyncio.run(run(tokens, cached=False))
+        cached = asyncio.run(run(tokens, cached=True))
+    finally:
+        token_cache.max_size = max_size
+        token_cache.clear()
+    print(f"{'decode every request':<22} {uncached * 1e6:>8.1f} µs/request")
+    print(f"{'token cache':<22} {cached * 1e6:>8.1f} µs/request  ({uncached / cached:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark what the stall detector and the sampling profiler cost a busy
+event loop.
+
+Runs the same loop workload (many tasks serializing small messages and
+yielding) bare, with the stall detector at its default threshold, and
+with the profiler at several sampling intervals, and reports the
+slowdown.
+
+    python -m backend.benchmarks.bench_diagnostics
+"""
+import asyncio
+import json
+import tempfile
+import time
+
+from backend.diagnostics import SamplingProfiler, StallDetector
+
+TASKS = 200
+STEPS = 500
+
+
+async def workload() -> float:
+    message = {"type": "cursor", "data": {"participant_id": 7, "x": 0.25, "y": 0.75}}
+
+    async def task():
+        for _ in range(STEPS):
+            json.loads(json.dumps(message))
+            await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(task() for _ in range(TASKS)))
+    return time.perf_counter() - start
+
+
+async def bare() -> float:
+    return await workload()
+
+
+async def with_detector() -> float:
+    detector = StallDetector()
+    detector.start()
+    elapsed = await workload()
+    await detector.stop()
+    return elapsed
+
+
+def with_profiler(interval_ms: float):
+    async def run() -> float:
+        with tempfile.TemporaryDirectory() as directory:
+            profiler = SamplingProfiler(interval_ms=interval_ms, output_dir=directory)
+            profiler.start()
+            elapsed = await workload()
+            profiler.stop()
+        return elapsed
+    return run
+
+
+def main():
+    runs = [("bare", bare), ("stall detector", with_detector)]
+    runs += [(f"profiler {interval}ms", with_profiler(interval)) for interval in (10, 5, 1)]
+    results = [(name, min(asyncio.run(run()) for _ in range(3))) for name, run in runs]
+    baseline = results[0][1]
+    print(f"{TASKS} tasks x {STEPS} steps, best of 3")
+    print(f"{'mode':<16} {'seconds':>8} {'slowdown':>9}")
+    for name, elapsed in results:
+        print(f"{name:<16} {elapsed:>8.3f} {(elapsed / baseline - 1) * 100:>8.1f}%")
+
+
+if __name__ == "__main__":
+    main()
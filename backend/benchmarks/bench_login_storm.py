@@ -0,0 +1,147 @@
+"""
+Benchmark WebSocket broadcast latency during a login storm.
+
+A room of simulated WebSocket clients receives a broadcast every few
+milliseconds while 100 clients log in at once through the ASGI app.
+Password verification runs either inline on the event loop (the old
+behaviour) or on the password hasher's thread or process pool; with a
+pool, broadcast latency should stay close to the idle baseline. Latency is
+measured from when each broadcast was due, so event-loop stalls count.
+
+Without the bcrypt package passlib falls back to a backend that holds the
+GIL, and only the process pool keeps the loop free.
+
+    python -m backend.benchmarks.bench_login_storm
+"""
+import asyncio
+import time
+
+import httpx
+from fastapi.websockets import WebSocketState
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import backend.api.auth as auth_api
+from backend.benchmarks.common import percentiles, temp_database
+from backend.database import get_async_session
+from backend.main import app
+from backend.models.users import User
+from backend.password_hasher import PasswordHasher
+from backend.utils import auth
+from backend.websocket import ConnectionManager
+
+LOGINS = 100
+ROOM_SIZE = 20
+TICK = 0.005
+PASSWORD = "Storm-Passw0rd!"
+
+
+class FakeWebSocket:
+    client_state = WebSocketState.CONNECTED
+
+    def __init__(self, latencies):
+        self.latencies = latencies
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        # message is the time the broadcast was due
+        self.latencies.append(time.perf_counter() - float(message))
+
+
+class InlineHasher(PasswordHasher):
+    """Hashes on the event loop, as the endpoints used to"""
+
+    async def start(self):
+        pass
+
+    async def _run(self, fn, *args):
+        return fn(*args)
+
+
+def hash_scheme() -> str:
+    handler = auth.pwd_context.handler()
+    backend = handler.get_backend() if hasattr(handler, "get_backend") else "default"
+    return f"{handler.name} ({backend} backend)"
+
+
+async def scenario(client, hasher, logins: int):
+    manager = ConnectionManager()
+    latencies = []
+    for _ in range(ROOM_SIZE):
+        await manager.connect(FakeWebSocket(latencies), 1)
+
+    async def ticker(stop: asyncio.Event):
+        due = time.perf_counter()
+        while not stop.is_set():
+            await manager.broadcast(repr(due), 1)
+            due += TICK
+            # Broadcasts missed during a stall are still due, and late
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+
+    auth_api.password_hasher = hasher
+    await hasher.start()
+    stop = asyncio.Event()
+    ticking = asyncio.create_task(ticker(stop))
+    await asyncio.sleep(0.2)
+    start = time.perf_counter()
+    responses = await asyncio.gather(*[
+        client.post("/api/v1/auth/token", data={"username": "storm", "password": PASSWORD})
+        for _ in range(logins)
+    ])
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.2)
+    stop.set()
+    await ticking
+    for websocket in list(manager.senders):
+        manager.disconnect(websocket, 1)
+    hasher.shutdown()
+
+    statuses = {}
+    for response in responses:
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return percentiles(latencies), max(latencies) * 1000, statuses, elapsed
+
+
+async def run(engine, async_engine):
+    scheme = hash_scheme()
+    with Session(engine) as session:
+        session.add(User(username="storm", email="storm@example.com", full_name="Storm",
+                         hashed_password=auth.get_password_hash(PASSWORD)))
+        session.commit()
+
+    session_maker = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def bench_session():
+        async with session_maker() as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = bench_session
+
+    print(f"{LOGINS} concurrent logins, {ROOM_SIZE} clients in the room, password hash: {scheme}")
+    header = f"{'mode':<14} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'wall s':>7}  statuses"
+    print(header)
+    print("-" * len(header))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for mode, hasher, logins in (
+            ("idle", PasswordHasher(), 0),
+            ("inline", InlineHasher(), LOGINS),
+            ("thread pool", PasswordHasher(executor="thread"), LOGINS),
+            ("process pool", PasswordHasher(executor="process"), LOGINS),
+        ):
+            stats, worst, statuses, elapsed = await scenario(client, hasher, logins)
+            print(f"{mode:<14} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} "
+                  f"{worst:>8.1f} {elapsed:>7.2f}  {statuses or '-'}")
+    app.dependency_overrides.pop(get_async_session, None)
+
+
+def main():
+    with temp_database() as (engine, async_engine):
+        asyncio.run(run(engine, async_engine))
+
+
+if __name__ == "__main__":
+    main()
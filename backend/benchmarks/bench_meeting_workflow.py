@@ -0,0 +1,376 @@
+"""
+Load test of the whole meeting workflow against the ASGI app, in process.
+
+MEETINGS meetings with PARTICIPANTS members each run at the same time on
+a fresh SQLite file. No server or network is needed. Each meeting:
+
+- is created by its facilitator and joined by every member (REST)
+- has every member connect to the meeting WebSocket
+- runs ROUNDS rounds of every member in turn claiming the expression
+  token, drawing a batch of annotations and releasing the token, with
+  the facilitator reading the meeting stats after each round
+- moves through the phases as the rounds go by
+
+Token, annotation and phase operations alternate between REST and
+WebSocket commands from one round to the next. A WebSocket command
+counts as done when the app acks it, or for annotations when the
+sender receives the broadcast. Every operation is timed. The workload
+runs --repeat times, and the report gives the best throughput and
+p50/p95/p99 latency of each operation across the runs.
+
+The results are compared with a stored baseline. The run fails (exit
+status 1) when an operation's p50 or p95 latency, or the overall
+throughput, is worse than the baseline by more than the tolerance.
+Baselines are machine-specific. Record one on the machine that runs the
+check with --update-baseline.
+
+    python -m backend.benchmarks.bench_meeting_workflow
+    python -m backend.benchmarks.bench_meeting_workflow --meetings 20 --participants 8 --update-baseline
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from backend.annotation_writer import annotation_writer
+from backend.benchmarks.common import ASGIWebSocket, percentiles, temp_database
+from backend.database import (
+    apply_sqlite_profile, create_async_engines, get_async_session, get_db, get_session, make_async_session_maker,
+)
+from backend.main import app
+from backend.models.users import User
+from backend.token_arbiter import token_arbiter
+from backend.token_queue import token_queue
+from backend.utils.auth import create_access_token
+
+MEETINGS = 10
+PARTICIPANTS = 6
+ROUNDS = 4
+STROKES = 5  # annotations drawn per turn
+PHASES = ["clarification", "decision", "feedback"]
+
+BASELINE = os.path.join(os.path.dirname(__file__), "meeting_workflow_baseline.json")
+TOLERANCE = 0.5
+# Latency differences under this are noise whatever the ratio
+SLACK_MS = 2.0
+# p95 of an operation seen fewer times than this is one or two samples; only its p50 is checked
+MIN_P95_SAMPLES = 50
+REPEAT = 3
+
+
+class Recorder:
+    """Latency samples per operation name"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    async def time(self, name: str, operation):
+        start = time.perf_counter()
+        result = await operation
+        self.samples[name].append(time.perf_counter() - start)
+        return result
+
+
+class Member:
+    """A meeting member with a REST identity and a meeting WebSocket"""
+
+    def __init__(self, username: str, user_id: int):
+        self.username = username
+        self.token = create_access_token({"sub": username, "user_id": user_id})
+        self.headers = {"Authorization": f"Bearer {self.token}"}
+        self.participant_id: Optional[int] = None
+        self.socket: Optional[ASGIWebSocket] = None
+        self.acks: Dict[str, asyncio.Future] = {}  # request_id -> future of the ack/nack
+        self.drawn: Optional[asyncio.Future] = None  # own annotations_created broadcast
+        self._requests = itertools.count()
+        self._reader: Optional[asyncio.Task] = None
+
+    async def connect(self, meeting_id: int):
+        self.socket = ASGIWebSocket(app, f"/api/v1/ws/ws/meetings/{meeting_id}", f"token={self.token}")
+        if not await self.socket.connect():
+            raise RuntimeError(f"{self.username} was refused by meeting {meeting_id}")
+        await self.socket.receive_json()  # connected
+        self._reader = asyncio.create_task(self._read())
+        await self.socket.send_json({"type": "join"})
+
+    async def command(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a WebSocket command and wait for its ack; raises on a nack"""
+        request_id = f"{self.username}-{next(self._requests)}"
+        future = self.acks[request_id] = asyncio.get_running_loop().create_future()
+        await self.socket.send_json({**message, "request_id": request_id})
+        reply = await future
+        if reply["type"] != "ack":
+            raise RuntimeError(f"{message['type']} refused: {reply['data']}")
+        return reply
+
+    async def draw(self, annotations: List[Dict[str, Any]]):
+        """Send annotations over the WebSocket and wait for their broadcast to come back"""
+        self.drawn = asyncio.get_running_loop().create_future()
+        await self.socket.send_json({"type": "annotations", "annotations": annotations})
+        await self.drawn
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+        if self.socket is not None:
+            await self.socket.close()
+
+    async def _read(self):
+        while True:
+            message = await self.socket.receive_json()
+            if message["type"] in ("ack", "nack"):
+                future = self.acks.pop(message["request_id"], None)
+                if future is not None:
+                    future.set_result(message)
+            elif message["type"] == "annotations_created":
+                if self.drawn is not None and not self.drawn.done() and any(
+                    annotation["participant_id"] == self.participant_id for annotation in message["data"]
+                ):
+                    self.drawn.set_result(None)
+            elif message["type"] == "ping":
+                await self.socket.send_json({"type": "pong"})
+
+
+def strokes(meeting_id: int, turn: int) -> List[Dict[str, Any]]:
+    return [
+        {"meeting_id": meeting_id, "annotation_type": "drawing", "timestamp_ms": turn * 1000 + i,
+         "content": {"points": [[i, i], [i + 1, i + 2], [i + 3, i + 5]], "color": "#1e88e5", "width": 2}}
+        for i in range(STROKES)
+    ]
+
+
+async def run_meeting(client: httpx.AsyncClient, recorder: Recorder, members: List[Member]):
+    facilitator = members[0]
+    response = await recorder.time("rest.create_meeting", client.post(
+        "/api/v1/meetings/", json={"name": f"load {facilitator.username}"}, headers=facilitator.headers
+    ))
+    response.raise_for_status()
+    meeting_id = response.json()["id"]
+    for member in members:
+        response = await recorder.time("rest.join", client.post(
+            f"/api/v1/meetings/{meeting_id}/join", headers=member.headers
+        ))
+        response.raise_for_status()
+        member.participant_id = response.json()["id"]
+    for member in members:
+        await recorder.time("ws.connect", member.connect(meeting_id))
+
+    turn = 0
+    phases = iter(PHASES)
+    for round_number in range(ROUNDS):
+        over_websocket = round_number % 2 == 0
+        for member in members:
+            turn += 1
+            body = {"meeting_id": meeting_id, "participant_id": member.participant_id}
+            if over_websocket:
+                await recorder.time("ws.claim", member.command({"type": "claim"}))
+                await recorder.time("ws.annotations", member.draw(strokes(meeting_id, turn)))
+                await recorder.time("ws.release", member.command({"type": "release"}))
+            else:
+                for name, path, payload in (
+                    ("rest.claim", f"/api/v1/tokens/meetings/{meeting_id}/claim", {**body, "event_type": "claim"}),
+                    ("rest.annotations", f"/api/v1/annotations/meetings/{meeting_id}/batch", strokes(meeting_id, turn)),
+                    ("rest.release", f"/api/v1/tokens/meetings/{meeting_id}/release", {**body, "event_type": "release"}),
+                ):
+                    response = await recorder.time(name, client.post(path, json=payload, headers=member.headers))
+                    response.raise_for_status()
+        response = await recorder.time("rest.stats", client.get(
+            f"/api/v1/stats/meetings/{meeting_id}/stats", headers=facilitator.headers
+        ))
+        response.raise_for_status()
+        phase = next(phases, None)
+        if phase is None:
+            continue
+        if over_websocket:
+            await recorder.time("ws.change_phase", facilitator.command({"type": "change_phase", "phase_name": phase}))
+        else:
+            response = await recorder.time("rest.change_phase", client.post(
+                f"/api/v1/phases/meetings/{meeting_id}/change",
+                json={"meeting_id": meeting_id, "phase_name": phase, "started_by": facilitator.participant_id},
+                headers=facilitator.headers,
+            ))
+            response.raise_for_status()
+
+    for member in members:
+        await member.close()
+
+
+async def run_load(meetings: List[List[Member]], reader, writer) -> Dict[str, Any]:
+    token_queue.start()
+    annotation_writer.start(writer)
+    recorder = Recorder()
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(run_meeting(client, recorder, members) for members in meetings))
+            elapsed = time.perf_counter() - start
+    finally:
+        await annotation_writer.stop()
+        await token_queue.stop()
+        for bind in {reader, writer}:
+            await bind.dispose()
+    operations = {
+        name: {"count": len(samples), **percentiles(samples)}
+        for name, samples in sorted(recorder.samples.items())
+    }
+    total = sum(operation["count"] for operation in operations.values())
+    return {"seconds": elapsed, "operations_total": total, "throughput_ops_s": total / elapsed,
+            "operations": operations}
+
+
+def run(meeting_count: int, participants: int) -> Dict[str, Any]:
+    with temp_database() as (engine, _):
+        # The same SQLite profile as the app's own engines
+        engine.dispose()
+        apply_sqlite_profile(engine)
+        reader, writer = create_async_engines(f"sqlite+aiosqlite:///{engine.url.database}")
+        session_maker = make_async_session_maker(reader, writer)
+
+        users = meeting_count * participants
+        with Session(engine) as db:
+            db.execute(insert(User), [
+                {"id": i, "username": f"user{i}", "email": f"user{i}@bench.local", "hashed_password": "-",
+                 "full_name": f"User {i}"}
+                for i in range(1, users + 1)
+            ])
+            db.commit()
+        meetings = [
+            [Member(f"user{i}", i) for i in range(first, first + participants)]
+            for first in range(1, users + 1, participants)
+        ]
+
+        def override_db():
+            with Session(engine) as session:
+                yield session
+
+        async def override_async_session():
+            async with session_maker() as session:
+                yield session
+
+        app.dependency_overrides[get_db] = override_db
+        app.dependency_overrides[get_session] = override_db
+        app.dependency_overrides[get_async_session] = override_async_session
+        token_arbiter.start(engine)
+        try:
+            result = asyncio.run(run_load(meetings, reader, writer))
+        finally:
+            token_arbiter.stop()
+            app.dependency_overrides.clear()
+    result["config"] = {"meetings": meeting_count, "participants": participants, "rounds": ROUNDS,
+                        "strokes": STROKES}
+    return result
+
+
+def best(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Best of each statistic over repeated runs, which keeps scheduling noise out of the check"""
+    combined = dict(results[0])
+    combined["seconds"] = min(result["seconds"] for result in results)
+    combined["throughput_ops_s"] = max(result["throughput_ops_s"] for result in results)
+    combined["operations"] = {
+        name: {
+            key: operation[key] if key == "count" else min(result["operations"][name][key] for result in results)
+            for key in operation
+        }
+        for name, operation in results[0]["operations"].items()
+    }
+    combined["runs"] = len(results)
+    return combined
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of result against baseline, as readable lines"""
+    regressions = []
+    for name, operation in result["operations"].items():
+        reference = baseline["operations"].get(name)
+        if reference is None:
+            continue
+        checked = ("p50_ms", "p95_ms") if operation["count"] >= MIN_P95_SAMPLES else ("p50_ms",)
+        for key in checked:
+            limit = max(reference[key] * (1 + tolerance), reference[key] + SLACK_MS)
+            if operation[key] > limit:
+                regressions.append(f"{name} {key[:-3]} {operation[key]:.2f}ms > {limit:.2f}ms "
+                                   f"(baseline {reference[key]:.2f}ms)")
+    floor = baseline["throughput_ops_s"] * (1 - tolerance)
+    if result["throughput_ops_s"] < floor:
+        regressions.append(f"throughput {result['throughput_ops_s']:.0f} ops/s < {floor:.0f} ops/s "
+                           f"(baseline {baseline['throughput_ops_s']:.0f} ops/s)")
+    return regressions
+
+
+def report(result: Dict[str, Any], baseline: Optional[Dict[str, Any]]):
+    config = result["config"]
+    print(f"{config['meetings']} meetings x {config['participants']} participants, {config['rounds']} rounds, "
+          f"best of {result['runs']}: {result['operations_total']} operations in {result['seconds']:.2f}s "
+          f"({result['throughput_ops_s']:.0f} ops/s)")
+    print(f"{'operation':<20} {'count':>6} {'ops/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'base p95':>9}")
+    for name, operation in result["operations"].items():
+        reference = (baseline or {}).get("operations", {}).get(name)
+        base = f"{reference['p95_ms']:>9.2f}" if reference else f"{'-':>9}"
+        print(f"{name:<20} {operation['count']:>6} {operation['count'] / result['seconds']:>7.0f} "
+              f"{operation['p50_ms']:>8.2f} {operation['p95_ms']:>8.2f} {operation['p99_ms']:>8.2f} {base}")
+
+
+def rounded(value):
+    if isinstance(value, float):
+        return round(value, 3)
+    if isinstance(value, dict):
+        return {key: rounded(item) for key, item in value.items()}
+    return value
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--meetings", type=int, default=MEETINGS)
+    parser.add_argument("--participants", type=int, default=PARTICIPANTS)
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="runs to take the best of")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON to compare with or update")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="allowed slowdown as a fraction of the baseline (default %(default)s)")
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--output", help="also write the results of this run to this JSON file")
+    args = parser.parse_args(argv)
+
+    result = best([run(args.meetings, args.participants) for _ in range(args.repeat)])
+    baseline = None
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as source:
+            baseline = json.load(source)
+    report(result, baseline)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(rounded(result), output, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as output:
+            json.dump(rounded(result), output, indent=2, sort_keys=True)
+            output.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to record one")
+        return 0
+    if baseline["config"] != result["config"]:
+        print(f"\nBaseline was recorded with {baseline['config']}; not comparing")
+        return 0
+    regressions = compare(result, baseline, args.tolerance)
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression(s) over {args.tolerance:.0%} of the baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\n✓ Within {args.tolerance:.0%} of the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
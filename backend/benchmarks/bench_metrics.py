@@ -0,0 +1,80 @@
+"""
+Benchmark the per-request cost of the metrics middleware.
+
+Calls a minimal FastAPI route directly through the ASGI interface (no
+HTTP client or server in the way) with and without MetricsMiddleware and
+reports the difference in microseconds per request. Also times rendering
+/metrics for a process with many routes and rooms.
+
+    python -m backend.benchmarks.bench_metrics
+"""
+import asyncio
+import time
+
+from fastapi import FastAPI
+
+from backend.api.metrics import render_metrics
+from backend.metrics import Metrics, MetricsMiddleware, metrics
+
+REQUESTS = 20000
+ROUNDS = 5
+
+
+def build_app(instrumented: bool):
+    app = FastAPI()
+
+    @app.get("/meetings/{meeting_id}/ping")
+    async def ping(meeting_id: int):
+        return {"meeting_id": meeting_id}
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware, registry=Metrics())
+    return app
+
+
+async def drive(app) -> float:
+    """Best seconds per request over ROUNDS rounds of REQUESTS calls"""
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for i in range(REQUESTS):
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                "scheme": "http", "path": f"/meetings/{i % 50}/ping", "raw_path": b"", "root_path": "",
+                "query_string": b"", "headers": [], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+            }
+            await app(scope, receive, send)
+        best = min(best, (time.perf_counter() - start) / REQUESTS)
+    return best
+
+
+async def run():
+    plain = await drive(build_app(False))
+    instrumented = await drive(build_app(True))
+    for i in range(200):
+        metrics.record_request("GET", f"/api/v1/route{i}", 200, 0.001 * i, [i % 5, 0.0001])
+    start = time.perf_counter()
+    for _ in range(100):
+        body = render_metrics()
+    render = (time.perf_counter() - start) / 100
+    return plain, instrumented, render, len(body)
+
+
+def main():
+    plain, instrumented, render, size = asyncio.run(run())
+    print(f"{REQUESTS} requests x best of {ROUNDS}")
+    print(f"{'app':<22} {'us/request':>11}")
+    print(f"{'without middleware':<22} {plain * 1e6:>11.1f}")
+    print(f"{'with MetricsMiddleware':<22} {instrumented * 1e6:>11.1f}")
+    print(f"{'overhead':<22} {(instrumented - plain) * 1e6:>11.1f}")
+    print(f"\n/metrics with 200 routes: {render * 1000:.2f} ms, {size} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark the per-statement cost of SQL logging.
+
+Runs the same primary-key lookups on a SQLite file with SQLAlchemy's
+echo (written to /dev/null, so terminal speed is not counted) and with
+each query log mode. Reports microseconds per statement.
+
+    python -m backend.benchmarks.bench_query_log
+"""
+import logging
+import os
+from contextlib import redirect_stdout
+
+from sqlalchemy import create_engine, select
+from sqlmodel import Session
+
+from backend.benchmarks.common import best_of, temp_database
+from backend.models.meetings import Meeting
+from backend.query_log import QueryLog
+
+STATEMENTS = 5000
+
+
+def lookups(engine):
+    with engine.connect() as conn:
+        for i in range(STATEMENTS):
+            conn.execute(select(Meeting.name).where(Meeting.id == i % 100 + 1)).all()
+
+
+def main():
+    with temp_database() as (setup_engine, _), open(os.devnull, "w") as devnull:
+        with Session(setup_engine) as session:
+            session.add_all(Meeting(id=i, name=f"m{i}") for i in range(1, 101))
+            session.commit()
+        url = setup_engine.url
+
+        with redirect_stdout(devnull):
+            # echo attaches its stdout handler when the engine is created
+            echo_engine = create_engine(url, echo=True)
+            echo = best_of(lambda: lookups(echo_engine))
+        echo_engine.dispose()
+        logging.getLogger("sqlalchemy.engine.Engine").handlers.clear()
+
+        results = [("echo", echo)]
+        for mode in ("off", "slow", "sampled"):
+            engine = create_engine(url)
+            query_log = QueryLog(mode=mode, sample_rate=0.01)
+            query_log.install(engine)
+            query_log.start(logging.StreamHandler(devnull))
+            results.append((mode, best_of(lambda: lookups(engine))))
+            query_log.stop()
+            engine.dispose()
+
+    print(f"{STATEMENTS} primary-key lookups")
+    print(f"{'logging':<10} {'us/statement':>13}")
+    for name, elapsed in results:
+        print(f"{name:<10} {elapsed / STATEMENTS * 1e6:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Load test of WebRTC signaling traffic per join in a full-mesh room.
+
+Peers join one at a time. Each newcomer negotiates with every peer already
+in the room: an offer and an answer, then both sides trickle ICE
+candidates a few milliseconds apart. Counts the messages and bytes the
+server sends per join when everything is broadcast to the room (old
+behaviour: O(N^2)) versus addressed to the one peer concerned, with ICE
+candidates batched (O(N)).
+
+    python -m backend.benchmarks.bench_signaling
+"""
+import asyncio
+
+from backend.api.webrtc import WebRTCManager
+from backend.backplane import InProcessBackplane
+
+ROOM_SIZES = [4, 8, 16, 32]
+CANDIDATES = 5
+TRICKLE_INTERVAL = 0.002
+
+
+class CountingWebSocket:
+    def __init__(self, counters):
+        self.counters = counters
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        self.counters["messages"] += 1
+        self.counters["bytes"] += len(message)
+
+
+def candidate(peer: str, n: int) -> dict:
+    return {
+        "candidate": f"candidate:{n} 1 udp 2122260223 192.168.1.{n} 5{n:04d} typ host",
+        "sdpMid": "0",
+        "sdpMLineIndex": 0,
+        "usernameFragment": peer,
+    }
+
+
+async def negotiate(manager: WebRTCManager, newcomer: str, peer: str, targeted: bool):
+    offer = {"type": "offer", "sdp": "v=0 " + "a" * 1500}
+    answer = {"type": "answer", "sdp": "v=0 " + "b" * 1500}
+    if targeted:
+        await manager.send_sdp(1, newcomer, peer, offer)
+        await manager.send_sdp(1, peer, newcomer, answer)
+    else:
+        await manager.broadcast_sdp(1, newcomer, offer)
+        await manager.broadcast_sdp(1, peer, answer)
+    for n in range(CANDIDATES):
+        for sender, receiver in ((newcomer, peer), (peer, newcomer)):
+            if targeted:
+                manager.send_ice_candidates(1, sender, receiver, [candidate(sender, n)])
+            else:
+                await manager.broadcast_ice_candidate(1, sender, candidate(sender, n))
+        await asyncio.sleep(TRICKLE_INTERVAL)
+
+
+async def last_join(room_size: int, targeted: bool):
+    """Messages and bytes sent while the room_size-th peer joins"""
+    manager = WebRTCManager(backplane=InProcessBackplane("bench-signaling"))
+    counters = {"messages": 0, "bytes": 0}
+    for i in range(room_size - 1):
+        await manager.connect(CountingWebSocket(counters), 1, f"peer{i}")
+    newcomer = f"peer{room_size - 1}"
+    await manager.connect(CountingWebSocket(counters), 1, newcomer)
+    await asyncio.gather(*[
+        negotiate(manager, newcomer, f"peer{i}", targeted) for i in range(room_size - 1)
+    ])
+    # Let the last ICE batches go out
+    await asyncio.sleep(manager.ice_batch_window * 2 + 0.01)
+    await manager.backplane.stop()
+    return counters
+
+
+async def run():
+    header = f"{'peers':>5} {'mode':>10} {'messages':>9} {'per peer':>9} {'KiB':>8}"
+    print(header)
+    print("-" * len(header))
+    for room_size in ROOM_SIZES:
+        for mode, targeted in (("broadcast", False), ("targeted", True)):
+            counters = await last_join(room_size, targeted)
+            print(f"{room_size:>5} {mode:>10} {counters['messages']:>9} "
+                  f"{counters['messages'] / (room_size - 1):>9.1f} {counters['bytes'] / 1024:>8.1f}")
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark a mixed read/write load on a SQLite file database.
+
+CLIENTS concurrent request sessions each run OPERATIONS operations:
+mostly reads of a meeting's recent annotations, with a share of writes
+(one token event committed per write). Compares the previous engine setup
+(rollback journal, synchronous=FULL, every pooled connection writing)
+with the production profile (WAL and pragmas, one writer connection,
+reads on the pool). Reports latency percentiles, throughput and
+"database is locked" failures.
+
+    python -m backend.benchmarks.bench_sqlite_profile
+"""
+import asyncio
+import random
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlmodel import Session, select
+
+from backend.benchmarks.common import percentiles, temp_database
+from backend.config import settings
+from backend.database import create_async_engines, make_async_session_maker
+from backend.models.annotations import Annotation
+from backend.models.meetings import Meeting
+from backend.models.participants import Participant
+from backend.models.tokens import TokenEvent
+
+MEETINGS = 20
+ANNOTATIONS = 20_000
+CLIENTS = 50
+OPERATIONS = 100
+WRITE_SHARE = 0.2
+
+
+def populate(engine):
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        session.execute(insert(Meeting), [{"id": i, "name": f"m{i}"} for i in range(1, MEETINGS + 1)])
+        session.execute(insert(Participant), [
+            {"id": i, "meeting_id": i, "user_id": f"user{i}", "name": f"user{i}"} for i in range(1, MEETINGS + 1)
+        ])
+        session.execute(insert(Annotation), [
+            {"meeting_id": i % MEETINGS + 1, "participant_id": i % MEETINGS + 1, "annotation_type": "text",
+             "content": "{}", "timestamp_ms": i, "created_at": now, "updated_at": now}
+            for i in range(ANNOTATIONS)
+        ])
+        session.commit()
+
+
+async def client(session_maker, seed: int, reads: List[float], writes: List[float], errors: List[int]):
+    rng = random.Random(seed)
+    for _ in range(OPERATIONS):
+        meeting_id = rng.randint(1, MEETINGS)
+        writing = rng.random() < WRITE_SHARE
+        start = time.perf_counter()
+        try:
+            async with session_maker() as db:
+                if writing:
+                    db.add(TokenEvent(meeting_id=meeting_id, participant_id=meeting_id, event_type="claim",
+                                      is_active=False))
+                    await db.commit()
+                else:
+                    (await db.exec(
+                        select(Annotation).where(Annotation.meeting_id == meeting_id)
+                        .order_by(Annotation.id.desc()).limit(10)
+                    )).all()
+        except OperationalError:
+            errors.append(1)
+            continue
+        (writes if writing else reads).append(time.perf_counter() - start)
+
+
+async def run(session_maker) -> Dict[str, object]:
+    reads: List[float] = []
+    writes: List[float] = []
+    errors: List[int] = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(session_maker, seed, reads, writes, errors) for seed in range(CLIENTS)))
+    elapsed = time.perf_counter() - start
+    return {"reads": percentiles(reads), "writes": percentiles(writes), "errors": len(errors),
+            "ops_per_s": (len(reads) + len(writes)) / elapsed}
+
+
+async def compare(path: str):
+    url = f"sqlite+aiosqlite:///{path}"
+    # The engine as configured before the profile: a pool of connections that all read and write
+    previous = create_async_engine(url, poolclass=AsyncAdaptedQueuePool,
+                                   pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW)
+    reader, writer = create_async_engines(url)
+    results = {}
+    for name, session_maker in (("previous", make_async_session_maker(previous)),
+                                ("profile", make_async_session_maker(reader, writer))):
+        results[name] = await run(session_maker)
+    for bind in (previous, reader, writer):
+        await bind.dispose()
+    return results
+
+
+def main():
+    with temp_database() as (engine, _):
+        populate(engine)
+        results = asyncio.run(compare(engine.url.database))
+    print(f"{CLIENTS} clients x {OPERATIONS} operations, {int(WRITE_SHARE * 100)}% writes (ms)")
+    print(f"{'engine':<10} {'read p50':>9} {'read p99':>9} {'write p50':>10} {'write p99':>10} "
+          f"{'ops/s':>8} {'locked':>7}")
+    for name, result in results.items():
+        print(f"{name:<10} {result['reads']['p50_ms']:>9.2f} {result['reads']['p99_ms']:>9.2f} "
+              f"{result['writes']['p50_ms']:>10.2f} {result['writes']['p99_ms']:>10.2f} "
+              f"{result['ops_per_s']:>8.0f} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark /stats/meetings/{id}/stats aggregation as a meeting grows.
+
+Compares the previous per-participant Python filtering (O(participants x
+events)) with compute_meeting_stats on meetings of increasing size.
+
+    python -m backend.benchmarks.bench_stats
+"""
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from backend.api.stats import compute_meeting_stats
+from backend.benchmarks.common import temp_database, best_of
+from backend.models.annotations import Annotation
+from backend.models.meetings import Meeting
+from backend.models.participants import Participant
+from backend.models.tokens import TokenEvent
+
+PARTICIPANTS = 100
+SIZES = [1_000, 5_000, 20_000]
+ANNOTATION_TYPES = ["text", "drawing", "shape", "highlight"]
+
+
+def populate(engine, events: int):
+    """Create meeting 1 with PARTICIPANTS participants, `events` token events and annotations"""
+    rng = random.Random(events)
+    start = datetime(2024, 1, 1)
+    with Session(engine) as session:
+        session.add(Meeting(id=1, name="bench"))
+        session.execute(insert(Participant), [
+            {"id": i, "meeting_id": 1, "user_id": f"user{i}", "name": f"user{i}"}
+            for i in range(1, PARTICIPANTS + 1)
+        ])
+        token_rows = []
+        for i in range(events):
+            holder = rng.randint(1, PARTICIPANTS)
+            at = start + timedelta(seconds=i * 10)
+            token_rows.append({"meeting_id": 1, "participant_id": holder, "event_type": "claim",
+                               "is_active": False, "created_at": at, "updated_at": at})
+            at = at + timedelta(seconds=rng.randint(1, 9))
+            token_rows.append({"meeting_id": 1, "participant_id": holder, "event_type": "release",
+                               "is_active": False, "created_at": at, "updated_at": at})
+        session.execute(insert(TokenEvent), token_rows)
+        session.execute(insert(Annotation), [
+            {"meeting_id": 1, "participant_id": rng.randint(1, PARTICIPANTS),
+             "annotation_type": rng.choice(ANNOTATION_TYPES), "content": "{}",
+             "timestamp_ms": i * 40, "created_at": start, "updated_at": start}
+            for i in range(events)
+        ])
+        session.commit()
+
+
+def legacy_stats(engine, meeting_id: int):
+    """The pre-aggregation implementation, kept for comparison"""
+    with Session(engine) as db:
+        participants = db.exec(select(Participant).where(Participant.meeting_id == meeting_id)).all()
+        token_events = db.exec(select(TokenEvent).where(TokenEvent.meeting_id == meeting_id)).all()
+        annotations = db.exec(select(Annotation).where(Annotation.meeting_id == meeting_id)).all()
+        stats = {"token_stats": {}, "annotation_stats": {}}
+        for participant in participants:
+            mine = [t for t in token_events if t.participant_id == participant.id]
+            stats["token_stats"][participant.name] = len(mine)
+        for participant in participants:
+            mine = [a for a in annotations if a.participant_id == participant.id]
+            types = {}
+            for annotation in mine:
+                types[annotation.annotation_type] = types.get(annotation.annotation_type, 0) + 1
+            stats["annotation_stats"][participant.name] = types
+        return stats
+
+
+def main():
+    print(f"{PARTICIPANTS} participants; N claim/release pairs and N annotations per meeting\n")
+    print(f"{'events':>8} {'legacy ms':>10} {'aggregated ms':>14} {'speedup':>8}")
+    for events in SIZES:
+        with temp_database() as (engine, async_engine):
+            populate(engine, events)
+
+            async def run():
+                async with AsyncSession(async_engine) as db:
+                    return await compute_meeting_stats(db, 1)
+
+            loop = asyncio.new_event_loop()
+            try:
+                stats = loop.run_until_complete(run())
+                assert stats["participant_count"] == PARTICIPANTS
+                aggregated = best_of(lambda: loop.run_until_complete(run()))
+                loop.run_until_complete(async_engine.dispose())
+            finally:
+                loop.close()
+            legacy = best_of(lambda: legacy_stats(engine, 1), repeat=1)
+        print(f"{events:>8} {legacy * 1000:>10.1f} {aggregated * 1000:>14.1f} {legacy / aggregated:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark live stroke relaying against persisting every drawing event.
+
+Drawers in a room emit a point every 1/60 s. The old path persists and
+broadcasts each event as a full annotation; the stroke relay sends one
+delta message per room per tick and persists each finished stroke once.
+Reports server CPU time, messages and bytes sent per drawer-second.
+
+    python -m backend.benchmarks.bench_strokes
+"""
+import asyncio
+import math
+import time
+
+from fastapi.websockets import WebSocketState
+
+from backend.annotation_writer import annotation_row, annotation_writer
+from backend.benchmarks.common import temp_database
+from backend.models.annotations import AnnotationCreate, AnnotationRead
+from backend.stroke_relay import stroke_relay
+from backend.websocket import manager
+
+DRAWERS = 4
+RECEIVERS = 20
+SECONDS = 2.0
+RATE_HZ = 60
+STROKE_POINTS = 60
+MEETING_ID = 1
+
+
+class CountingWebSocket:
+    client_state = WebSocketState.CONNECTED
+
+    def __init__(self, counters):
+        self.counters = counters
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        self.counters["messages"] += 1
+        self.counters["bytes"] += len(message)
+
+
+def pen_point(drawer: int, n: int):
+    angle = n / 10
+    return [400 + drawer * 50 + int(100 * math.cos(angle)), 300 + int(100 * math.sin(angle))]
+
+
+async def per_event(drawer: int, n: int, stroke_points: list):
+    stroke_points.append(pen_point(drawer, n))
+    annotation = AnnotationCreate(
+        meeting_id=MEETING_ID,
+        participant_id=None,
+        annotation_type="drawing",
+        content={"points": list(stroke_points), "color": "#1d4ed8", "lineWidth": 3},
+    )
+    created = await annotation_writer.write([annotation_row(MEETING_ID, annotation)])
+    await manager.broadcast_annotations(MEETING_ID, [AnnotationRead.model_validate(row) for row in created])
+    if len(stroke_points) == STROKE_POINTS:
+        stroke_points.clear()
+
+
+async def relayed(owner, drawer: int, n: int, stroke_points: list):
+    stroke_id = f"{drawer}-{n // STROKE_POINTS}"
+    stroke_relay.add_points(MEETING_ID, owner, {
+        "stroke_id": stroke_id,
+        "points": [pen_point(drawer, n)],
+        "style": {"color": "#1d4ed8", "lineWidth": 3},
+    })
+    if n % STROKE_POINTS == STROKE_POINTS - 1:
+        await stroke_relay.end(MEETING_ID, owner, stroke_id)
+
+
+async def drive(mode: str):
+    counters = {"messages": 0, "bytes": 0}
+    receivers = [CountingWebSocket(counters) for _ in range(RECEIVERS)]
+    for websocket in receivers:
+        await manager.connect(websocket, MEETING_ID)
+
+    async def drawer(index: int):
+        owner = object()
+        stroke_points = []
+        start = time.perf_counter()
+        for n in range(int(SECONDS * RATE_HZ)):
+            if mode == "per event":
+                await per_event(index, n, stroke_points)
+            else:
+                await relayed(owner, index, n, stroke_points)
+            await asyncio.sleep(max(0.0, start + (n + 1) / RATE_HZ - time.perf_counter()))
+
+    cpu = time.process_time()
+    await asyncio.gather(*[drawer(i) for i in range(DRAWERS)])
+    await asyncio.sleep(0.1)
+    cpu = time.process_time() - cpu
+    for websocket in receivers:
+        manager.disconnect(websocket, MEETING_ID)
+    return cpu, counters
+
+
+async def run(async_engine):
+    annotation_writer.start(async_engine)
+    drawer_seconds = DRAWERS * SECONDS
+    print(f"{DRAWERS} drawers at {RATE_HZ} Hz for {SECONDS:.0f}s, {RECEIVERS} receivers")
+    header = f"{'mode':<12} {'CPU ms/drawer-s':>16} {'msgs/drawer-s':>14} {'KiB/drawer-s':>13}"
+    print(header)
+    print("-" * len(header))
+    for mode in ("per event", "relayed"):
+        cpu, counters = await drive(mode)
+        print(f"{mode:<12} {cpu * 1000 / drawer_seconds:>16.1f} {counters['messages'] / drawer_seconds:>14.0f} "
+              f"{counters['bytes'] / 1024 / drawer_seconds:>13.1f}")
+    await annotation_writer.stop()
+
+
+def main():
+    with temp_database() as (_, async_engine):
+        asyncio.run(run(async_engine))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark the token hold-time scheduler with thousands of meetings.
+
+Every meeting has a holder and a waiter; holds expire after HOLD seconds,
+so each meeting times out twice, handing the token off the first time.
+Meetings start spread over one hold period. Compares the single scheduler
+task (one heap of deadlines) with one sleeping task per claim, reporting
+how late the timeouts fire and the CPU time spent.
+
+    python -m backend.benchmarks.bench_token_queue
+"""
+import asyncio
+import time
+from typing import List
+
+from backend.backplane import InProcessBackplane
+from backend.benchmarks.common import percentiles
+from backend.models.tokens import TokenEventRead
+from backend.token_arbiter import TokenArbiter
+from backend.token_queue import TokenQueue
+from backend.websocket import ConnectionManager
+
+MEETINGS = 5000
+HOLD = 5.0
+# Meetings started between two pauses of the ramp-up
+RAMP_BATCH = 50
+
+
+class MeasuredQueue(TokenQueue):
+    """Records how long after its deadline each timeout fired"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lateness: List[float] = []
+        self.claimed_at = {}
+
+    async def force_release(self, meeting_id, released_by=None, event_type="force_release"):
+        if event_type == "timeout":
+            self.lateness.append(asyncio.get_running_loop().time() - self.claimed_at[meeting_id] - self.max_hold)
+        return await super().force_release(meeting_id, released_by, event_type)
+
+    def _schedule(self, event: TokenEventRead, held_for: float = 0.0):
+        self.claimed_at[event.meeting_id] = asyncio.get_running_loop().time()
+        super()._schedule(event, held_for)
+
+
+class TaskPerClaimQueue(MeasuredQueue):
+    """The alternative: a sleeping task for every claim"""
+
+    def _schedule(self, event: TokenEventRead, held_for: float = 0.0):
+        self.claimed_at[event.meeting_id] = asyncio.get_running_loop().time()
+        asyncio.create_task(self._expire_later(event))
+
+    async def _expire_later(self, event: TokenEventRead):
+        await asyncio.sleep(self.max_hold)
+        if self.arbiter.current_holder(event.meeting_id) is event:
+            self.timeouts += 1
+            await self.force_release(event.meeting_id, event_type="timeout")
+
+
+async def run(queue_class):
+    manager = ConnectionManager(backplane=InProcessBackplane(f"bench-{queue_class.__name__}"))
+    queue = queue_class(TokenArbiter(), manager, max_hold_seconds=HOLD)
+    queue.start()
+    cpu = time.process_time()
+    for meeting_id in range(MEETINGS):
+        await queue.claim(meeting_id, 1)
+        await queue.claim(meeting_id, 2, wait=True)
+        if meeting_id % RAMP_BATCH == RAMP_BATCH - 1:
+            await asyncio.sleep(HOLD * RAMP_BATCH / MEETINGS)
+    while queue.timeouts < 2 * MEETINGS:
+        await asyncio.sleep(0.05)
+    cpu = time.process_time() - cpu
+    await queue.stop()
+    return percentiles(queue.lateness), cpu
+
+
+def main():
+    print(f"{MEETINGS} meetings, hold limit {HOLD}s, {2 * MEETINGS} timeouts")
+    print(f"{'scheduler':<16} {'late p50 ms':>12} {'late p99 ms':>12} {'CPU s':>8}")
+    for name, queue_class in (("one task", MeasuredQueue), ("task per claim", TaskPerClaimQueue)):
+        lateness, cpu = asyncio.run(run(queue_class))
+        print(f"{name:<16} {lateness['p50_ms']:>12.2f} {lateness['p99_ms']:>12.2f} {cpu:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark claim-to-broadcast latency of the expression token.
+
+A room of participants is connected to the meeting WebSocket of the ASGI
+app, in process. Participants take turns claiming and releasing the token,
+either with the ``claim`` / ``release`` commands on their socket or
+through the REST endpoints. Each sample runs from sending the request
+until every member of the room has received the matching
+``token_changed``, and until the requester has its ack (or HTTP
+response).
+
+    python -m backend.benchmarks.bench_token_ws
+"""
+import asyncio
+import time
+from typing import Dict, List
+
+import httpx
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from backend.benchmarks.common import ASGIWebSocket, percentiles, temp_database
+from backend.database import get_async_session
+from backend.main import app
+from backend.models.meetings import Meeting
+from backend.models.participants import Participant
+from backend.token_arbiter import token_arbiter
+from backend.utils.auth import create_access_token
+
+ROOM_SIZE = 20
+ROUNDS = 200
+
+
+class Member:
+    """A connected participant recording when each token event reaches it"""
+
+    def __init__(self, participant_id: int, token: str, socket: ASGIWebSocket):
+        self.participant_id = participant_id
+        self.token = token
+        self.socket = socket
+        self.waiters: Dict[int, asyncio.Future] = {}  # participant_id of the event -> future
+        self.acks: Dict[str, asyncio.Future] = {}  # request_id -> future
+        self.task = asyncio.create_task(self._read())
+
+    def expect(self, participant_id: int) -> asyncio.Future:
+        future = self.waiters[participant_id] = asyncio.get_running_loop().create_future()
+        return future
+
+    async def _read(self):
+        while True:
+            message = await self.socket.receive_json()
+            if message["type"] == "token_changed":
+                future = self.waiters.pop(message["data"]["participant_id"], None)
+                if future is not None and not future.done():
+                    future.set_result(time.perf_counter())
+            elif message["type"] in ("ack", "nack"):
+                future = self.acks.pop(message["request_id"], None)
+                if future is not None:
+                    future.set_result(time.perf_counter())
+
+
+async def _turn(members: List[Member], member: Member, command: str, client: httpx.AsyncClient, meeting_id: int,
+                over_websocket: bool, broadcast: List[float], reply: List[float]):
+    arrivals = [other.expect(member.participant_id) for other in members]
+    start = time.perf_counter()
+    if over_websocket:
+        request_id = f"{command}-{member.participant_id}-{start}"
+        acked = member.acks[request_id] = asyncio.get_running_loop().create_future()
+        await member.socket.send_json({"type": command, "request_id": request_id})
+        reply.append(await acked - start)
+    else:
+        response = await client.post(
+            f"/api/v1/tokens/meetings/{meeting_id}/{command}",
+            json={"meeting_id": meeting_id, "participant_id": member.participant_id, "event_type": command},
+            headers={"Authorization": f"Bearer {member.token}"},
+        )
+        response.raise_for_status()
+        reply.append(time.perf_counter() - start)
+    broadcast.append(max(await asyncio.gather(*arrivals)) - start)
+
+
+async def run(meeting_id: int, over_websocket: bool) -> Dict[str, Dict[str, float]]:
+    members = []
+    for participant_id in range(1, ROOM_SIZE + 1):
+        token = create_access_token({"sub": f"user{participant_id}", "user_id": participant_id})
+        socket = ASGIWebSocket(app, f"/api/v1/ws/ws/meetings/{meeting_id}", f"token={token}")
+        assert await socket.connect(), "handshake refused"
+        await socket.receive_json()  # connected
+        members.append(Member(participant_id, token, socket))
+
+    broadcast: List[float] = []
+    reply: List[float] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for turn in range(ROUNDS):
+            member = members[turn % ROOM_SIZE]
+            for command in ("claim", "release"):
+                await _turn(members, member, command, client, meeting_id, over_websocket, broadcast, reply)
+
+    for member in members:
+        member.task.cancel()
+        await member.socket.close()
+    return {"reply": percentiles(reply), "broadcast": percentiles(broadcast)}
+
+
+def main():
+    with temp_database() as (engine, async_engine):
+        with Session(engine) as db:
+            meetings = [Meeting(name="websocket"), Meeting(name="rest")]
+            db.add_all(meetings)
+            db.commit()
+            for meeting in meetings:
+                db.add_all(
+                    Participant(meeting_id=meeting.id, user_id=f"user{i}", name=f"User {i}")
+                    for i in range(1, ROOM_SIZE + 1)
+                )
+            db.commit()
+            meeting_ids = [meeting.id for meeting in meetings]
+
+        session_maker = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+        async def override_session():
+            async with session_maker() as session:
+                yield session
+
+        app.dependency_overrides[get_async_session] = override_session
+        token_arbiter.start(engine)
+        try:
+            print(f"{ROOM_SIZE} members, {ROUNDS * 2} claims/releases per path (ms)")
+            print(f"{'path':<10} {'reply p50':>10} {'reply p99':>10} {'bcast p50':>10} {'bcast p95':>10} {'bcast p99':>10}")
+            for name, meeting_id, over_websocket in (("rest", meeting_ids[1], False), ("websocket", meeting_ids[0], True)):
+                result = asyncio.run(run(meeting_id, over_websocket))
+                print(f"{name:<10} {result['reply']['p50_ms']:>10.3f} {result['reply']['p99_ms']:>10.3f} "
+                      f"{result['broadcast']['p50_ms']:>10.3f} {result['broadcast']['p95_ms']:>10.3f} "
+                      f"{result['broadcast']['p99_ms']:>10.3f}")
+        finally:
+            token_arbiter.stop()
+            app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    main()
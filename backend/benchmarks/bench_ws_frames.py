@@ -0,0 +1,112 @@
+"""
+Benchmark WebSocket frame formats on realistic room traffic.
+
+Builds one minute of traffic for a busy room (finished strokes, live
+stroke ticks, SDP offers/answers, ICE candidates, joins, token and phase
+changes). For every wire format it reports the bytes each recipient
+receives, and the CPU time to encode the traffic for a 20-client room
+once per format (FrameCache) versus once per recipient.
+
+    python -m backend.benchmarks.bench_ws_frames
+"""
+import json
+import random
+import time
+
+from backend.benchmarks.bench_annotation_codec import freehand_stroke
+from backend.utils.frame_codec import DEFLATE, JSON, MSGPACK, NONE, FrameCache, WireFormat, msgpack
+
+ROOM_SIZE = 20
+
+
+def sdp_blob(rng: random.Random) -> dict:
+    lines = ["v=0", f"o=- {rng.getrandbits(62)} 2 IN IP4 127.0.0.1", "s=-", "t=0 0", "a=group:BUNDLE 0 1"]
+    for media, port in (("audio", 9), ("video", 9)):
+        lines.append(f"m={media} {port} UDP/TLS/RTP/SAVPF 111 96 97 98 99 100 101 102")
+        lines.append("c=IN IP4 0.0.0.0")
+        lines.append(f"a=ice-ufrag:{rng.getrandbits(32):08x}")
+        lines.append(f"a=ice-pwd:{rng.getrandbits(128):032x}")
+        lines.append("a=fingerprint:sha-256 " + ":".join(f"{rng.getrandbits(8):02X}" for _ in range(32)))
+        for payload in range(96, 110):
+            lines.append(f"a=rtpmap:{payload} VP8/90000")
+            lines.append(f"a=rtcp-fb:{payload} nack pli")
+    return {"type": "offer", "sdp": "\r\n".join(lines)}
+
+
+def room_minute(seed: int = 0):
+    """One minute of serialized broadcasts for a busy room"""
+    rng = random.Random(seed)
+    messages = []
+    seq = 0
+
+    def add(message: dict):
+        nonlocal seq
+        seq += 1
+        messages.append(json.dumps({"seq": seq, **message}))
+
+    for i in range(20):
+        add({"type": "annotations_created", "data": [{
+            "annotation_id": i, "participant_id": rng.randint(1, 8), "annotation_type": "drawing",
+            "content": freehand_stroke(rng.randint(60, 400), subpixel=True, seed=i),
+            "timestamp_ms": i * 3000, "created_at": "2026-01-01T10:00:00",
+        }]})
+    for i in range(600):
+        deltas = [round(rng.uniform(-4, 4), 2) for _ in range(4)]
+        add({"type": "strokes", "data": {"strokes": [{"stroke_id": f"s{i // 30}", "participant_id": 3, "d": deltas}],
+                                         "cursors": [{"participant_id": 5, "x": rng.randint(0, 1280), "y": rng.randint(0, 720)}]}})
+    for i in range(10):
+        add({"type": "sdp", "sender": f"user{i}", "sdp": sdp_blob(rng)})
+    for i in range(40):
+        add({"type": "ice_candidate", "sender": f"user{i % 8}", "candidate": {
+            "candidate": f"candidate:{rng.getrandbits(32)} 1 udp 2122260223 192.168.1.{i} {rng.randint(40000, 60000)} typ host",
+            "sdpMid": "0", "sdpMLineIndex": 0}})
+    for i in range(5):
+        add({"type": "participant_joined", "data": {"participant_id": i, "participant_name": f"Participant {i}"}})
+    for i in range(30):
+        add({"type": "token_changed", "data": {"event_id": i, "participant_id": i % 8, "event_type": "claim",
+                                                "is_active": True, "timestamp": "2026-01-01T10:00:00"}})
+    for i in range(2):
+        add({"type": "phase_changed", "data": {"phase_id": i, "phase_name": "clarification", "started_by": 1,
+                                                "is_current": True, "timestamp": "2026-01-01T10:00:00"}})
+    return messages
+
+
+def encode_room(messages, formats, shared: bool) -> float:
+    start = time.process_time()
+    for message in messages:
+        frames = FrameCache(message)
+        for recipient in range(ROOM_SIZE):
+            if not shared:
+                frames = FrameCache(message)
+            frames.frame(formats[recipient % len(formats)])
+    return time.process_time() - start
+
+
+def main():
+    messages = room_minute()
+    formats = [WireFormat(JSON, NONE), WireFormat(JSON, DEFLATE)]
+    if msgpack is not None:
+        formats += [WireFormat(MSGPACK, NONE), WireFormat(MSGPACK, DEFLATE)]
+    else:
+        print("msgpack is not installed; MessagePack formats skipped")
+
+    baseline = sum(len(message.encode()) for message in messages)
+    print(f"{len(messages)} messages per minute, {baseline / 1024:.0f} KiB as JSON text per recipient")
+    header = f"{'format':<16} {'KiB/recipient':>14} {'ratio':>6} {'encode ms (per recipient)':>26} {'encode ms (shared)':>19}"
+    print(header)
+    print("-" * len(header))
+    for wire_format in formats:
+        size = sum(len(FrameCache(message).frame(wire_format)) for message in messages)
+        per_recipient = encode_room(messages, [wire_format], shared=False)
+        shared = encode_room(messages, [wire_format], shared=True)
+        name = f"{wire_format.encoding}+{wire_format.compression}"
+        print(f"{name:<16} {size / 1024:>14.0f} {baseline / size:>6.2f} {per_recipient * 1000:>26.1f} {shared * 1000:>19.1f}")
+
+    mixed_per_recipient = encode_room(messages, formats, shared=False)
+    mixed_shared = encode_room(messages, formats, shared=True)
+    print(f"\nRoom of {ROOM_SIZE} mixing all formats: {mixed_per_recipient * 1000:.1f} ms encoding per recipient, "
+          f"{mixed_shared * 1000:.1f} ms once per format")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, create_engine
+
+# Registers every table on SQLModel.metadata
+import backend.database  # noqa: F401
+
+
+@contextmanager
+def temp_database():
+    """Yield (sync_engine, async_engine) bound to a fresh SQLite file"""
+    directory = tempfile.mkdtemp(prefix="nexchamps-bench-")
+    path = os.path.join(directory, "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    try:
+        yield engine, async_engine
+    finally:
+        engine.dispose()
+        async_engine.sync_engine.dispose()
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 and mean of latency samples, in milliseconds"""
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+    }
+
+
+def best_of(fn: Callable[[], object], repeat: int = 5) -> float:
+    """Best wall-clock time of fn over several runs, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class ASGIWebSocket:
+    """WebSocket client talking to an ASGI app in the same event loop"""
+
+    def __init__(self, app, path: str, query: str = "", headers: Optional[Dict[str, str]] = None):
+        self.app = app
+        self.scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "http_version": "1.1",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": query.encode(),
+            "headers": [(b"host", b"bench")] + [
+                (name.lower().encode(), value.encode()) for name, value in (headers or {}).items()
+            ],
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80),
+            "subprotocols": [],
+        }
+        self._to_app: asyncio.Queue = asyncio.Queue()
+        self._from_app: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def connect(self) -> bool:
+        """Run the handshake; False when the app refused it"""
+        self._task = asyncio.create_task(self.app(self.scope, self._to_app.get, self._from_app.put))
+        await self._to_app.put({"type": "websocket.connect"})
+        return (await self._from_app.get())["type"] == "websocket.accept"
+
+    async def send_json(self, data: Any):
+        await self._to_app.put({"type": "websocket.receive", "text": json.dumps(data)})
+
+    async def receive_json(self) -> Any:
+        message = await self._from_app.get()
+        if message["type"] == "websocket.close":
+            raise ConnectionError(f"closed by the app with code {message.get('code')}")
+        return json.loads(message["text"] if message.get("text") is not None else message["bytes"])
+
+    async def close(self):
+        await self._to_app.put({"type": "websocket.disconnect", "code": 1000})
+        if self._task is not None:
+            await self._task
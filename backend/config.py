@@ -1,16 +1,108 @@
 from pydantic_settings import BaseSettings
 from pydantic import PostgresDsn, computed_field
-from typing import List
+from typing import List, Optional
 import os
 
 class Settings(BaseSettings):
     # Database configuration
     DATABASE_URL: str = "sqlite:///./nexchamps.db"
+    # Async driver URL; derived from DATABASE_URL (aiosqlite, asyncpg) when unset
+    ASYNC_DATABASE_URL: Optional[str] = None
+
+    # Connection pool configuration (applies to both sync and async engines)
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # SQLite production profile for file databases: WAL journal, pragmas on
+    # every connection, and one writer connection for request sessions
+    # while reads use the pool above
+    SQLITE_PRODUCTION_PROFILE: bool = True
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    # Page cache per connection in KiB, and bytes of the file memory-mapped
+    SQLITE_CACHE_SIZE_KB: int = 65536
+    SQLITE_MMAP_SIZE: int = 268435456
+    # Query log: off, sampled (QUERY_LOG_SAMPLE_RATE of statements plus slow
+    # ones) or slow (statements over QUERY_LOG_SLOW_MS only)
+    QUERY_LOG_MODE: str = "slow"
+    QUERY_LOG_SAMPLE_RATE: float = 0.01
+    QUERY_LOG_SLOW_MS: float = 100.0
+
+    # Request/database/event-loop instrumentation served on GET /metrics, and
+    # how often the event-loop lag probe wakes up
+    METRICS_ENABLED: bool = True
+    METRICS_LOOP_LAG_INTERVAL_SECONDS: float = 0.5
+    # Diagnostics (see backend.diagnostics): watch for event-loop stalls from
+    # startup, stall threshold, profiler sampling interval and output directory
+    LOOP_STALL_DETECTOR: bool = False
+    LOOP_STALL_THRESHOLD_MS: float = 100.0
+    PROFILER_INTERVAL_MS: float = 5.0
+    PROFILER_OUTPUT_DIR: str = "./profiles"
+    # Usernames allowed on admin-only endpoints such as /diagnostics
+    ADMIN_USERNAMES: List[str] = []
 
     # JWT Configuration
     SECRET_KEY: str = "your-secret-key-here-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Verified tokens kept in memory until they expire (0 disables the cache)
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    # bcrypt runs on its own pool ("thread" or "process"); logins beyond
+    # PASSWORD_HASH_MAX_PENDING concurrent hash/verify operations get a 429
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+
+    # WebSocket fan-out: per-connection outbound queue size and what to do
+    # when it fills up (drop_oldest, coalesce or disconnect)
+    WS_SEND_QUEUE_SIZE: int = 256
+    WS_SLOW_CONSUMER_POLICY: str = "drop_oldest"
+    # Frames for clients that negotiated compression: smallest message compressed, zlib level
+    WS_COMPRESSION_MIN_BYTES: int = 1024
+    WS_COMPRESSION_LEVEL: int = 6
+    # Reconnect resume: broadcasts kept per room for replay, how long an empty
+    # room's state is kept, and how long a built snapshot may be reused
+    WS_EVENT_BUFFER_SIZE: int = 512
+    WS_ROOM_IDLE_SECONDS: int = 600
+    WS_SNAPSHOT_TTL_SECONDS: float = 2.0
+    # Heartbeat: connections quiet for the interval get a ping; those that sent
+    # nothing (pong or otherwise) for the timeout are dropped. Keep the timeout
+    # above twice the interval.
+    WS_PING_INTERVAL_SECONDS: float = 20.0
+    WS_PING_TIMEOUT_SECONDS: float = 60.0
+    # Pub/sub between worker processes: memory:// (single worker),
+    # tcp://127.0.0.1:7390 or unix:///tmp/nexchamps-backplane.sock
+    BACKPLANE_URL: str = "memory://"
+    # Window over which trickled ICE candidates for one peer are batched
+    WEBRTC_ICE_BATCH_MS: float = 20.0
+
+    # Longest a participant may hold the expression token before it passes to
+    # the next one waiting (0 disables the limit)
+    TOKEN_MAX_HOLD_SECONDS: float = 120.0
+    # How long the token arbiter's writer thread keeps collecting transitions
+    # into one transaction after the first, blocked on its queue meanwhile
+    TOKEN_LOG_WINDOW_MS: float = 20.0
+
+    # Annotation group commit: how long the writer waits to coalesce concurrent
+    # requests, and the most rows written in one transaction
+    ANNOTATION_COMMIT_WINDOW_MS: float = 2.0
+    ANNOTATION_BATCH_MAX: int = 5000
+    # Compression of packed drawing/shape points: none, zlib or zstd (needs zstandard)
+    ANNOTATION_COMPRESSION: str = "zlib"
+    ANNOTATION_COMPRESSION_LEVEL: int = 6
+    # Meetings kept in the in-process annotation timeline index (0 disables it).
+    # Off by default: only this process's writes reach the index and it holds
+    # every row with its content, so enable it only for a single worker that
+    # is the sole writer of the annotation table
+    ANNOTATION_INDEX_MEETINGS: int = 0
+    # Live strokes: broadcast tick, points kept per stroke, and how long a
+    # stroke may go without points before it is persisted as is
+    STROKE_TICK_MS: float = 30.0
+    STROKE_MAX_POINTS: int = 20000
+    STROKE_IDLE_SECONDS: float = 30.0
 
     # CORS Configuration
     ALLOWED_ORIGINS: List[str] = ["http://localhost", "http://localhost:3000", "http://localhost:5173"]
@@ -1,5 +1,12 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql.dml import UpdateBase
 
 # Import models to ensure they're registered with SQLAlchemy
 from .models.meetings import Meeting
@@ -11,11 +18,147 @@ from .models.decisions import Decision
 from .models.users import User
 from .models.invitations import Invitation
 from backend.config import settings
+from backend.metrics import metrics
+from backend.query_log import query_log
+from typing import List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Async driver used for each backend when no ASYNC_DATABASE_URL is configured
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql",
+}
+
+def get_async_database_url(url: str) -> str:
+    """Derive an async driver URL (sqlite+aiosqlite, postgresql+asyncpg, ...) from a sync one"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        return url
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+def _is_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+def _pool_options(url: str) -> dict:
+    # In-memory SQLite uses a single shared connection and takes no pool settings
+    if _is_memory_sqlite(url):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+def uses_sqlite_profile(url: str) -> bool:
+    """Whether the SQLite production profile applies to this database URL"""
+    return (settings.SQLITE_PRODUCTION_PROFILE and make_url(url).get_backend_name() == "sqlite"
+            and not _is_memory_sqlite(url))
+
+def sqlite_pragmas() -> List[str]:
+    return [
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+def apply_sqlite_profile(bind):
+    """Run the production pragmas on every new connection of an engine (sync or async)"""
+    sync_engine = bind.sync_engine if isinstance(bind, AsyncEngine) else bind
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+def create_async_engines(url: str, **kwargs):
+    """
+    Build the (reader, writer) async engines for a database URL.
+
+    With the SQLite profile, the writer is a separate engine holding a
+    single connection, so request sessions take turns writing instead of
+    racing for the file lock; reads stay on the pooled reader engine.
+    Elsewhere both are the same engine.
+    """
+    pool_options = _pool_options(url)
+    if pool_options and make_url(url).get_backend_name() == "sqlite":
+        # aiosqlite defaults to NullPool, which would reopen the file on every request
+        pool_options["poolclass"] = AsyncAdaptedQueuePool
+    reader = create_async_engine(url, **pool_options, **kwargs)
+    if not uses_sqlite_profile(url):
+        return reader, reader
+    writer = create_async_engine(
+        url,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        **kwargs
+    )
+    apply_sqlite_profile(reader)
+    apply_sqlite_profile(writer)
+    return reader, writer
+
+class RoutingSession(Session):
+    """
+    Sends flushes and INSERT/UPDATE/DELETE statements to the writer engine
+    and everything else to the reader pool. Once a transaction has written,
+    its later statements stay on the writer so they see their own changes.
+    """
+    reader = None
+    writer = None
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, UpdateBase) or self.info.get("writing"):
+            self.info["writing"] = True
+            return self.writer.sync_engine
+        return self.reader.sync_engine
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _end_writing(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("writing", None)
+
+def make_async_session_maker(reader: AsyncEngine, writer: Optional[AsyncEngine] = None) -> async_sessionmaker:
+    """Session factory reading from `reader` and, when it differs, writing through `writer`"""
+    if writer is None or writer is reader:
+        return async_sessionmaker(reader, class_=AsyncSession, expire_on_commit=False)
+    routing_session = type("RoutingSession", (RoutingSession,), {"reader": reader, "writer": writer})
+    return async_sessionmaker(reader, class_=AsyncSession, sync_session_class=routing_session, expire_on_commit=False)
 
 # Database engine
-engine = create_engine(settings.DATABASE_URL, echo=True)
+engine = create_engine(settings.DATABASE_URL, **_pool_options(settings.DATABASE_URL))
+if uses_sqlite_profile(settings.DATABASE_URL):
+    apply_sqlite_profile(engine)
 
-# Function to get a database session (SQLModel Session with exec support)
+# Async database engines, used by the hot request paths: the reader pool
+# and the connection writes go through (the same engine outside SQLite)
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or get_async_database_url(settings.DATABASE_URL)
+async_engine, async_write_engine = create_async_engines(ASYNC_DATABASE_URL)
+async_session_maker = make_async_session_maker(async_engine, async_write_engine)
+
+# Statement timing for the query log (see backend.query_log), instead of echo
+query_log.install(engine, async_engine, async_write_engine)
+if settings.METRICS_ENABLED:
+    metrics.install(engine, async_engine, async_write_engine)
+
+# Sync sessions on the pooled engine, for scripts and startup code. Request
+# handlers use get_async_session, so that with the SQLite profile their
+# writes take turns on the single writer connection; the token arbiter's
+# writer thread is the one other writer, through this engine
 def get_session():
     with Session(engine) as session:
         yield session
@@ -25,7 +168,69 @@ def get_db():
     with Session(engine) as session:
         yield session
 
+# Dependency to get an async DB session (SQLModel AsyncSession with exec support)
+async def get_async_session():
+    async with async_session_maker() as session:
+        yield session
+
 # Initialize database
 def init_db():
     SQLModel.metadata.create_all(engine)
-    print("Database initialized successfully")
\ No newline at end of file
+    ensure_columns(engine)
+    ensure_indexes(engine)
+    print("Database initialized successfully")
+
+def ensure_columns(bind) -> List[str]:
+    """
+    Add nullable model columns missing from existing tables.
+
+    Returns the added columns as "table.column".
+    """
+    added = []
+    existing_tables = set(inspect(bind).get_table_names())
+    for table in SQLModel.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column["name"] for column in inspect(bind).get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                logger.warning(f"Cannot add NOT NULL column {table.name}.{column.name} automatically")
+                continue
+            column_type = column.type.compile(dialect=bind.dialect)
+            with bind.begin() as conn:
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+def ensure_indexes(bind) -> List[str]:
+    """
+    Create any model index missing from an existing database.
+
+    create_all() only builds indexes together with new tables, so databases
+    created before an index was declared never get it. Returns the names of
+    the indexes created.
+    """
+    created = []
+    existing_tables = set(inspect(bind).get_table_names())
+    for table in SQLModel.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {index["name"] for index in inspect(bind).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                index.create(bind)
+                created.append(index.name)
+            except IntegrityError as e:
+                # e.g. duplicate invitation tokens left by older versions
+                logger.warning(f"Could not create index {index.name}: {e.orig}")
+    return created
+
+async def close_db():
+    """Dispose the async engines' pooled connections"""
+    await async_engine.dispose()
+    if async_write_engine is not async_engine:
+        await async_write_engine.dispose()
@@ -0,0 +1,180 @@
+"""
+Event-loop stall detection and a sampling profiler, for finding blocking
+code in production.
+
+StallDetector: a task on the event loop updates a timestamp every few
+milliseconds while a watchdog thread checks it. When the loop has not
+run the task for longer than LOOP_STALL_THRESHOLD_MS, the watchdog
+captures the stack of the loop thread at that moment, which is the code
+blocking it, and logs it once per stall. Code holding the GIL in C (e.g.
+bcrypt backends that do not release it) keeps the watchdog out too, so
+such stalls are captured just after the call returns.
+
+SamplingProfiler: a thread records the stacks of every other thread at a
+fixed interval and writes them in the collapsed "frame;frame;frame count"
+format read by flamegraph.pl, speedscope and most flame graph tools.
+
+Both are off unless LOOP_STALL_DETECTOR is set or an admin starts them
+through /api/v1/diagnostics.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Stall reports kept for GET /diagnostics/stalls
+STALL_HISTORY = 50
+
+
+class StallDetector:
+    def __init__(self, threshold_ms: Optional[float] = None):
+        self.threshold = (settings.LOOP_STALL_THRESHOLD_MS if threshold_ms is None else threshold_ms) / 1000
+        self.stalls: Deque[Dict] = deque(maxlen=STALL_HISTORY)
+        self.stall_count = 0
+        self._tick = 0.0
+        self._last_tick = 0.0
+        self._reported = False  # the current stall was already captured
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self, threshold_ms: Optional[float] = None):
+        """Start watching the running event loop"""
+        if self.running:
+            return
+        if threshold_ms is not None:
+            self.threshold = threshold_ms / 1000
+        # Ticking at a quarter of the threshold keeps the detection error small
+        self._tick = self.threshold / 4
+        self._loop_thread = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._ticker())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-stall-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._stopped.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.get_running_loop().run_in_executor(None, self._watchdog.join)
+        self._watchdog = None
+
+    async def _ticker(self):
+        while True:
+            await asyncio.sleep(self._tick)
+            now = time.monotonic()
+            if self._reported:
+                # The loop is back: record how long the captured stall lasted
+                self.stalls[-1]["duration_ms"] = round((now - self._last_tick - self._tick) * 1000, 1)
+                logger.warning(f"Event loop was blocked for {self.stalls[-1]['duration_ms']}ms")
+                self._reported = False
+            self._last_tick = now
+
+    def _watch(self):
+        while not self._stopped.wait(self._tick):
+            if self._reported or time.monotonic() - self._last_tick - self._tick < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = traceback.format_stack(frame)
+            self.stall_count += 1
+            self.stalls.append({
+                "detected_at": datetime.utcnow().isoformat(),
+                "duration_ms": None,
+                "stack": stack,
+            })
+            self._reported = True
+            logger.warning(
+                f"Event loop blocked for over {self.threshold * 1000:.0f}ms in:\n{''.join(stack)}"
+            )
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{frame.f_globals.get('__name__', '?')}.{name}".replace(";", ":")
+
+
+class SamplingProfiler:
+    def __init__(self, interval_ms: Optional[float] = None, output_dir: Optional[str] = None):
+        self.interval = (settings.PROFILER_INTERVAL_MS if interval_ms is None else interval_ms) / 1000
+        self.output_dir = output_dir or settings.PROFILER_OUTPUT_DIR
+        self.stacks: Counter = Counter()  # collapsed stack -> samples
+        self.samples = 0
+        self.started_at: Optional[datetime] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, interval_ms: Optional[float] = None):
+        if self.running:
+            return
+        if interval_ms is not None:
+            self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = datetime.utcnow()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Optional[str]:
+        """Stop sampling and write the collapsed stacks; returns the file path"""
+        if not self.running:
+            return None
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"profile-{self.started_at:%Y%m%d-%H%M%S}-{os.getpid()}.folded")
+        with open(path, "w") as output:
+            output.writelines(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+        return path
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                frames: List[str] = []
+                while frame is not None:
+                    frames.append(frame_label(frame))
+                    frame = frame.f_back
+                frames.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(frames))] += 1
+            self.samples += 1
+
+
+# Global diagnostics instances
+stall_detector = StallDetector()
+profiler = SamplingProfiler()
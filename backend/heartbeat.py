@@ -0,0 +1,74 @@
+"""
+Server-driven heartbeat for WebSocket connections.
+
+A client whose network vanished (half-open TCP, suspended laptop, killed
+tab) never sends a close frame, so its socket would stay registered and
+every broadcast would keep queueing for it. ASGI gives the application no
+access to protocol-level pings, so the heartbeat works with messages:
+
+* every WS_PING_INTERVAL_SECONDS, connections that sent nothing during the
+  last interval get ``{"type": "ping"}``; clients answer ``{"type": "pong"}``,
+  although any incoming frame counts as a sign of life;
+* connections silent for WS_PING_TIMEOUT_SECONDS are removed from their
+  manager right away (no more broadcasts, participants left) and closed.
+
+Targets are the connection managers; each implements ``ping(idle_since)``
+and ``reap(cutoff)`` (monotonic times) and returns how many connections it
+pinged or dropped.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import List, Optional
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+PING_MESSAGE = json.dumps({"type": "ping"})
+# Close code sent to connections dropped for missing heartbeats ("going away")
+TIMEOUT_CLOSE_CODE = 1001
+
+
+class Heartbeat:
+    def __init__(self, interval: Optional[float] = None, timeout: Optional[float] = None):
+        self.interval = settings.WS_PING_INTERVAL_SECONDS if interval is None else interval
+        self.timeout = settings.WS_PING_TIMEOUT_SECONDS if timeout is None else timeout
+        self.targets: List = []
+        self._task: Optional[asyncio.Task] = None
+        self.pings_sent = 0
+        self.connections_reaped = 0
+
+    def start(self, *targets):
+        """Start pinging and reaping the connections of the given managers"""
+        self.targets = list(targets)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def beat(self, now: Optional[float] = None):
+        """One heartbeat round: drop silent connections, ping quiet ones"""
+        now = time.monotonic() if now is None else now
+        for target in self.targets:
+            try:
+                self.connections_reaped += target.reap(now - self.timeout)
+                self.pings_sent += target.ping(now - self.interval)
+            except Exception as e:
+                logger.exception(f"Heartbeat for {type(target).__name__} failed: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.beat()
+
+
+# Global heartbeat, started with the managers in main
+heartbeat = Heartbeat()
@@ -4,9 +4,21 @@ import uvicorn
 from fastapi import FastAPI
 
 # Use relative imports for proper package structure
-from backend.database import init_db
+from backend.database import init_db, close_db, engine
 from backend.config import settings
 from backend.api import api_router
+from backend.api.metrics import router as metrics_router
+from backend.token_arbiter import token_arbiter
+from backend.token_queue import token_queue
+from backend.annotation_writer import annotation_writer
+from backend.password_hasher import password_hasher
+from backend.backplane import backplane
+from backend.heartbeat import heartbeat
+from backend.query_log import query_log
+from backend.metrics import MetricsMiddleware, metrics
+from backend.diagnostics import profiler, stall_detector
+from backend.websocket import manager
+from backend.api.webrtc import webrtc_manager
 
 app = FastAPI(title="Nex-Champs Backend", version="0.1.0")
 
@@ -21,13 +33,49 @@ app.add_middleware(
     max_age=3600,
 )
 
+# Per-route latency and database use, served on /metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Initialize database on startup (using lifecycle events)
 @app.on_event("startup")
 async def on_startup():
+    query_log.start()
     init_db()
+    await backplane.start()
+    try:
+        backplane.check_sole_worker()
+    except RuntimeError:
+        await backplane.stop()
+        raise
+    token_arbiter.start(engine)
+    token_queue.start()
+    annotation_writer.start()
+    await password_hasher.start()
+    heartbeat.start(manager, webrtc_manager)
+    if settings.METRICS_ENABLED:
+        metrics.loop.start()
+    if settings.LOOP_STALL_DETECTOR:
+        stall_detector.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await stall_detector.stop()
+    profiler.stop()
+    await metrics.loop.stop()
+    await heartbeat.stop()
+    await token_queue.stop()
+    token_arbiter.stop()
+    await annotation_writer.stop()
+    password_hasher.shutdown()
+    await backplane.stop()
+    await close_db()
+    query_log.stop()
 
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_router)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,191 @@
+"""
+Request, database and event-loop instrumentation.
+
+Request latency per route template, database statements per request and
+event-loop lag go into fixed-bucket histograms and plain counters.
+Recording one request is a couple of clock reads, a context variable and
+a few list and dict updates, with no locks: the event loop is single
+threaded, and an increment lost to a race with a threadpool worker is an
+acceptable error for monitoring. backend.api.metrics renders everything,
+together with the counters the other components keep, on GET /metrics in
+the Prometheus text format.
+"""
+import asyncio
+import contextvars
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from backend.config import settings
+
+# Histogram upper bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+# Route label of requests that matched no route, so unknown paths cannot grow the label set
+UNMATCHED_ROUTE = "unmatched"
+
+# [statements, seconds] of the request being handled
+_request_queries: contextvars.ContextVar[Optional[List]] = contextvars.ContextVar("request_queries", default=None)
+
+
+def format_labels(**labels) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, **labels) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{format_labels(**labels, le=le)} {cumulative}")
+        lines.append(f"{name}_sum{format_labels(**labels)} {self.sum}")
+        lines.append(f"{name}_count{format_labels(**labels)} {self.count}")
+        return lines
+
+
+class RouteMetrics:
+    """Latency, status classes and database use of one method and route template"""
+
+    __slots__ = ("latency", "statuses", "db_statements", "db_seconds")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses: Dict[str, int] = {}  # "2xx" -> requests
+        self.db_statements = 0
+        self.db_seconds = 0.0
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a task sleeping for a fixed interval"""
+
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = settings.METRICS_LOOP_LAG_INTERVAL_SECONDS if interval is None else interval
+        self.lag = Histogram()
+        self.last = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last = max(loop.time() - expected, 0.0)
+            self.lag.observe(self.last)
+
+
+class Metrics:
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}  # (method, route template) -> metrics
+        self.db_statements = Histogram(STATEMENT_BUCKETS)
+        self.loop = LoopLagMonitor()
+
+    def install(self, *engines):
+        """Time the statements of these engines (sync or async) and charge them to the current request"""
+        for bind in engines:
+            sync_engine = bind.sync_engine if isinstance(bind, AsyncEngine) else bind
+            if not event.contains(sync_engine, "before_cursor_execute", self._before):
+                event.listen(sync_engine, "before_cursor_execute", self._before)
+                event.listen(sync_engine, "after_cursor_execute", self._after)
+                event.listen(sync_engine, "handle_error", self._error)
+
+    def record_request(self, method: str, route: str, status: int, elapsed: float, queries: List):
+        key = (method, route)
+        metrics = self.routes.get(key)
+        if metrics is None:
+            metrics = self.routes[key] = RouteMetrics()
+        metrics.latency.observe(elapsed)
+        status_class = f"{status // 100}xx"
+        metrics.statuses[status_class] = metrics.statuses.get(status_class, 0) + 1
+        metrics.db_statements += queries[0]
+        metrics.db_seconds += queries[1]
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["metrics_start"].pop()
+        self.db_statements.observe(duration)
+        queries = _request_queries.get()
+        if queries is not None:
+            queries[0] += 1
+            queries[1] += duration
+
+    def _error(self, context):
+        # A failed statement never reaches _after; drop its start time
+        starts = context.connection.info.get("metrics_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording each HTTP request under its route template"""
+
+    def __init__(self, app, registry: Optional[Metrics] = None):
+        self.app = app
+        self.metrics = registry or metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        queries = [0, 0.0]
+        token = _request_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_queries.reset(token)
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            self.metrics.record_request(scope["method"], route, status, elapsed, queries)
+
+
+# Global metrics registry
+metrics = Metrics()
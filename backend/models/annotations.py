@@ -1,15 +1,24 @@
 from sqlmodel import SQLModel, Field, Relationship
+from pydantic import model_validator
+from sqlalchemy import Column, Index, LargeBinary
 from typing import Optional, Dict, Any
 from datetime import datetime
 from .base import BaseModel
-import json
+from backend.utils.annotation_codec import decode_content
 
 class Annotation(BaseModel, table=True):
     """Annotation model representing canvas annotations"""
+    __table_args__ = (
+        Index("ix_annotation_meeting_id_created_at", "meeting_id", "created_at"),
+        Index("ix_annotation_meeting_id_timestamp_ms", "meeting_id", "timestamp_ms"),
+    )
+
     meeting_id: int = Field(foreign_key="meeting.id")
     participant_id: Optional[int] = Field(foreign_key="participant.id")
     annotation_type: str = Field(index=True)  # text, drawing, shape, etc.
     content: str = Field(default="{}")  # JSON content as string
+    # Packed stroke points for drawing/shape annotations (see annotation_codec)
+    content_packed: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary, nullable=True))
     timestamp_ms: int = Field(default=0)  # Video timestamp in milliseconds
 
     # Relationships
@@ -29,4 +38,18 @@ class AnnotationRead(SQLModel):
     annotation_type: str
     content: Dict[str, Any]
     timestamp_ms: int
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+
+    @model_validator(mode="before")
+    @classmethod
+    def decode_stored_content(cls, data):
+        # Stored annotations keep content as JSON text plus optional packed points
+        if isinstance(data, dict):
+            if isinstance(data.get("content"), str):
+                return {**data, "content": decode_content(data["content"], data.get("content_packed"))}
+            return data
+        if isinstance(getattr(data, "content", None), str):
+            values = {field: getattr(data, field, None) for field in cls.model_fields}
+            values["content"] = decode_content(data.content, getattr(data, "content_packed", None))
+            return values
+        return data
\ No newline at end of file
@@ -1,10 +1,15 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import Optional
 from datetime import datetime
 from .base import BaseModel
 
 class Decision(BaseModel, table=True):
     """Decision model representing meeting decisions"""
+    __table_args__ = (
+        Index("ix_decision_meeting_id_created_at", "meeting_id", "created_at"),
+    )
+
     meeting_id: int = Field(foreign_key="meeting.id")
     title: str
     description: Optional[str] = None
@@ -4,12 +4,12 @@ from datetime import datetime
 
 class Invitation(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    meeting_id: int = Field(foreign_key="meeting.id")
-    email: str
+    meeting_id: int = Field(foreign_key="meeting.id", index=True)
+    email: str = Field(index=True)
     sender_id: int  # ID de l'utilisateur qui envoie l'invitation
     status: str = Field(default="pending")  # pending, accepted, declined
     role: str = Field(default="participant")  # participant, observer, facilitator
-    token: str = Field(default="")  # Token unique pour accepter l'invitation
+    token: str = Field(default="", unique=True, index=True)  # Token unique pour accepter l'invitation
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -1,9 +1,14 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import Optional
 from .base import BaseModel
 
 class Participant(BaseModel, table=True):
     """Participant model representing meeting attendees"""
+    __table_args__ = (
+        Index("ix_participant_meeting_id_user_id", "meeting_id", "user_id"),
+    )
+
     meeting_id: int = Field(foreign_key="meeting.id")
     user_id: str = Field(index=True)  # Could be email or external user ID
     name: str
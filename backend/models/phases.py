@@ -1,10 +1,15 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import Optional
 from datetime import datetime
 from .base import BaseModel
 
 class Phase(BaseModel, table=True):
     """Phase model representing meeting phases"""
+    __table_args__ = (
+        Index("ix_phase_meeting_id_is_current", "meeting_id", "is_current"),
+    )
+
     meeting_id: int = Field(foreign_key="meeting.id")
     phase_name: str = Field(index=True)  # ideation, clarification, decision, feedback
     started_by: Optional[int] = Field(foreign_key="participant.id")
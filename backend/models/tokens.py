@@ -1,13 +1,19 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import Optional
 from datetime import datetime
 from .base import BaseModel
 
 class TokenEvent(BaseModel, table=True):
     """Token event model representing token claim/release history"""
+    __table_args__ = (
+        Index("ix_tokenevent_meeting_id_is_active", "meeting_id", "is_active"),
+        Index("ix_tokenevent_meeting_id_created_at", "meeting_id", "created_at"),
+    )
+
     meeting_id: int = Field(foreign_key="meeting.id")
     participant_id: Optional[int] = Field(foreign_key="participant.id", nullable=True)
-    event_type: str = Field(index=True)  # claim, release, force_release
+    event_type: str = Field(index=True)  # claim, release, force_release, timeout
     is_active: bool = Field(default=False)
 
     # Relationships
@@ -20,7 +26,7 @@ class TokenEventCreate(SQLModel):
     event_type: str
 
 class TokenEventRead(SQLModel):
-    id: int
+    id: Optional[int] = None  # None until the arbiter's writer has logged the event
     meeting_id: int
     participant_id: Optional[int] = None
     event_type: str
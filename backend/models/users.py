@@ -15,4 +15,31 @@ class User(SQLModel, table=True):
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
     def __repr__(self):
-        return f"User(id={self.id}, username='{self.username}', email='{self.email}')"
\ No newline at end of file
+        return f"User(id={self.id}, username='{self.username}', email='{self.email}')"
+
+class UserCreate(SQLModel):
+    username: str
+    email: str
+    password: str
+    full_name: str = ""
+
+class UserRead(SQLModel):
+    id: int
+    username: str
+    email: str
+    full_name: str
+    avatar_url: Optional[str] = None
+    language_preference: str
+    is_active: bool
+    created_at: datetime
+
+class UserUpdate(SQLModel):
+    full_name: Optional[str] = None
+    email: Optional[str] = None
+    avatar_url: Optional[str] = None
+    language_preference: Optional[str] = None
+    password: Optional[str] = None
+
+class UserDelete(SQLModel):
+    # Confirms the deletion
+    password: str
@@ -0,0 +1,92 @@
+"""
+Password hashing off the event loop.
+
+bcrypt is deliberately slow (~200ms per hash). Called inline from an async
+endpoint it stalls every request and WebSocket room on the process for
+that long. The hasher runs hash/verify on a dedicated pool and bounds how
+many operations may be in flight, so a login storm is turned away with 429
+instead of queueing without limit.
+
+The pool is a thread pool by default, which relies on the bcrypt package
+(a pinned dependency) releasing the GIL while it hashes. passlib's
+fallback backends hold the GIL; in an environment without bcrypt use
+PASSWORD_HASH_EXECUTOR=process.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from backend.config import settings
+from backend.utils import auth
+
+# Scheduling priority of process-pool workers relative to the server process
+WORKER_NICENESS = 10
+
+
+def _lower_priority():
+    if hasattr(os, "nice"):
+        os.nice(WORKER_NICENESS)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hasher already has its maximum of operations in flight"""
+
+
+class PasswordHasher:
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 executor: Optional[str] = None):
+        self.workers = workers or settings.PASSWORD_HASH_WORKERS
+        self.max_pending = max_pending or settings.PASSWORD_HASH_MAX_PENDING
+        self.executor = executor or settings.PASSWORD_HASH_EXECUTOR
+        if self.executor not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash executor: {self.executor}")
+        self._executor: Optional[Executor] = None
+        self.pending = 0
+        self.rejected = 0
+
+    async def start(self):
+        """Create the pool and bring its workers up before the first login"""
+        if self._executor is None:
+            self._executor = self._create_executor()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self._executor, os.getpid) for _ in range(self.workers)])
+
+    async def hash(self, password: str) -> str:
+        return await self._run(auth.hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(auth.verify_password, password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _create_executor(self) -> Executor:
+        if self.executor == "process":
+            # Forking a process that runs an event loop and writer threads is
+            # unsafe; the workers run at lower priority than the event loop
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_lower_priority,
+            )
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hasher")
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+        if self._executor is None:
+            self._executor = self._create_executor()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+
+# Global password hasher instance
+password_hasher = PasswordHasher()
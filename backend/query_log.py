@@ -0,0 +1,139 @@
+"""
+Structured, sampled SQL query log.
+
+SQLAlchemy's echo formats and writes every statement to stdout on the
+thread running it, which under load is a real share of the CPU. Instead,
+each statement is timed with cursor-execute events and only some are
+logged, depending on QUERY_LOG_MODE:
+
+- off: no event listeners at all
+- sampled: a random QUERY_LOG_SAMPLE_RATE of statements, plus slow ones
+- slow: statements taking longer than QUERY_LOG_SLOW_MS
+
+Records are JSON lines on the ``backend.query_log`` logger, handed to a
+bounded queue and written by a listener thread, so the request never
+waits on log I/O. Records arriving while the queue is full are dropped
+and counted.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "sampled", "slow")
+# Records waiting for the listener thread before new ones are dropped
+QUEUE_SIZE = 10000
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking or raising when full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class QueryLog:
+    def __init__(self, mode: Optional[str] = None, sample_rate: Optional[float] = None,
+                 slow_ms: Optional[float] = None):
+        self.mode = mode or settings.QUERY_LOG_MODE
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown query log mode: {self.mode}")
+        self.sample_rate = settings.QUERY_LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.slow = (settings.QUERY_LOG_SLOW_MS if slow_ms is None else slow_ms) / 1000
+        self.handler = DroppingQueueHandler(queue.Queue(QUEUE_SIZE))
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self.statements = 0
+        self.slow_statements = 0
+        self.logged = 0
+
+    def install(self, *engines):
+        """Time the statements of these engines (sync or async); a no-op when off"""
+        if self.mode == "off":
+            return
+        if self.handler not in logger.handlers:
+            logger.addHandler(self.handler)
+            logger.setLevel(logging.INFO)
+            # Only the queue handler; propagating would write on the caller's thread again
+            logger.propagate = False
+        for bind in engines:
+            sync_engine = bind.sync_engine if isinstance(bind, AsyncEngine) else bind
+            if not event.contains(sync_engine, "before_cursor_execute", self._before):
+                event.listen(sync_engine, "before_cursor_execute", self._before)
+                event.listen(sync_engine, "after_cursor_execute", self._after)
+                event.listen(sync_engine, "handle_error", self._error)
+
+    def start(self, handler: Optional[logging.Handler] = None):
+        """Start the listener thread writing queued records to `handler` (stderr by default)"""
+        if self._listener is not None or self.mode == "off":
+            return
+        if handler is None:
+            handler = logging.StreamHandler(sys.stderr)
+        self._listener = logging.handlers.QueueListener(self.handler.queue, handler)
+        self._listener.start()
+
+    def stop(self):
+        """Write the queued records and stop the listener thread"""
+        if self._listener is None:
+            return
+        self._listener.stop()
+        self._listener = None
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "statements": self.statements,
+            "slow_statements": self.slow_statements,
+            "logged": self.logged,
+            "dropped": self.handler.dropped,
+        }
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_start"].pop()
+        self.statements += 1
+        slow = duration >= self.slow
+        if slow:
+            self.slow_statements += 1
+        elif self.mode == "slow" or random.random() >= self.sample_rate:
+            return
+        self.logged += 1
+        record = {
+            "event": "query",
+            "duration_ms": round(duration * 1000, 3),
+            "slow": slow,
+            "statement": " ".join(statement.split()),
+            "executemany": executemany,
+        }
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            record["rows"] = cursor.rowcount
+        (logger.warning if slow else logger.info)(json.dumps(record))
+
+    def _error(self, context):
+        # A failed statement never reaches _after; drop its start time
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+# Global query log instance
+query_log = QueryLog()
@@ -9,6 +9,7 @@ setup(
         "uvicorn==0.30.1",
         "python-jose==3.3.0",
         "passlib==1.7.4",
+        "bcrypt==4.0.1",
         "python-multipart==0.0.9",
         "sqlalchemy==2.0.30",
         "sqlmodel==0.0.16",
@@ -17,7 +18,8 @@ setup(
         "aiofiles==23.2.1",
         "pydantic==2.7.1",
         "pydantic-settings==2.3.4",
-        "python-socketio==5.11.2"
+        "python-socketio==5.11.2",
+        "aiosqlite==0.20.0"
     ],
     python_requires=">=3.7",
     author="Nex-Champs Team",
@@ -0,0 +1,227 @@
+"""
+Real-time relay for in-progress canvas strokes.
+
+Pens and mice report points at 60 Hz or more. Instead of persisting and
+broadcasting every event, drawers stream points over the meeting
+WebSocket and the relay:
+
+* buffers the points of each live stroke and, once per tick, broadcasts
+  one ``strokes`` message per room holding only the points added since the
+  previous tick, as coordinate deltas;
+* keeps only the latest cursor position per sender per tick;
+* persists a stroke as a single Annotation (through the group-commit
+  writer) when it ends, or when its drawer disconnects.
+
+Delta format: ``d`` is a flat ``[dx0, dy0, dx1, dy1, ...]`` list; the first
+pair is relative to the stroke's last transmitted point (to (0, 0) for the
+first chunk), each following pair to the point before it. A stroke_id is
+only unique per drawer, so receivers key strokes by (participant_id,
+stroke_id).
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.annotation_writer import annotation_row, annotation_writer
+from backend.config import settings
+from backend.models.annotations import AnnotationCreate
+from backend.websocket import manager
+
+logger = logging.getLogger(__name__)
+
+
+# A live stroke is identified by its drawer's connection and the client's stroke_id
+StrokeKey = Tuple[Any, str]
+
+
+def _round(value: Any) -> Any:
+    return value if type(value) is int else round(float(value), 2)
+
+
+def _is_number(value: Any) -> bool:
+    return type(value) in (int, float)
+
+
+class LiveStroke:
+    """A stroke being drawn: every point so far and how many were broadcast"""
+
+    __slots__ = ("stroke_id", "owner", "participant_id", "annotation_type", "style",
+                 "timestamp_ms", "points", "sent", "last_sent", "announced", "updated_at")
+
+    def __init__(self, stroke_id: str, owner: Any, participant_id: Optional[int], annotation_type: str,
+                 style: Dict[str, Any], timestamp_ms: int):
+        self.stroke_id = stroke_id
+        self.owner = owner
+        self.participant_id = participant_id
+        self.annotation_type = annotation_type
+        self.style = style
+        self.timestamp_ms = timestamp_ms
+        self.points: List[List[Any]] = []
+        self.sent = 0
+        self.last_sent: Tuple[Any, Any] = (0, 0)
+        self.announced = False
+        self.updated_at = time.monotonic()
+
+    def take_delta(self) -> Optional[Dict[str, Any]]:
+        """Points added since the last call, delta-encoded, or None"""
+        if self.sent == len(self.points) and self.announced:
+            return None
+        deltas = []
+        last_x, last_y = self.last_sent
+        for x, y in self.points[self.sent:]:
+            deltas.append(_round(x - last_x))
+            deltas.append(_round(y - last_y))
+            last_x, last_y = x, y
+        self.last_sent = (last_x, last_y)
+        self.sent = len(self.points)
+        update = {"stroke_id": self.stroke_id, "participant_id": self.participant_id, "d": deltas}
+        if not self.announced:
+            # Style and type only travel with the first chunk
+            update.update(annotation_type=self.annotation_type, style=self.style, timestamp_ms=self.timestamp_ms)
+            self.announced = True
+        return update
+
+
+class StrokeRelay:
+    def __init__(self, tick_ms: Optional[float] = None, max_points: Optional[int] = None):
+        self.tick = (settings.STROKE_TICK_MS if tick_ms is None else tick_ms) / 1000
+        self.max_points = max_points or settings.STROKE_MAX_POINTS
+        self.strokes: Dict[int, Dict[StrokeKey, LiveStroke]] = {}  # meeting_id -> (owner, stroke_id) -> stroke
+        self.cursors: Dict[int, Dict[Any, Dict[str, Any]]] = {}  # meeting_id -> sender -> latest cursor
+        self._tickers: Dict[int, asyncio.Task] = {}
+        self.events_received = 0
+        self.messages_broadcast = 0
+
+    def add_points(self, meeting_id: int, owner: Any, message: Dict[str, Any]) -> bool:
+        """Handle a ``stroke_points`` message; the first one for a stroke_id of the owner starts it"""
+        stroke_id = str(message.get("stroke_id", ""))
+        points = message.get("points") or []
+        timestamp_ms = message.get("timestamp_ms")
+        if not stroke_id or not self._valid_points(points) or not (timestamp_ms is None or _is_number(timestamp_ms)):
+            return False
+        self.events_received += 1
+        room = self.strokes.setdefault(meeting_id, {})
+        stroke = room.get((owner, stroke_id))
+        if stroke is None:
+            stroke = room[(owner, stroke_id)] = LiveStroke(
+                stroke_id,
+                owner,
+                message.get("participant_id"),
+                message.get("annotation_type") or "drawing",
+                message.get("style") if isinstance(message.get("style"), dict) else {},
+                int(timestamp_ms or 0),
+            )
+        room_left = self.max_points - len(stroke.points)
+        stroke.points.extend([_round(x), _round(y)] for x, y in points[:max(room_left, 0)])
+        stroke.updated_at = time.monotonic()
+        self._schedule(meeting_id)
+        return True
+
+    def move_cursor(self, meeting_id: int, sender: Any, message: Dict[str, Any]):
+        """Handle a ``cursor`` message; only the latest position per tick is sent"""
+        self.events_received += 1
+        self.cursors.setdefault(meeting_id, {})[sender] = {
+            "participant_id": sender, "x": message.get("x"), "y": message.get("y")
+        }
+        self._schedule(meeting_id)
+
+    async def end(self, meeting_id: int, owner: Any, stroke_id: str, points: Optional[List] = None) -> Optional[dict]:
+        """Finish a stroke: flush its last points, persist it and announce its annotation id"""
+        stroke = self.strokes.get(meeting_id, {}).get((owner, str(stroke_id)))
+        if stroke is None:
+            return None
+        if points and self._valid_points(points):
+            self.add_points(meeting_id, owner, {"stroke_id": stroke_id, "points": points})
+        return await self._commit(meeting_id, stroke)
+
+    async def drop_owner(self, meeting_id: int, owner: Any):
+        """Persist the open strokes of a connection that went away"""
+        for stroke in [s for s in self.strokes.get(meeting_id, {}).values() if s.owner is owner]:
+            try:
+                await self._commit(meeting_id, stroke)
+            except Exception as e:
+                logger.warning(f"Could not persist stroke {stroke.stroke_id} in meeting {meeting_id}: {e}")
+
+    async def _commit(self, meeting_id: int, stroke: LiveStroke) -> Optional[dict]:
+        # Taken out of the room before any await, so stroke_end and expiry
+        # cannot both persist it
+        room = self.strokes.get(meeting_id, {})
+        if room.get((stroke.owner, stroke.stroke_id)) is not stroke:
+            return None
+        del room[(stroke.owner, stroke.stroke_id)]
+        # Receivers get every point before the commit notice
+        await self._flush(meeting_id, stroke)
+        if not stroke.points:
+            return None
+        annotation = AnnotationCreate(
+            meeting_id=meeting_id,
+            participant_id=stroke.participant_id,
+            annotation_type=stroke.annotation_type,
+            content={**stroke.style, "points": stroke.points},
+            timestamp_ms=stroke.timestamp_ms,
+        )
+        created = (await annotation_writer.write([annotation_row(meeting_id, annotation)]))[0]
+        await manager.broadcast({
+            "type": "stroke_committed",
+            "data": {
+                "stroke_id": stroke.stroke_id,
+                "annotation_id": created["id"],
+                "participant_id": stroke.participant_id,
+                "points": len(stroke.points),
+            }
+        }, meeting_id)
+        return created
+
+    def _valid_points(self, points: Any) -> bool:
+        return isinstance(points, list) and all(
+            isinstance(point, (list, tuple)) and len(point) == 2 and all(_is_number(value) for value in point)
+            for point in points
+        )
+
+    def _schedule(self, meeting_id: int):
+        ticker = self._tickers.get(meeting_id)
+        if ticker is None or ticker.done():
+            self._tickers[meeting_id] = asyncio.create_task(self._run(meeting_id))
+
+    async def _run(self, meeting_id: int):
+        # One ticker per room, alive only while something is being drawn
+        while True:
+            await asyncio.sleep(self.tick)
+            if not await self._flush(meeting_id):
+                await self._expire(meeting_id)
+                if not self.strokes.get(meeting_id) and not self.cursors.get(meeting_id):
+                    self.strokes.pop(meeting_id, None)
+                    self.cursors.pop(meeting_id, None)
+                    self._tickers.pop(meeting_id, None)
+                    return
+
+    async def _flush(self, meeting_id: int, ending: Optional[LiveStroke] = None) -> bool:
+        """Broadcast everything pending for a room, and for a stroke just taken out of it,
+        as one message; False if nothing was"""
+        strokes = list(self.strokes.get(meeting_id, {}).values())
+        if ending is not None:
+            strokes.append(ending)
+        updates = [update for update in (stroke.take_delta() for stroke in strokes) if update is not None]
+        cursors = list(self.cursors.pop(meeting_id, {}).values())
+        if not updates and not cursors:
+            return False
+        data: Dict[str, Any] = {"strokes": updates}
+        if cursors:
+            data["cursors"] = cursors
+        self.messages_broadcast += 1
+        await manager.broadcast({"type": "strokes", "data": data}, meeting_id)
+        return True
+
+    async def _expire(self, meeting_id: int):
+        cutoff = time.monotonic() - settings.STROKE_IDLE_SECONDS
+        for stroke in [s for s in self.strokes.get(meeting_id, {}).values() if s.updated_at < cutoff]:
+            # Abandoned without stroke_end: persist what was drawn
+            try:
+                await self._commit(meeting_id, stroke)
+            except Exception as e:
+                logger.warning(f"Could not persist stroke {stroke.stroke_id} in meeting {meeting_id}: {e}")
+
+
+# Global stroke relay instance
+stroke_relay = StrokeRelay()
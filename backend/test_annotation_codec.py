@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for the packed storage format of drawing and shape annotations
+
+Integer strokes whose steps fit in int16 must round-trip exactly; larger
+steps and fractional coordinates fall back to float32 and must come back
+within float32 precision, including when read through AnnotationRead.
+Run with pytest or directly: python -m backend.test_annotation_codec
+"""
+
+import math
+import sys
+from datetime import datetime
+
+from backend.models.annotations import Annotation, AnnotationRead
+from backend.utils.annotation_codec import (
+    FLAG_FLOAT32, HEADER, INT16_MAX, INT16_MIN, decode_content, encode_content, pack_points, unpack_points,
+)
+
+
+def _flags(blob: bytes) -> int:
+    return HEADER.unpack_from(blob)[2]
+
+
+def _close(decoded, points):
+    """Coordinates agree to float32 precision"""
+    assert len(decoded) == len(points)
+    for (x, y), (expected_x, expected_y) in zip(decoded, points):
+        assert math.isclose(x, expected_x, rel_tol=1e-6, abs_tol=1e-6), (x, expected_x)
+        assert math.isclose(y, expected_y, rel_tol=1e-6, abs_tol=1e-6), (y, expected_y)
+
+
+def test_integer_points_round_trip_exactly_through_int16_deltas():
+    for compression in ("zlib", "none"):
+        points = [[100, 200]] + [[100 + i * 7, 200 - i * 3] for i in range(1, 500)]
+        # Steps right at the int16 limits still use deltas
+        points += [[points[-1][0] + INT16_MAX, points[-1][1] + INT16_MIN]]
+        blob = pack_points(points, compression)
+        assert not _flags(blob) & FLAG_FLOAT32
+        assert unpack_points(blob) == points
+    assert unpack_points(pack_points([[-5, 7]])) == [[-5, 7]]
+
+
+def test_delta_overflow_falls_back_to_float32():
+    points = [[0, 0], [INT16_MAX + 1, 0], [INT16_MAX + 1, INT16_MIN - 1]]
+    blob = pack_points(points)
+    assert _flags(blob) & FLAG_FLOAT32
+    # Integers up to 2**24 are exact in float32
+    assert unpack_points(blob) == points
+
+    points = [[0, 0], [2 ** 24, -(2 ** 24)]]
+    assert unpack_points(pack_points(points)) == points
+    # Beyond that float32 would round them, so the points stay JSON
+    assert pack_points([[0, 0], [2 ** 24 + 1, 0]]) is None
+    # Start coordinates that do not fit int32 cannot use deltas either
+    assert pack_points([[2 ** 31, 0], [2 ** 31, 1]]) is None
+
+
+def test_fractional_points_round_trip_within_float32_precision():
+    points = [[0.1 * i, 1000.0 / (i + 1)] for i in range(300)] + [[-12345.678, 0.000123], [1e30, -1e-30]]
+    blob = pack_points(points)
+    assert _flags(blob) & FLAG_FLOAT32
+    decoded = unpack_points(blob)
+    assert decoded != points
+    _close(decoded, points)
+    # Values float32 cannot hold stay JSON instead of failing to pack
+    assert pack_points([[0.5, 1e39]]) is None
+    assert pack_points([[0, 1], [2, "3"]]) is None
+    assert pack_points([]) is None
+    with_mixed = [[1, 2.5], [3, 4]]
+    _close(unpack_points(pack_points(with_mixed)), with_mixed)
+
+
+def test_annotation_read_returns_the_client_points():
+    cases = [
+        {"points": [[10, 20], [11, 22], [50000, 22]], "color": "#ff0000", "width": 3},
+        {"points": [[0.25, 0.5], [3.3333, 7.77777], [1024.1, -2048.9]], "tool": "pen"},
+        # Not packable: stored as JSON and returned unchanged
+        {"points": [[1, 2], [2 ** 30, 3]], "color": "#000"},
+    ]
+    for content in cases:
+        text, packed = encode_content("drawing", content)
+        assert (packed is None) == (content is cases[-1])
+        stored = Annotation(id=1, meeting_id=1, participant_id=2, annotation_type="drawing", content=text,
+                            content_packed=packed, timestamp_ms=1500, created_at=datetime.utcnow())
+        for source in (stored, stored.model_dump()):
+            read = AnnotationRead.model_validate(source)
+            assert {key: value for key, value in read.content.items() if key != "points"} == \
+                {key: value for key, value in content.items() if key != "points"}
+            _close(read.content["points"], content["points"])
+    # Non-packed types and contents without points are stored as plain JSON
+    assert encode_content("text", {"points": [[1, 2]], "text": "hi"})[1] is None
+    assert decode_content(*encode_content("shape", {"kind": "circle"})) == {"kind": "circle"}
+
+
+if __name__ == "__main__":
+    tests = [
+        test_integer_points_round_trip_exactly_through_int16_deltas,
+        test_delta_overflow_falls_back_to_float32,
+        test_fractional_points_round_trip_within_float32_precision,
+        test_annotation_read_returns_the_client_points,
+    ]
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            print(f"✗ {test.__name__}: {e}")
+            sys.exit(1)
+    print("\n✓ All tests passed!")
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Tests for recording-time queries over meeting annotations
+
+The same queries run through SQL and through the in-process timeline
+index, which must agree; the index is also checked for rows added after
+it loaded and for least-recently-used eviction.
+Run with pytest or directly: python -m backend.test_annotation_queries
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from backend.annotation_index import AnnotationTimeIndex, annotation_index
+from backend.api.annotations import router as annotations_router
+from backend.database import get_async_session
+from backend.models.annotations import Annotation
+from backend.models.meetings import Meeting
+from backend.utils.auth import get_current_active_user
+
+# (timestamp_ms, annotation_type, participant_id) of meeting 1, ids 1..7 in this order
+ROWS = [
+    (0, "text", 1), (1000, "drawing", 1), (1000, "text", 2), (2000, "drawing", 2),
+    (3000, "drawing", 1), (4000, "text", 1), (2500, "drawing", 2),
+]
+
+
+def _database(directory: str) -> str:
+    path = os.path.join(directory, "test.db")
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with Session(engine) as db:
+        for meeting_id in (1, 2, 3):
+            db.add(Meeting(id=meeting_id, name=f"Meeting {meeting_id}"))
+        db.flush()
+        db.execute(insert(Annotation), [
+            {"meeting_id": meeting_id, "participant_id": participant_id, "annotation_type": annotation_type,
+             "content": "{}", "timestamp_ms": timestamp_ms, "created_at": now, "updated_at": now}
+            for meeting_id in (1, 2, 3)
+            for timestamp_ms, annotation_type, participant_id in (ROWS if meeting_id == 1 else ROWS[:1])
+        ])
+        db.commit()
+    engine.dispose()
+    return path
+
+
+def _client(path: str) -> TestClient:
+    session_maker = async_sessionmaker(create_async_engine(f"sqlite+aiosqlite:///{path}"), class_=AsyncSession)
+
+    async def override_session():
+        async with session_maker() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(annotations_router, prefix="/annotations")
+    app.dependency_overrides[get_async_session] = override_session
+    app.dependency_overrides[get_current_active_user] = lambda: SimpleNamespace(username="ada", disabled=False)
+    return TestClient(app)
+
+
+def _ids(client: TestClient, **params):
+    response = client.get("/annotations/meetings/1", params=params)
+    assert response.status_code == 200, response.text
+    return [row["id"] for row in response.json()], response.headers.get("X-Next-Cursor")
+
+
+def _pages(client: TestClient, limit: int, **params):
+    pages, cursor = [], None
+    while True:
+        ids, cursor = _ids(client, limit=limit, **params, **({"cursor": cursor} if cursor else {}))
+        pages.append(ids)
+        if cursor is None:
+            return pages
+
+
+def _check_queries(client: TestClient):
+    # Recording-time order: 0, 1000 (ids 2, 3), 2000, 2500, 3000, 4000
+    assert _ids(client) == ([1, 2, 3, 4, 7, 5, 6], None)
+    assert _ids(client, from_ms=1000, to_ms=2500) == ([2, 3, 4, 7], None)
+    assert _ids(client, from_ms=2600)[0] == [5, 6]
+    assert _ids(client, to_ms=1000)[0] == [1, 2, 3]
+    assert _ids(client, type="drawing", participant_id=2)[0] == [4, 7]
+    # The cursor splits the two rows at 1000 ms across pages without losing either
+    assert _pages(client, 2) == [[1, 2], [3, 4], [7, 5], [6]]
+    assert _pages(client, 3, from_ms=1000, type="drawing") == [[2, 4, 7], [5]]
+    assert _ids(client, cursor="1000,2")[0] == [3, 4, 7, 5, 6]
+    assert client.get("/annotations/meetings/1", params={"cursor": "junk"}).status_code == 400
+
+
+def test_time_range_and_cursor_queries_on_both_paths():
+    max_meetings = annotation_index.max_meetings
+    with tempfile.TemporaryDirectory() as directory:
+        client = _client(_database(directory))
+        try:
+            annotation_index.max_meetings = 0
+            _check_queries(client)
+            annotation_index.max_meetings = 4
+            annotation_index.evict(1)
+            _check_queries(client)
+        finally:
+            annotation_index.max_meetings = max_meetings
+            annotation_index.evict(1)
+
+
+def test_index_adds_written_rows_and_evicts_least_recently_used():
+    async def run(path: str):
+        index = AnnotationTimeIndex(max_meetings=2)
+        session_maker = async_sessionmaker(create_async_engine(f"sqlite+aiosqlite:///{path}"), class_=AsyncSession)
+        async with session_maker() as db:
+            assert [row["id"] for row in await index.query(db, 1, from_ms=2000, to_ms=3000)] == [4, 7, 5]
+            index.add([{"id": 99, "meeting_id": 1, "participant_id": 1, "annotation_type": "text",
+                        "content": "{}", "content_packed": None, "timestamp_ms": 2200, "created_at": None}])
+            assert [row["id"] for row in await index.query(db, 1, from_ms=2000, to_ms=3000)] == [4, 99, 7, 5]
+            await index.query(db, 2)
+            await index.query(db, 1)
+            # Meeting 2 is now the least recently used
+            await index.query(db, 3)
+            loaded = list(index._meetings)
+            # A row for an evicted meeting is not kept
+            index.add([{"id": 100, "meeting_id": 2, "participant_id": 1, "annotation_type": "text",
+                        "content": "{}", "content_packed": None, "timestamp_ms": 0, "created_at": None}])
+            still_loaded = list(index._meetings)
+        return loaded, still_loaded
+
+    with tempfile.TemporaryDirectory() as directory:
+        loaded, still_loaded = asyncio.run(run(_database(directory)))
+    assert loaded == [1, 3]
+    assert still_loaded == [1, 3]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_time_range_and_cursor_queries_on_both_paths,
+        test_index_adds_written_rows_and_evicts_least_recently_used,
+    ]
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            print(f"✗ {test.__name__}: {e}")
+            sys.exit(1)
+    print("\n✓ All tests passed!")
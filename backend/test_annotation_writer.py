@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for the group-commit annotation writer and the batch endpoint
+
+Concurrent requests share one INSERT but each gets back its own rows with
+ids in the order it sent them, and a group that fails is retried one
+request at a time so only the request with the bad row errors.
+Run with pytest or directly: python -m backend.test_annotation_writer
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from backend.annotation_writer import AnnotationWriter
+from backend.api.annotations import router as annotations_router
+from backend.config import settings
+from backend.models.annotations import Annotation
+from backend.utils.auth import get_current_active_user
+
+
+def _row(timestamp_ms: int, meeting_id=1) -> dict:
+    return {"meeting_id": meeting_id, "participant_id": 2, "annotation_type": "text",
+            "content": f'{{"text": "{timestamp_ms}"}}', "timestamp_ms": timestamp_ms}
+
+
+def _write_groups(groups):
+    """Write each group of rows as one concurrent request on a temporary database.
+
+    Returns the writer, each request's result (or exception) and the stored (id, timestamp_ms) pairs.
+    """
+    async def run(path: str):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        # A long window so every request lands in the same group commit
+        writer = AnnotationWriter(window_ms=50)
+        writer.start(engine)
+        results = await asyncio.gather(*(writer.write(rows) for rows in groups), return_exceptions=True)
+        await writer.stop()
+        await engine.dispose()
+        return writer, results
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "test.db")
+        engine = create_engine(f"sqlite:///{path}")
+        SQLModel.metadata.create_all(engine)
+        writer, results = asyncio.run(run(path))
+        with Session(engine) as db:
+            stored = [(annotation.id, annotation.timestamp_ms)
+                      for annotation in db.exec(select(Annotation).order_by(Annotation.id))]
+        engine.dispose()
+    return writer, results, stored
+
+
+def test_concurrent_writes_get_their_own_rows_in_input_order():
+    groups = [[_row(100 * request + n) for n in range(size)] for request, size in enumerate([3, 1, 5, 2])]
+    writer, results, stored = _write_groups(groups)
+
+    assert writer.batches_written == 1 and writer.rows_written == 11
+    for rows, created in zip(groups, results):
+        assert [row["timestamp_ms"] for row in created] == [row["timestamp_ms"] for row in rows]
+        ids = [row["id"] for row in created]
+        assert ids == sorted(ids)
+    # Each returned id is the row that was stored under it
+    returned = sorted((row["id"], row["timestamp_ms"]) for created in results for row in created)
+    assert returned == stored
+    assert len({annotation_id for annotation_id, _ in stored}) == 11
+
+
+def test_failed_group_is_retried_per_request():
+    groups = [[_row(1), _row(2)], [_row(3), _row(4, meeting_id=None)], [_row(5)]]
+    writer, results, stored = _write_groups(groups)
+
+    assert isinstance(results[1], IntegrityError)
+    assert [row["timestamp_ms"] for row in results[0]] == [1, 2]
+    assert [row["timestamp_ms"] for row in results[2]] == [5]
+    # The bad request's good row was rolled back with it
+    assert [timestamp_ms for _, timestamp_ms in stored] == [1, 2, 5]
+    # The failed group insert, then one insert per good request
+    assert writer.batches_written == 2 and writer.rows_written == 3
+
+    # A request failing on its own is not retried
+    writer, results, stored = _write_groups([[_row(6, meeting_id=None)]])
+    assert isinstance(results[0], IntegrityError)
+    assert stored == [] and writer.batches_written == 0
+
+
+def test_batch_endpoint_rejects_empty_and_oversized_batches():
+    async def run():
+        app = FastAPI()
+        app.include_router(annotations_router, prefix="/annotations")
+        app.dependency_overrides[get_current_active_user] = lambda: SimpleNamespace(id=1, username="ada")
+        annotation = {"meeting_id": 1, "annotation_type": "text", "content": {"text": "hi"}}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            empty = await client.post("/annotations/meetings/1/batch", json=[])
+            oversized = await client.post("/annotations/meetings/1/batch",
+                                          json=[annotation] * (settings.ANNOTATION_BATCH_MAX + 1))
+        return empty, oversized
+
+    batch_max = settings.ANNOTATION_BATCH_MAX
+    try:
+        settings.ANNOTATION_BATCH_MAX = 3
+        empty, oversized = asyncio.run(run())
+    finally:
+        settings.ANNOTATION_BATCH_MAX = batch_max
+    assert empty.status_code == 400, empty.text
+    assert oversized.status_code == 413, oversized.text
+    assert "At most 3" in oversized.json()["detail"]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_concurrent_writes_get_their_own_rows_in_input_order,
+        test_failed_group_is_retried_per_request,
+        test_batch_endpoint_rejects_empty_and_oversized_batches,
+    ]
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            print(f"✗ {test.__name__}: {e}")
+            sys.exit(1)
+    print("\n✓ All tests passed!")
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Tests for cross-worker fan-out through the pub/sub backplane
+
+Each "worker" is a ConnectionManager / WebRTCManager with its own backplane
+instance, connected through the in-process hub or a local Unix socket hub.
+Run with pytest or directly: python -m backend.test_backplane
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from fastapi.websockets import WebSocketState
+
+from backend.api.webrtc import WebRTCManager, router as webrtc_router
+from backend.backplane import InProcessBackplane, SocketBackplane
+from backend.websocket import ConnectionManager
+
+
+class FakeWebSocket:
+    client_state = WebSocketState.CONNECTED
+
+    def __init__(self):
+        self.received = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        self.received.append(message)
+
+
+class DeadWebSocket(FakeWebSocket):
+    async def send_text(self, message: str):
+        raise RuntimeError("connection lost")
+
+
+class SlowWebSocket(FakeWebSocket):
+    async def send_text(self, message: str):
+        await asyncio.sleep(0.2)
+        self.received.append(message)
+
+
+async def _settle():
+    for _ in range(20):
+        await asyncio.sleep(0.01)
+
+
+async def _room_broadcast(backplanes):
+    workers = [ConnectionManager(backplane=backplane) for backplane in backplanes]
+    sockets = []
+    for worker in workers:
+        websocket = FakeWebSocket()
+        await worker.connect(websocket, 1)
+        sockets.append(websocket)
+    # A socket in another meeting must not receive the broadcast
+    other_meeting = FakeWebSocket()
+    await workers[1].connect(other_meeting, 2)
+
+    await workers[0].broadcast("hello", 1)
+    await _settle()
+    await workers[1].broadcast("world", 1)
+    await _settle()
+    return sockets, other_meeting
+
+
+def test_in_process_room_broadcast():
+    async def run():
+        backplanes = [InProcessBackplane("test-room") for _ in range(3)]
+        sockets, other_meeting = await _room_broadcast(backplanes)
+        for backplane in backplanes:
+            await backplane.stop()
+        return sockets, other_meeting
+
+    sockets, other_meeting = asyncio.run(run())
+    for websocket in sockets:
+        assert websocket.received == ["hello", "world"], websocket.received
+    assert other_meeting.received == []
+
+
+def test_socket_room_broadcast_and_failover():
+    path = os.path.join(tempfile.mkdtemp(prefix="nexchamps-test-"), "backplane.sock")
+
+    async def run():
+        backplanes = [SocketBackplane(f"unix://{path}") for _ in range(3)]
+        for backplane in backplanes:
+            await backplane.start()
+        assert [backplane.is_hub for backplane in backplanes] == [True, False, False]
+        sockets, _ = await _room_broadcast(backplanes)
+        for websocket in sockets:
+            assert websocket.received == ["hello", "world"], websocket.received
+
+        # Replayed envelopes are dropped by origin and sequence number
+        envelope = {"origin": backplanes[0].origin, "seq": 1, "topic": "room_broadcast",
+                    "data": {"meeting_id": 1, "message": "hello", "key": None}}
+        backplanes[1]._deliver(envelope)
+        assert backplanes[1].duplicates == 1
+
+        # When the hub worker goes away another worker takes over
+        await backplanes[0].stop()
+        for _ in range(50):
+            await asyncio.sleep(0.1)
+            if any(backplane.is_hub for backplane in backplanes[1:]) and all(
+                backplane._connected.is_set() for backplane in backplanes[1:]
+            ):
+                break
+        received = []
+        backplanes[2].subscribe("ping", received.append)
+        backplanes[1].publish("ping", {"n": 1})
+        await _settle()
+        for backplane in backplanes[1:]:
+            await backplane.stop()
+        return received
+
+    try:
+        assert asyncio.run(run()) == [{"n": 1}]
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+        os.rmdir(os.path.dirname(path))
+
+
+def test_only_the_hub_worker_may_start():
+    path = os.path.join(tempfile.mkdtemp(prefix="nexchamps-test-"), "backplane.sock")
+
+    async def run():
+        hub, second = SocketBackplane(f"unix://{path}"), SocketBackplane(f"unix://{path}")
+        await hub.start()
+        await second.start()
+        hub.check_sole_worker()
+        try:
+            second.check_sole_worker()
+            refused = False
+        except RuntimeError:
+            refused = True
+        await second.stop()
+        await hub.stop()
+        return refused
+
+    try:
+        assert asyncio.run(run())
+        # A memory backplane never reaches another process
+        InProcessBackplane("test-sole").check_sole_worker()
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+        os.rmdir(os.path.dirname(path))
+
+
+def test_webrtc_broadcast_across_workers():
+    async def run():
+        backplanes = [InProcessBackplane("test-webrtc") for _ in range(2)]
+        workers = [WebRTCManager(backplane=backplane) for backplane in backplanes]
+        alice, bob, carol = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        await workers[0].connect(alice, 1, "alice")
+        await workers[1].connect(bob, 1, "bob")
+        await workers[1].connect(carol, 1, "carol")
+        await workers[0].broadcast_sdp(1, "alice", {"type": "offer"})
+        await workers[1].broadcast_ice_candidate(1, "bob", {"candidate": "c"})
+        await _settle()
+        for backplane in backplanes:
+            await backplane.stop()
+        return alice, bob, carol
+
+    alice, bob, carol = asyncio.run(run())
+    assert len(alice.received) == 1 and '"ice_candidate"' in alice.received[0]
+    assert len(bob.received) == 1 and '"sdp"' in bob.received[0]
+    assert len(carol.received) == 2
+
+
+def test_webrtc_targeted_signaling_across_workers():
+    async def run():
+        backplanes = [InProcessBackplane("test-webrtc-direct") for _ in range(2)]
+        workers = [WebRTCManager(backplane=backplane, ice_batch_ms=10) for backplane in backplanes]
+        alice, bob, carol = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        await workers[0].connect(alice, 1, "alice")
+        await workers[1].connect(bob, 1, "bob")
+        await workers[1].connect(carol, 1, "carol")
+        await workers[0].send_sdp(1, "alice", "bob", {"type": "offer"})
+        for n in range(3):
+            workers[0].send_ice_candidates(1, "alice", "bob", [{"candidate": n}])
+        await _settle()
+        for backplane in backplanes:
+            await backplane.stop()
+        return alice, bob, carol
+
+    alice, bob, carol = asyncio.run(run())
+    assert alice.received == [] and carol.received == []
+    assert len(bob.received) == 2, bob.received
+    assert '"sdp"' in bob.received[0]
+    assert json.loads(bob.received[1]) == {
+        "type": "ice_candidates", "sender": "alice", "candidates": [{"candidate": 0}, {"candidate": 1}, {"candidate": 2}]
+    }
+
+
+def test_webrtc_dead_or_slow_peer_does_not_affect_sender():
+    async def run():
+        signaling = WebRTCManager(backplane=InProcessBackplane("test-webrtc-dead"))
+        alice, dead, slow, carol = FakeWebSocket(), DeadWebSocket(), SlowWebSocket(), FakeWebSocket()
+        for websocket, name in ((alice, "alice"), (dead, "dead"), (slow, "slow"), (carol, "carol")):
+            await signaling.connect(websocket, 1, name)
+        # Raises nothing into the sender's handler
+        await signaling.send_sdp(1, "alice", "dead", {"type": "offer"})
+        broadcast = asyncio.create_task(signaling.broadcast_sdp(1, "alice", {"type": "offer"}))
+        await asyncio.sleep(0.05)
+        carol_first = len(carol.received)
+        await broadcast
+        return carol_first, slow
+
+    carol_first, slow = asyncio.run(run())
+    assert carol_first == 1
+    assert len(slow.received) == 1
+
+
+def test_webrtc_malformed_candidates_are_not_relayed():
+    app = FastAPI()
+    app.include_router(webrtc_router)
+    client = TestClient(app)
+    with client.websocket_connect("/meetings/31/webrtc/alice") as alice, \
+            client.websocket_connect("/meetings/31/webrtc/bob") as bob:
+        alice.send_json({"type": "ice_candidates", "to": "bob", "candidates": "junk"})
+        alice.send_json({"type": "ice_candidates", "to": "bob", "candidates": [{"candidate": "a"}, 3]})
+        alice.send_json({"type": "ice_candidate", "to": "bob", "candidate": None})
+        alice.send_json({"type": "ice_candidates", "to": "bob", "candidates": [{"candidate": "c"}]})
+        # The socket survived the bad messages and only the valid batch arrives
+        assert bob.receive_json() == {"type": "ice_candidate", "sender": "alice", "candidate": {"candidate": "c"}}
+
+
+if __name__ == "__main__":
+    tests = [
+        test_in_process_room_broadcast,
+        test_socket_room_broadcast_and_failover,
+        test_only_the_hub_worker_may_start,
+        test_webrtc_broadcast_across_workers,
+        test_webrtc_targeted_signaling_across_workers,
+        test_webrtc_dead_or_slow_peer_does_not_affect_sender,
+        test_webrtc_malformed_candidates_are_not_relayed,
+    ]
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            print(f"✗ {test.__name__}: {e}")
+            sys.exit(1)
+    print("\n✓ All tests passed!")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for read/write routing of async sessions under the SQLite profile
+
+Plain reads go to the reader pool, flushes and DML to the single writer
+connection, and a transaction that has written keeps reading from the
+writer until it ends.
+Run with pytest or directly: python -m backend.test_database_routing
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+from sqlalchemy import event, update
+from sqlmodel import SQLModel, create_engine, select
+
+from backend.config import settings
+from backend.database import create_async_engines, make_async_session_maker
+from backend.models.meetings import Meeting
+
+
+def test_sessions_read_from_the_reader_and_write_through_the_writer():
+    async def run(path: str):
+        reader, writer = create_async_engines(f"sqlite+aiosqlite:///{path}")
+        assert reader is not writer
+        statements = []
+        for name, engine in (("reader", reader), ("writer", writer)):
+            @event.listens_for(engine.sync_engine, "before_cursor_execute")
+            def _record(conn, cursor, statement, parameters, context, executemany, name=name):
+                statements.append((name, statement.split()[0]))
+
+        def routed():
+            routed_statements = list(statements)
+            statements.clear()
+            return routed_statements
+
+        session_maker = make_async_session_maker(reader, writer)
+        async with session_maker() as session:
+            assert (await session.exec(select(Meeting))).all() == []
+            assert routed() == [("reader", "SELECT")]
+
+            session.add(Meeting(id=1, name="First"))
+            await session.flush()
+            assert routed() == [("writer", "INSERT")]
+            # Reads in the same transaction see its own write
+            assert [meeting.name for meeting in (await session.exec(select(Meeting))).all()] == ["First"]
+            assert routed() == [("writer", "SELECT")]
+            await session.commit()
+
+            assert [meeting.id for meeting in (await session.exec(select(Meeting))).all()] == [1]
+            assert routed() == [("reader", "SELECT")]
+
+            await session.exec(update(Meeting).values(name="Renamed"))
+            assert routed() == [("writer", "UPDATE")]
+            assert (await session.exec(select(Meeting.name))).all() == ["Renamed"]
+            assert routed() == [("writer", "SELECT")]
+            await session.rollback()
+
+            # Back on the reader once the transaction has ended, rolled back or not
+            assert (await session.exec(select(Meeting.name))).all() == ["First"]
+            assert routed() == [("reader", "SELECT")]
+
+        pool = writer.sync_engine.pool
+        journal_mode = await _journal_mode(reader)
+        await reader.dispose()
+        await writer.dispose()
+        return pool.size(), journal_mode
+
+    profile = settings.SQLITE_PRODUCTION_PROFILE
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "test.db")
+        engine = create_engine(f"sqlite:///{path}")
+        SQLModel.metadata.create_all(engine)
+        engine.dispose()
+        try:
+            settings.SQLITE_PRODUCTION_PROFILE = True
+            writer_pool_size, journal_mode = asyncio.run(run(path))
+        finally:
+            settings.SQLITE_PRODUCTION_PROFILE = profile
+
+    assert writer_pool_size == 1
+    assert journal_mode == "wal"
+
+
+async def _journal_mode(engine) -> str:
+    async with engine.connect() as conn:
+        return (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_sessions_read_from_the_reader_and_write_through_the_writer,
+    ]
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            print(f"✗ {test.__name__}: {e}")
+            sys.exit(1)
+    print("\n✓ All tests passed!")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for the event-loop stall detector, the sampling profiler and the
+admin-only diagnostics endpoints
+
+Run with pytest or directly: python -m backend.test_diagnostics
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api.diagnostics import router as diagnostics_router
+from backend.diagnostics import SamplingProfiler, StallDetector, profiler
+from backend.utils import auth
+from backend.utils.auth import create_access_token
+
+
+def blocking_handler():
+    time.sleep(0.3)
+
+
+def spin(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_stall_detector_captures_blocking_stack():
+    async def run():
+        detector = StallDetector(threshold_ms=50)
+        detector.start()
+        await asyncio.sleep(0.1)
+        blocking_handler()
+        await asyncio.sleep(0.1)
+        await detector.stop()
+        return detector
+
+    detector = asyncio.run(run())
+    assert detector.stall_count == 1
+    stall = detector.stalls[-1]
+    assert "blocking_handler" in "".join(stall["stack"])
+    assert stall["duration_ms"] >= 250
+
+
+def test_profiler_writes_collapsed_stacks():
+    with tempfile.TemporaryDirectory() as directory:
+        sampler = SamplingProfiler(interval_ms=1, output_dir=directory)
+        sampler.start()
+        spin(0.3)
+        path = sampler.stop()
+        with open(path) as output:
+            lines = output.read().splitlines()
+    assert sampler.samples > 20
+    stack, count = lines[0].rsplit(" ", 1)
+    assert stack.startswith("MainThread;") and stack.endswith(".spin")
+    assert int(count) > 20
+
+
+def test_diagnostics_endpoints_are_admin_only():
+    app = FastAPI()
+    app.include_router(diagnostics_router, prefix="/diagnostics")
+    client = TestClient(app)
+    admins = auth.settings.ADMIN_USERNAMES
+    auth.settings.ADMIN_USERNAMES = ["root"]
+    with tempfile.TemporaryDirectory() as directory:
+        profiler.output_dir = directory
+        try:
+            user = {"Authorization": f"Bearer {create_access_token({'sub': 'ada', 'user_id': 1})}"}
+            admin = {"Authorization": f"Bearer {create_access_token({'sub': 'root', 'user_id': 2})}"}
+            assert client.post("/diagnostics/profiler/start").status_code == 401
+            assert client.post("/diagnostics/profiler/start", headers=user).status_code == 403
+
+            assert client.post("/diagnostics/profiler/start?interval_ms=1", headers=admin).status_code == 200
+            assert client.get("/diagnostics/", headers=admin).json()["profiler"]["running"] is True
+            time.sleep(0.05)
+            stopped = client.post("/diagnostics/profiler/stop", headers=admin).json()
+            assert stopped["samples"] > 0 and os.path.exists(stopped["path"])
+            assert client.post("/diagnostics/profiler/stop", headers=admin).status_code == 409
+        finally:
+            auth.settings.ADMIN_USERNAMES = admins
+
+
+if __name__ == "__main__":
+    tests = [
+        test_stall_detector_captures_blocking_stack,
+        test_profiler_writes_collapsed_stacks,
+        test_diagnostics_endpoints_are_admin_only,
+    ]
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            print(f"✗ {test.__name__}: {e}")
+            sys.exit(1)
+    print("\n✓ All tests passed!")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Tests for the WebSocket wire formats: negotiation, encoding each message
+once per format and decoding incoming frames
+
+Messages at or above WS_COMPRESSION_MIN_BYTES are zlib-compressed under
+deflate, so a JSON + deflate client gets both text and binary frames.
+The MessagePack cases only run when the msgpack package is installed.
+Run with pytest or directly: python -m backend.test_frame_codec
+"""
+
+import json
+import sys
+import tempfile
+import zlib
+
+from fastapi.testclient import TestClient
+
+from backend.config import settings
+from backend.test_heartbeat import _meeting_app
+from backend.utils import frame_codec
+from backend.utils.auth import create_access_token
+from backend.utils.frame_codec import DEFLATE, JSON, MSGPACK, NONE, FrameCache, WireFormat, decode, negotiate
+
+SMALL = json.dumps({"type": "event", "data": {"n": 1}, "seq": 7})
+LARGE = json.dumps({"type": "event", "data": {"text": "x" * settings.WS_COMPRESSION_MIN_BYTES}, "seq": 8})
+
+FORMATS = [WireFormat(JSON, NONE), WireFormat(JSON, DEFLATE)]
+if frame_codec.msgpack is not None:
+    FORMATS += [WireFormat(MSGPACK, NONE), WireFormat(MSGPACK, DEFLATE)]
+
+
+def _is_msgpack_map(frame) -> bool:
+    return isinstance(frame, bytes) and (0x80 <= frame[0] <= 0x8f or frame[0] in (0xde, 0xdf))
+
+
+def test_negotiate_validates_the_requested_format():
+    assert negotiate() == frame_codec.DEFAULT_FORMAT == WireFormat(JSON, NONE)
+    assert negotiate(None, DEFLATE) == WireFormat(JSON, DEFLATE)
+    for wire_format in FORMATS:
+        assert negotiate(*wire_format) == wire_format
+    for encoding, compression in (("xml", None), (JSON, "gzip"), (None, "br")):
+        try:
+            negotiate(encoding, compression)
+            raise AssertionError(f"{encoding}/{compression} was accepted")
+        except ValueError:
+            pass
+    if frame_codec.msgpack is None:
+        try:
+            negotiate(MSGPACK)
+            raise AssertionError("msgpack was accepted without the package")
+        except ValueError:
+            pass
+
+
+def test_frames_round_trip_below_and_above_the_compression_threshold():
+    assert len(SMALL) < settings.WS_COMPRESSION_MIN_BYTES <= len(LARGE)
+    for wire_format in FORMATS:
+        for message in (SMALL, LARGE):
+            frames = FrameCache(message)
+            frame = frames.frame(wire_format)
+            # Built once per format
+            assert frames.frame(wire_format) is frame
+            assert decode(frame) == json.loads(message), wire_format
+
+            compressed = wire_format.compression == DEFLATE and message is LARGE
+            if compressed:
+                assert isinstance(frame, bytes) and frame[:1] == b"\x78", wire_format
+            elif wire_format.encoding == JSON:
+                # Small deflate messages stay text frames, unchanged
+                assert frame == message
+            else:
+                assert _is_msgpack_map(frame), wire_format
+    assert FrameCache(LARGE).frame(frame_codec.DEFAULT_FORMAT) is LARGE
+
+
+def test_decode_detects_the_format_of_incoming_frames():
+    message = {"type": "pong"}
+    assert decode(json.dumps(message)) == message
+    # Binary JSON, plain or compressed, is told apart by its first byte
+    assert decode(json.dumps(message).encode()) == message
+    assert decode(json.dumps([1, 2]).encode()) == [1, 2]
+    assert decode(zlib.compress(json.dumps(message).encode())) == message
+    for bad in (b"\x78not zlib", b"\xc1"):
+        try:
+            decode(bad)
+            raise AssertionError(f"{bad!r} was decoded")
+        except ValueError:
+            pass
+    if frame_codec.msgpack is not None:
+        packed = frame_codec.msgpack.packb(message)
+        assert decode(packed) == message
+        assert decode(zlib.compress(packed)) == message
+
+
+def test_hello_switches_the_frame_format_of_a_connection():
+    with tempfile.TemporaryDirectory() as directory:
+        client = TestClient(_meeting_app(directory))
+        token = create_access_token({"sub": "ada", "user_id": 1})
+        with client.websocket_connect(f"/ws/meetings/4242?token={token}") as websocket:
+            assert websocket.receive_json()["type"] == "connected"
+
+            websocket.send_json({"type": "hello", "encoding": "xml"})
+            assert websocket.receive_json()["data"]["request"] == "hello"
+
+            websocket.send_json({"type": "hello", "encoding": JSON, "compression": DEFLATE})
+            frame = websocket.receive()
+            assert json.loads(frame["text"]) == {"type": "protocol", "data": {"encoding": JSON, "compression": DEFLATE}}
+            # A reply above the threshold arrives as a compressed binary frame, small ones stay text
+            websocket.send_json({"type": "hello", "encoding": "x" * settings.WS_COMPRESSION_MIN_BYTES})
+            frame = websocket.receive()
+            assert frame["bytes"][:1] == b"\x78"
+            assert decode(frame["bytes"])["data"]["request"] == "hello"
+            websocket.send_json({"type": "join"})
+            assert json.loads(websocket.receive()["text"])["type"] == "participant_joined"
+
+            if frame_codec.msgpack is not None:
+                websocket.send_json({"type": "hello", "encoding": MSGPACK})
+                frame = websocket.receive()
+                assert _is_msgpack_map(frame["bytes"])
+                assert decode(frame["bytes"])["data"] == {"encoding": MSGPACK, "compression": NONE}
+                # Clients may send binary frames too
+                websocket.send_bytes(frame_codec.msgpack.packb({"type": "hello"}))
+                assert websocket.receive_json() == {"type": "protocol", "data": {"encoding": JSON, "compression": NONE}}
+
+
+if __name__ == "__main__":
+    tests = [
+        test_negotiate_validates_the_requested_format,
+        test_frames_round_trip_below_and_above_the_compression_threshold,
+        test_decode_detects_the_format_of_incoming_frames,
+        test_hello_switches_the_frame_format_of_a_connection,
+    ]
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            print(f"✗ {test.__name__}: {e}")
+            sys.exit(1)
+    print("\n✓ All tests passed!")
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Tests for the meeting WebSocket: heartbeat, handshake authentication,
+dead-connection cleanup and token/phase commands
+
+Run with pytest or directly: python -m backend.test_heartbeat
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+from fastapi import FastAPI, WebSocketDisconnect
+from fastapi.testclient import TestClient
+from fastapi.websockets import WebSocketState
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from backend.api import websocket as websocket_api
+from backend.api.webrtc import WebRTCManager
+from backend.backplane import InProcessBackplane
+from backend.database import get_async_session
+from backend.heartbeat import Heartbeat
+from backend.models.meetings import Meeting
+from backend.models.participants import Participant
+from backend.utils.auth import create_access_token
+from backend.websocket import ConnectionManager, manager
+
+
+class FakeWebSocket:
+    client_state = WebSocketState.CONNECTED
+
+    def __init__(self):
+        self.received = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        self.received.append(message)
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0.01)
+
+
+def test_heartbeat_pings_quiet_and_reaps_silent_connections():
+    async def run():
+        backplane = InProcessBackplane("test-heartbeat")
+        room = ConnectionManager(backplane=backplane)
+        signaling = WebRTCManager(backplane=backplane)
+        live, silent, peer = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        await room.connect(live, 1)
+        await room.connect(silent, 1)
+        room.meeting_rooms[1]["participants"][7] = {"name": "Silent", "websocket": silent}
+        await signaling.connect(peer, 1, "peer")
+
+        heartbeat = Heartbeat(interval=10, timeout=30)
+        heartbeat.targets = [room, signaling]
+        start = room.senders[live].last_seen
+
+        heartbeat.beat(start + 15)
+        await _settle()
+        assert heartbeat.pings_sent == 3
+        assert json.loads(live.received[-1]) == {"type": "ping"}
+        assert json.loads(peer.received[-1]) == {"type": "ping"}
+
+        room.senders[live].last_seen = start + 20
+        signaling.last_seen[peer] = start + 20
+        heartbeat.beat(start + 35)
+        await _settle()
+        await backplane.stop()
+        return room, signaling, live, silent, heartbeat
+
+    room, signaling, live, silent, heartbeat = asyncio.run(run())
+    assert heartbeat.connections_reaped == 1
+    assert room.connection_counts() == {1: 1}
+    assert silent not in room.senders and silent.close_code == 1001
+    assert room.meeting_rooms[1]["participants"] == {}
+    assert [json.loads(message)["type"] for message in live.received[-2:]] == ["participant_left", "ping"]
+    assert signaling.connection_counts() == {1: 1}
+
+
+def test_webrtc_disconnect_keeps_reconnected_peer():
+    async def run():
+        signaling = WebRTCManager(backplane=InProcessBackplane("test-heartbeat-webrtc"))
+        old, new = FakeWebSocket(), FakeWebSocket()
+        await signaling.connect(old, 1, "peer")
+        await signaling.connect(new, 1, "peer")
+        # The old handler exits after the peer reconnected
+        signaling.disconnect(1, "peer", old)
+        return signaling, old, new
+
+    signaling, old, new = asyncio.run(run())
+    assert signaling.meeting_rooms[1]["peer"] is new
+    assert old not in signaling.last_seen and new in signaling.last_seen
+
+
+def _meeting_app(directory: str):
+    """The meeting socket router on a fresh database with one participant; returns (app, token)"""
+    path = os.path.join(directory, "test.db")
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(Meeting(id=4242, name="Test"))
+        db.add(Participant(meeting_id=4242, user_id="ada", name="Ada", role="participant"))
+        db.add(Participant(meeting_id=4242, user_id="fac", name="Fac", role="facilitator"))
+        db.add(Participant(meeting_id=4242, user_id="obs", name="Obs", role="observer"))
+        db.commit()
+    engine.dispose()
+    session_maker = async_sessionmaker(create_async_engine(f"sqlite+aiosqlite:///{path}"), class_=AsyncSession)
+
+    async def override_session():
+        async with session_maker() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(websocket_api.router)
+    app.dependency_overrides[get_async_session] = override_session
+    return app
+
+
+def test_handshake_requires_participant_token():
+    with tempfile.TemporaryDirectory() as directory:
+        client = TestClient(_meeting_app(directory))
+        stranger = create_access_token({"sub": "mallory", "user_id": 99})
+        for url in ("/ws/meetings/4242", "/ws/meetings/4242?token=garbage", f"/ws/meetings/4242?token={stranger}"):
+            try:
+                with client.websocket_connect(url):
+                    pass
+                raise AssertionError(f"{url} was accepted")
+            except WebSocketDisconnect as e:
+                assert e.code == 1008
+
+        observer = create_access_token({"sub": "obs", "user_id": 2})
+        with client.websocket_connect("/ws/meetings/4242", headers={"Authorization": f"Bearer {observer}"}) as websocket:
+            assert websocket.receive_json()["type"] == "connected"
+            websocket.send_json({"type": "annotations", "annotations": [{"annotation_type": "text", "content": {}}]})
+            assert websocket.receive_json()["data"] == {"request": "annotations", "detail": "forbidden"}
+
+
+def test_bad_frame_does_not_leak_connection():
+    with tempfile.TemporaryDirectory() as directory:
+        client = TestClient(_meeting_app(directory))
+        token = create_access_token({"sub": "ada", "user_id": 1})
+        with client.websocket_connect(f"/ws/meetings/4242?token={token}") as websocket:
+            assert websocket.receive_json()["type"] == "connected"
+            # The participant comes from the token, not from the message
+            websocket.send_json({"type": "join", "participant_id": 77, "participant_name": "Eve"})
+            assert websocket.receive_json()["data"] == {"participant_id": 1, "participant_name": "Ada"}
+            websocket.send_text("{not json")
+            assert websocket.receive_json()["data"]["request"] == "frame"
+            websocket.send_json({"type": "pong"})
+    assert 4242 not in manager.active_connections
+    assert manager.meeting_rooms[4242]["participants"] == {}
+
+
+def test_token_and_phase_commands():
+    with tempfile.TemporaryDirectory() as directory:
+        client = TestClient(_meeting_app(directory))
+        tokens = {name: create_access_token({"sub": name, "user_id": 1}) for name in ("ada", "fac", "obs")}
+        with client.websocket_connect(f"/ws/meetings/4242?token={tokens['ada']}") as ada, \
+                client.websocket_connect(f"/ws/meetings/4242?token={tokens['fac']}") as fac, \
+                client.websocket_connect(f"/ws/meetings/4242?token={tokens['obs']}") as obs:
+            for websocket in (ada, fac, obs):
+                websocket.receive_json()
+
+            ada.send_json({"type": "claim", "request_id": 1})
+            changed = ada.receive_json()
+            assert changed["type"] == "token_changed" and changed["data"]["participant_id"] == 1
+            ack = ada.receive_json()
+            assert ack["type"] == "ack" and ack["request_id"] == 1 and ack["data"]["seq"] == changed["seq"]
+            assert fac.receive_json() == changed and obs.receive_json() == changed
+
+            obs.send_json({"type": "claim", "request_id": 2})
+            assert obs.receive_json()["data"]["error"] == "forbidden"
+            fac.send_json({"type": "release", "request_id": 3})
+            assert fac.receive_json()["data"]["error"] == "not_holder"
+
+            fac.send_json({"type": "force_release", "request_id": 4})
+            assert fac.receive_json()["data"]["event_type"] == "force_release"
+            assert fac.receive_json()["type"] == "ack"
+
+            ada.receive_json()
+            ada.send_json({"type": "change_phase", "request_id": 5, "phase_name": "clarification"})
+            assert ada.receive_json()["data"]["error"] == "forbidden"
+            fac.send_json({"type": "change_phase", "request_id": 6, "phase_name": "clarification"})
+            assert fac.receive_json()["type"] == "phase_changed"
+            assert fac.receive_json()["data"]["phase_name"] == "clarification"
+            fac.send_json({"type": "change_phase", "request_id": 7, "phase_name": "feedback"})
+            nack = fac.receive_json()
+            assert nack["type"] == "nack" and nack["data"]["error"] == "rejected"
+
+
+if __name__ == "__main__":
+    tests = [
+        test_heartbeat_pings_quiet_and_reaps_silent_connections,
+        test_webrtc_disconnect_keeps_reconnected_peer,
+        test_handshake_requires_participant_token,
+        test_bad_frame_does_not_leak_connection,
+        test_token_and_phase_commands,
+    ]
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            print(f"✗ {test.__name__}: {e}")
+            sys.exit(1)
+    print("\n✓ All tests passed!")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for the request instrumentation and the /metrics exposition
+
+Run with pytest or directly: python -m backend.test_metrics
+"""
+
+import os
+import sys
+import tempfile
+
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, create_engine
+
+from backend.api.metrics import CONTENT_TYPE, router as metrics_router
+from backend.metrics import Histogram, Metrics, MetricsMiddleware
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    assert histogram.render("latency", route="/a") == [
+        'latency_bucket{route="/a",le="0.1"} 2',
+        'latency_bucket{route="/a",le="1.0"} 3',
+        'latency_bucket{route="/a",le="+Inf"} 4',
+        'latency_sum{route="/a"} 3.65',
+        'latency_count{route="/a"} 4',
+    ]
+
+
+def test_middleware_records_route_template_status_and_queries():
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'test.db')}")
+        registry = Metrics()
+        registry.install(engine)
+
+        def get_db():
+            with Session(engine) as session:
+                yield session
+
+        app = FastAPI()
+
+        @app.get("/meetings/{meeting_id}")
+        def read_meeting(meeting_id: int, db: Session = Depends(get_db)):
+            db.exec(text("SELECT 1"))
+            db.exec(text("SELECT 2"))
+            if meeting_id == 0:
+                raise HTTPException(status_code=404, detail="Meeting not found")
+            return {"id": meeting_id}
+
+        app.add_middleware(MetricsMiddleware, registry=registry)
+        client = TestClient(app)
+        for meeting_id in (1, 2, 0):
+            client.get(f"/meetings/{meeting_id}")
+        client.get("/nowhere/at/all")
+        engine.dispose()
+
+    route = registry.routes[("GET", "/meetings/{meeting_id}")]
+    assert route.latency.count == 3
+    assert route.statuses == {"2xx": 2, "4xx": 1}
+    assert route.db_statements == 6 and route.db_seconds > 0
+    assert registry.routes[("GET", "unmatched")].statuses == {"4xx": 1}
+    assert registry.db_statements.count == 6
+
+
+def test_failed_statements_do_not_leak_start_times():
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'test.db')}")
+        registry = Metrics()
+        registry.install(engine)
+        with engine.connect() as conn:
+            for statement in ("SELECT 1", "SELECT * FROM missing", "SELECT 2"):
+                try:
+                    conn.execute(text(statement))
+                except OperationalError:
+                    pass
+            leaked = conn.info.get("metrics_start")
+        engine.dispose()
+    assert leaked == []
+    assert registry.db_statements.count == 2
+
+
+def test_metrics_endpoint_serves_text_exposition():
+    app = FastAPI()
+    app.include_router(metrics_router)
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE
+    body = response.text
+    for family in ("nexchamps_event_loop_lag_seconds", "nexchamps_threadpool_busy", "nexchamps_ws_connections",
+                   "nexchamps_backplane_published_total", "nexchamps_token_timeouts_total",
+                   "nexchamps_auth_token_cache_hits_total"):
+        assert f"# TYPE {family} " in body, family
+
+
+if __name__ == "__main__":
+    tests = [
+        test_histogram_renders_cumulative_buckets,
+        test_middleware_records_route_template_status_and_queries,
+        test_failed_statements_do_not_leak_start_times,
+        test_metrics_endpoint_serves_text_exposition,
+    ]
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            print(f"✗ {test.__name__}: {e}")
+            sys.exit(1)
+    print("\n✓ All tests passed!")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for the password hasher pool and its back-pressure
+
+A hasher with max_pending operations in flight turns further ones away,
+and the endpoints that check passwords answer 429 with Retry-After.
+Run with pytest or directly: python -m backend.test_password_hasher
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+from types import SimpleNamespace
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from backend.api.users import router as users_router
+from backend.database import get_async_session
+from backend.models.users import User
+from backend.password_hasher import PasswordHasher, PasswordHasherBusy, password_hasher
+from backend.utils.auth import get_current_active_user, get_password_hash, verify_password
+
+
+def test_hasher_turns_away_operations_over_max_pending():
+    async def run():
+        hasher = PasswordHasher(workers=1, max_pending=2, executor="thread")
+        await hasher.start()
+        hashed = await hasher.hash("correct horse")
+        results = await asyncio.gather(
+            hasher.verify("correct horse", hashed),
+            hasher.verify("wrong", hashed),
+            hasher.verify("correct horse", hashed),
+            return_exceptions=True,
+        )
+        pending = hasher.pending
+        hasher.shutdown()
+        return hashed, results, pending, hasher.rejected
+
+    hashed, results, pending, rejected = asyncio.run(run())
+    assert verify_password("correct horse", hashed)
+    assert results[:2] == [True, False]
+    assert isinstance(results[2], PasswordHasherBusy)
+    assert rejected == 1 and pending == 0
+
+
+def test_saturated_hasher_answers_429_with_retry_after():
+    async def run(path: str):
+        session_maker = async_sessionmaker(create_async_engine(f"sqlite+aiosqlite:///{path}"), class_=AsyncSession,
+                                           expire_on_commit=False)
+
+        async def override_session():
+            async with session_maker() as session:
+                yield session
+
+        app = FastAPI()
+        app.include_router(users_router)
+        app.dependency_overrides[get_async_session] = override_session
+        app.dependency_overrides[get_current_active_user] = lambda: SimpleNamespace(id=1, username="ada")
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            # One operation in flight, held until released, fills a hasher that admits one
+            release = threading.Event()
+            busy = asyncio.create_task(password_hasher._run(release.wait))
+            await asyncio.sleep(0)
+            update = await client.put("/users/me", json={"password": "new secret"})
+            delete = await client.request("DELETE", "/users/me", json={"password": "secret"})
+            release.set()
+            await busy
+            # Free again: the same requests go through
+            updated = await client.put("/users/me", json={"password": "new secret"})
+            wrong = await client.request("DELETE", "/users/me", json={"password": "secret"})
+            deleted = await client.request("DELETE", "/users/me", json={"password": "new secret"})
+        return update, delete, updated, wrong, deleted
+
+    max_pending = password_hasher.max_pending
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "test.db")
+        engine = create_engine(f"sqlite:///{path}")
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as db:
+            db.add(User(id=1, username="ada", email="ada@example.com", full_name="Ada",
+                        hashed_password=get_password_hash("secret")))
+            db.commit()
+        try:
+            password_hasher.max_pending = 1
+            update, delete, updated, wrong, deleted = asyncio.run(run(path))
+        finally:
+            password_hasher.max_pending = max_pending
+            password_hasher.shutdown()
+        with Session(engine) as db:
+            user = db.get(User, 1)
+        engine.dispose()
+
+    for response in (update, delete):
+        assert response.status_code == 429, response.text
+        assert response.headers["Retry-After"] == "1"
+    assert updated.status_code == 200, updated.text
+    assert wrong.status_code == 401
+    assert deleted.status_code == 204
+    assert verify_password("new secret", user.hashed_password) and not user.is_active
+
+
+if __name__ == "__main__":
+    tests = [
+        test_hasher_turns_away_operations_over_max_pending,
+        test_saturated_hasher_answers_429_with_retry_after,
+    ]
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            print(f"✗ {test.__name__}: {e}")
+            sys.exit(1)
+    print("\n✓ All tests passed!")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for the sampled SQL query log: what each mode logs, the dropped
+counter of a full queue, and failing statements
+
+Run with pytest or directly: python -m backend.test_query_log
+"""
+
+import json
+import logging
+import os
+import queue
+import sys
+import tempfile
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import create_engine
+
+from backend.query_log import DroppingQueueHandler, QueryLog, logger
+
+
+def _run(log: QueryLog, statements):
+    """Execute the statements on a temporary database timed by `log`; returns the queued records"""
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'test.db')}")
+        log.install(engine)
+        try:
+            with engine.connect() as conn:
+                for statement in statements:
+                    try:
+                        conn.execute(text(statement))
+                    except OperationalError:
+                        pass
+                leaked = conn.info.get("query_start")
+        finally:
+            logger.removeHandler(log.handler)
+            engine.dispose()
+    records = []
+    while not log.handler.queue.empty():
+        records.append(log.handler.queue.get_nowait())
+    return records, leaked
+
+
+def test_sampled_mode_logs_its_share_plus_slow_statements():
+    records, _ = _run(QueryLog(mode="sampled", sample_rate=1.0, slow_ms=60000), ["SELECT 1", "SELECT  2"])
+    assert [json.loads(record.getMessage())["statement"] for record in records] == ["SELECT 1", "SELECT 2"]
+    assert all(record.levelno == logging.INFO for record in records)
+
+    log = QueryLog(mode="sampled", sample_rate=0.0, slow_ms=60000)
+    records, _ = _run(log, ["SELECT 1", "SELECT 2"])
+    assert records == []
+    assert log.stats()["statements"] == 2 and log.stats()["logged"] == 0
+
+    # Slow statements are logged whatever the sample rate
+    log = QueryLog(mode="sampled", sample_rate=0.0, slow_ms=0)
+    records, _ = _run(log, ["SELECT 1"])
+    assert len(records) == 1 and records[0].levelno == logging.WARNING
+    assert json.loads(records[0].getMessage())["slow"] is True
+
+
+def test_slow_mode_logs_only_slow_statements():
+    log = QueryLog(mode="slow", sample_rate=1.0, slow_ms=60000)
+    records, _ = _run(log, ["SELECT 1", "SELECT 2"])
+    assert records == []
+    assert log.stats()["slow_statements"] == 0
+
+    log = QueryLog(mode="slow", slow_ms=0)
+    records, _ = _run(log, ["SELECT 1", "SELECT 2"])
+    assert len(records) == 2
+    assert log.stats()["slow_statements"] == 2 and log.stats()["logged"] == 2
+
+
+def test_full_queue_drops_and_counts_records():
+    handler = DroppingQueueHandler(queue.Queue(2))
+    for n in range(5):
+        handler.handle(logging.LogRecord("test", logging.INFO, __file__, 0, f"record {n}", None, None))
+    assert handler.dropped == 3
+    assert handler.queue.qsize() == 2
+
+    log = QueryLog(mode="slow", slow_ms=0)
+    log.handler = DroppingQueueHandler(queue.Queue(1))
+    records, _ = _run(log, ["SELECT 1", "SELECT 2", "SELECT 3"])
+    assert len(records) == 1
+    assert log.stats()["logged"] == 3 and log.stats()["dropped"] == 2
+
+
+def test_failed_statements_do_not_leak_start_times():
+    log = QueryLog(mode="sampled", sample_rate=1.0, slow_ms=60000)
+    records, leaked = _run(log, ["SELECT 1", "SELECT * FROM missing", "SELECT * FROM missing", "SELECT 2"])
+    assert leaked == []
+    assert log.stats()["statements"] == 2
+    assert [json.loads(record.getMessage())["statement"] for record in records] == ["SELECT 1", "SELECT 2"]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_sampled_mode_logs_its_share_plus_slow_statements,
+        test_slow_mode_logs_only_slow_statements,
+        test_full_queue_drops_and_counts_records,
+        test_failed_statements_do_not_leak_start_times,
+    ]
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            print(f"✗ {test.__name__}: {e}")
+            sys.exit(1)
+    print("\n✓ All tests passed!")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression tests for the meeting-scoped tables
+
+Runs EXPLAIN QUERY PLAN on the hot queries against a fresh SQLite schema
+and checks that each one is served by its composite index.
+Run with pytest or directly: python -m backend.test_query_plans
+"""
+
+import sys
+from sqlmodel import SQLModel, create_engine, select, text
+
+from backend.database import ensure_indexes
+from backend.models.tokens import TokenEvent
+from backend.models.annotations import Annotation
+from backend.models.phases import Phase
+from backend.models.participants import Participant
+from backend.models.decisions import Decision
+from backend.models.invitations import Invitation
+
+# (description, statement, index expected in the plan)
+HOT_QUERIES = [
+    (
+        "active token of a meeting",
+        select(TokenEvent).where(TokenEvent.meeting_id == 1, TokenEvent.is_active == True),
+        "ix_tokenevent_meeting_id_is_active",
+    ),
+    (
+        "token log of a meeting in time order",
+        select(TokenEvent.participant_id, TokenEvent.event_type, TokenEvent.created_at)
+        .where(TokenEvent.meeting_id == 1)
+        .order_by(TokenEvent.created_at, TokenEvent.id),
+        "ix_tokenevent_meeting_id_created_at",
+    ),
+    (
+        "annotations of a meeting in time order",
+        select(Annotation).where(Annotation.meeting_id == 1).order_by(Annotation.created_at, Annotation.id),
+        "ix_annotation_meeting_id_created_at",
+    ),
+    (
+        "current phase of a meeting",
+        select(Phase).where(Phase.meeting_id == 1, Phase.is_current == True),
+        "ix_phase_meeting_id_is_current",
+    ),
+    (
+        "participant row of a user in a meeting",
+        select(Participant).where(Participant.meeting_id == 1, Participant.user_id == "alice"),
+        "ix_participant_meeting_id_user_id",
+    ),
+    (
+        "decisions of a meeting",
+        select(Decision).where(Decision.meeting_id == 1),
+        "ix_decision_meeting_id_created_at",
+    ),
+    (
+        "invitation by token",
+        select(Invitation).where(Invitation.token == "abc"),
+        "ix_invitation_token",
+    ),
+]
+
+
+def _engine():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def _plan(engine, statement):
+    sql = statement.compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.connect() as conn:
+        return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+def test_hot_queries_use_composite_indexes():
+    """Each hot meeting-scoped query is answered through its index"""
+    engine = _engine()
+    for description, statement, index in HOT_QUERIES:
+        plan = _plan(engine, statement)
+        assert any(index in step for step in plan), f"{description}: expected {index}, got {plan}"
+        assert not any("TEMP B-TREE" in step for step in plan), f"{description}: extra sort in {plan}"
+        print(f"✓ {description}: {index}")
+
+
+def test_ensure_indexes_migrates_existing_database():
+    """Indexes missing from an older database are created, once"""
+    engine = _engine()
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_tokenevent_meeting_id_is_active"))
+        conn.execute(text("DROP INDEX ix_invitation_token"))
+
+    created = ensure_indexes(engine)
+    assert sorted(created) == ["ix_invitation_token", "ix_tokenevent_meeting_id_is_active"]
+    assert ensure_indexes(engine) == []
+    print("✓ ensure_indexes recreated missing indexes")
+
+
+if __name__ == "__main__":
+    print("Starting query plan tests...")
+    test_hot_queries_use_composite_indexes()
+    test_ensure_indexes_migrates_existing_database()
+    print("\n✓ All tests passed!")
+    sys.exit(0)
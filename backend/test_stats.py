@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Tests for the meeting stats aggregation and the audit trail pages and
+exports
+
+Run with pytest or directly: python -m backend.test_stats
+"""
+
+import asyncio
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from backend.api import stats as stats_api
+from backend.api.stats import compute_meeting_stats
+from backend.database import async_session_maker, get_async_session
+from backend.models.annotations import Annotation
+from backend.models.meetings import Meeting
+from backend.models.participants import Participant
+from backend.models.tokens import TokenEvent
+from backend.utils.auth import get_current_active_user
+
+START = datetime(2026, 1, 5, 9, 0, 0)
+
+
+def _stats(directory: str, events):
+    """Stats of a meeting with participants Ada (1) and Bob (2) and the given (participant, type, second) events"""
+    path = os.path.join(directory, "test.db")
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(Meeting(id=1, name="Test"))
+        db.add(Participant(id=1, meeting_id=1, user_id="ada", name="Ada"))
+        db.add(Participant(id=2, meeting_id=1, user_id="bob", name="Bob"))
+        for participant_id, event_type, second in events:
+            db.add(TokenEvent(meeting_id=1, participant_id=participant_id, event_type=event_type,
+                              created_at=START + timedelta(seconds=second)))
+        db.commit()
+    engine.dispose()
+
+    async def run():
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        async with async_sessionmaker(async_engine, class_=AsyncSession)() as db:
+            stats = await compute_meeting_stats(db, 1)
+        await async_engine.dispose()
+        return stats
+
+    return asyncio.run(run())["token_stats"]
+
+
+def test_timed_out_hold_ends_at_the_timeout():
+    with tempfile.TemporaryDirectory() as directory:
+        stats = _stats(directory, [
+            (1, "claim", 0), (1, "timeout", 120), (2, "claim", 130), (2, "release", 140),
+        ])
+    assert stats["Ada"]["claim_count"] == 1 and stats["Ada"]["total_hold_time_seconds"] == 120
+    assert stats["Bob"]["claim_count"] == 1 and stats["Bob"]["total_hold_time_seconds"] == 10
+
+
+def test_timeout_as_last_event_does_not_count_until_now():
+    with tempfile.TemporaryDirectory() as directory:
+        stats = _stats(directory, [(1, "claim", 0), (1, "release", 30), (2, "claim", 40), (2, "timeout", 160)])
+    assert stats["Ada"]["total_hold_time_seconds"] == 30
+    assert stats["Bob"]["total_hold_time_seconds"] == 120
+
+
+def _audit_database(directory: str) -> str:
+    """A meeting whose token events and annotations share ids and timestamps"""
+    path = os.path.join(directory, "test.db")
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(Meeting(id=1, name="Test"))
+        db.add(Participant(id=1, meeting_id=1, user_id="ada", name="Ada"))
+        for second in (0, 0, 1, 2, 2, 2):
+            created_at = START + timedelta(seconds=second)
+            db.add(TokenEvent(meeting_id=1, participant_id=1, event_type="claim", created_at=created_at))
+            db.add(Annotation(meeting_id=1, participant_id=1, annotation_type="text", content="{}",
+                              timestamp_ms=second * 1000, created_at=created_at))
+        db.commit()
+    engine.dispose()
+    return path
+
+
+def _audit_client(path: str) -> TestClient:
+    session_maker = async_sessionmaker(create_async_engine(f"sqlite+aiosqlite:///{path}"), class_=AsyncSession)
+
+    async def override_session():
+        async with session_maker() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(stats_api.router, prefix="/stats")
+    app.dependency_overrides[get_async_session] = override_session
+    app.dependency_overrides[get_current_active_user] = lambda: {"username": "ada"}
+    # The export opens its own session
+    stats_api.async_session_maker = session_maker
+    return TestClient(app)
+
+
+def _event_ids(events):
+    return [(event["type"], event.get("event_id") or event.get("annotation_id")) for event in events]
+
+
+def test_audit_pages_cover_both_tables_without_gaps():
+    with tempfile.TemporaryDirectory() as directory:
+        client = _audit_client(_audit_database(directory))
+        try:
+            everything = client.get("/stats/meetings/1/audit").json()
+            assert everything["next_cursor"] is None
+            expected = _event_ids(everything["events"])
+            # Same instant: token events before annotations, then by id
+            assert expected[:4] == [("token_event", 1), ("token_event", 2), ("annotation", 1), ("annotation", 2)]
+            assert len(expected) == 12
+
+            for limit in (1, 2, 3, 5):
+                collected, after = [], None
+                while True:
+                    params = {"limit": limit, **({"after": after} if after else {})}
+                    page = client.get("/stats/meetings/1/audit", params=params).json()
+                    collected += _event_ids(page["events"])
+                    after = page["next_cursor"]
+                    if after is None:
+                        break
+                assert collected == expected, limit
+
+            page = client.get("/stats/meetings/1/audit", params={"limit": 3}).json()
+            assert page["next_cursor"] == f"{START.isoformat()},annotation,1"
+            # A cursor without the source resumes after the token event, repeating rather than skipping
+            legacy = client.get("/stats/meetings/1/audit", params={"after": f"{START.isoformat()},1"}).json()
+            assert _event_ids(legacy["events"]) == expected[1:]
+            for bad in ("junk", f"{START.isoformat()},votes,1", f"{START.isoformat()},annotation,x"):
+                assert client.get("/stats/meetings/1/audit", params={"after": bad}).status_code == 400
+        finally:
+            stats_api.async_session_maker = async_session_maker
+
+
+def test_export_streams_every_format():
+    export_chunk_size = stats_api.EXPORT_CHUNK_SIZE
+    with tempfile.TemporaryDirectory() as directory:
+        client = _audit_client(_audit_database(directory))
+        try:
+            expected = _event_ids(client.get("/stats/meetings/1/audit").json()["events"])
+
+            response = client.get("/stats/meetings/1/export", params={"format": "json"})
+            assert response.headers["content-type"].startswith("application/json")
+            assert _event_ids(json.loads(response.text)["events"]) == expected
+
+            response = client.get("/stats/meetings/1/export", params={"format": "ndjson"})
+            assert _event_ids([json.loads(line) for line in response.text.splitlines()]) == expected
+
+            after = f"{START.isoformat()},annotation,2"
+            response = client.get("/stats/meetings/1/export", params={"format": "ndjson", "after": after})
+            assert _event_ids([json.loads(line) for line in response.text.splitlines()]) == expected[4:]
+
+            # Small chunks: the CSV body arrives in several pieces that still form one document
+            stats_api.EXPORT_CHUNK_SIZE = 100
+
+            async def chunks():
+                return [chunk async for chunk in stats_api._export_audit(1, "csv", None)]
+
+            pieces = asyncio.run(chunks())
+            assert len(pieces) > 2
+            rows = list(csv.DictReader(io.StringIO("".join(pieces))))
+            assert [(row["type"], int(row["event_id"] or row["annotation_id"])) for row in rows] == expected
+
+            assert client.get("/stats/meetings/1/export", params={"format": "xml"}).status_code == 400
+        finally:
+            stats_api.EXPORT_CHUNK_SIZE = export_chunk_size
+            stats_api.async_session_maker = async_session_maker
+
+
+if __name__ == "__main__":
+    tests = [
+        test_timed_out_hold_ends_at_the_timeout,
+        test_timeout_as_last_event_does_not_count_until_now,
+        test_audit_pages_cover_both_tables_without_gaps,
+        test_export_streams_every_format,
+    ]
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            print(f"✗ {test.__name__}: {e}")
+            sys.exit(1)
+    print("\n✓ All tests passed!")
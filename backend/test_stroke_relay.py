@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests for the live stroke relay
+
+Run with pytest or directly: python -m backend.test_stroke_relay
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+from fastapi.websockets import WebSocketState
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from backend.annotation_writer import annotation_writer
+from backend.models.annotations import Annotation
+from backend.stroke_relay import StrokeRelay
+from backend.utils.annotation_codec import decode_content
+from backend.websocket import manager
+
+
+class FakeWebSocket:
+    client_state = WebSocketState.CONNECTED
+
+    def __init__(self):
+        self.received = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        self.received.append(json.loads(message))
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0.02)
+
+
+def _with_relay(meeting_id: int, scenario):
+    """Run scenario(relay, receiver) with annotations going to a fresh database; returns (result, rows, received)"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "test.db")
+        engine = create_engine(f"sqlite:///{path}")
+        SQLModel.metadata.create_all(engine)
+
+        async def run():
+            async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+            annotation_writer.start(async_engine)
+            receiver = FakeWebSocket()
+            await manager.connect(receiver, meeting_id)
+            try:
+                result = await scenario(StrokeRelay(tick_ms=10), receiver)
+                await _settle()
+            finally:
+                manager.disconnect(receiver, meeting_id)
+                await annotation_writer.stop()
+                await async_engine.dispose()
+            return result, receiver.received
+
+        result, received = asyncio.run(run())
+        with Session(engine) as db:
+            rows = db.exec(select(Annotation).order_by(Annotation.id)).all()
+        engine.dispose()
+    return result, rows, received
+
+
+def test_drawers_may_reuse_a_stroke_id():
+    ada, bob = object(), object()
+
+    async def scenario(relay, receiver):
+        assert relay.add_points(9101, ada, {"stroke_id": "s1", "participant_id": 1, "points": [[0, 0], [1, 1]]})
+        assert relay.add_points(9101, bob, {"stroke_id": "s1", "participant_id": 2, "points": [[50, 50]]})
+        assert relay.add_points(9101, ada, {"stroke_id": "s1", "points": [[2, 2]]})
+        first = await relay.end(9101, ada, "s1")
+        second = await relay.end(9101, bob, "s1", [[51, 52]])
+        return first, second
+
+    (first, second), rows, received = _with_relay(9101, scenario)
+    assert first["participant_id"] == 1 and second["participant_id"] == 2
+    assert [decode_content(row.content, row.content_packed)["points"] for row in rows] == [
+        [[0, 0], [1, 1], [2, 2]], [[50, 50], [51, 52]],
+    ]
+    committed = [message["data"] for message in received if message["type"] == "stroke_committed"]
+    assert [(data["participant_id"], data["points"]) for data in committed] == [(1, 3), (2, 2)]
+
+
+def test_non_numeric_timestamp_is_rejected():
+    owner = object()
+
+    async def scenario(relay, receiver):
+        rejected = relay.add_points(9102, owner, {"stroke_id": "s", "timestamp_ms": "soon", "points": [[0, 0]]})
+        accepted = relay.add_points(9102, owner, {"stroke_id": "s", "timestamp_ms": 1500.0, "points": [[0, 0]]})
+        await relay.end(9102, owner, "s")
+        return rejected, accepted
+
+    (rejected, accepted), rows, _ = _with_relay(9102, scenario)
+    assert rejected is False and accepted is True
+    assert [row.timestamp_ms for row in rows] == [1500]
+
+
+def test_stroke_ended_while_expiring_is_persisted_once():
+    owner = object()
+
+    async def scenario(relay, receiver):
+        relay.add_points(9103, owner, {"stroke_id": "s", "points": [[0, 0], [3, 4]]})
+        for stroke in relay.strokes[9103].values():
+            stroke.updated_at -= 3600
+        broadcast = manager.broadcast
+
+        async def yielding_broadcast(*args, **kwargs):
+            # As with a busy backplane: the other commits run while this one waits
+            await asyncio.sleep(0.01)
+            return await broadcast(*args, **kwargs)
+
+        manager.broadcast = yielding_broadcast
+        try:
+            return await asyncio.gather(
+                relay.end(9103, owner, "s"), relay._expire(9103), relay.drop_owner(9103, owner)
+            )
+        finally:
+            del manager.broadcast
+
+    _, rows, received = _with_relay(9103, scenario)
+    assert len(rows) == 1
+    assert [message["type"] for message in received].count("stroke_committed") == 1
+    # The last points went out before the commit notice
+    assert [message["type"] for message in received][-2:] == ["strokes", "stroke_committed"]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_drawers_may_reuse_a_stroke_id,
+        test_non_numeric_timestamp_is_rejected,
+        test_stroke_ended_while_expiring_is_persisted_once,
+    ]
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            print(f"✗ {test.__name__}: {e}")
+            sys.exit(1)
+    print("\n✓ All tests passed!")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-memory token arbiter and its event log writer
+
+Run with pytest or directly: python -m backend.test_token_arbiter
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from backend.models.tokens import TokenEvent
+from backend.token_arbiter import TokenArbiter
+
+
+def _engine(directory: str):
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'test.db')}")
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def _rows(engine):
+    with Session(engine) as session:
+        return session.exec(select(TokenEvent).order_by(TokenEvent.id)).all()
+
+
+def test_database_assigns_ids_next_to_other_writers():
+    with tempfile.TemporaryDirectory() as directory:
+        engine = _engine(directory)
+        arbiter = TokenArbiter(window_ms=0)
+        arbiter.start(engine)
+        first = arbiter.claim(1, 10)
+        assert first.id is None
+        arbiter.flush()
+        # Another process logs an event in between
+        now = datetime.utcnow()
+        with Session(engine) as session:
+            session.execute(insert(TokenEvent), [{"meeting_id": 2, "participant_id": 20, "event_type": "claim",
+                                                  "is_active": True, "created_at": now, "updated_at": now}])
+            session.commit()
+        assert arbiter.release(1, 10) is not None
+        assert arbiter.claim(1, 11) is not None
+        arbiter.stop()
+
+        rows = _rows(engine)
+        assert [(row.meeting_id, row.participant_id, row.event_type, row.is_active) for row in rows] == [
+            (1, 10, "claim", False), (2, 20, "claim", True), (1, 10, "release", False), (1, 11, "claim", True),
+        ]
+        assert arbiter.failed_events == 0
+
+        restarted = TokenArbiter(window_ms=0)
+        restarted.start(engine)
+        assert restarted.current_holder(1).participant_id == 11
+        assert restarted.current_holder(1).id == rows[-1].id
+        restarted.stop()
+        engine.dispose()
+
+
+def test_failed_batch_is_written_row_by_row():
+    with tempfile.TemporaryDirectory() as directory:
+        engine = _engine(directory)
+        arbiter = TokenArbiter(window_ms=50)
+        arbiter.start(engine)
+        arbiter.claim(1, 10)
+        # A row the database refuses lands in the same batch
+        arbiter._queue.put({"meeting_id": None, "participant_id": 99, "event_type": "claim", "is_active": True,
+                            "created_at": datetime.utcnow(), "updated_at": datetime.utcnow()})
+        arbiter.claim(2, 20)
+        arbiter.stop()
+
+        assert arbiter.failed_events == 1
+        assert [(row.meeting_id, row.participant_id) for row in _rows(engine)] == [(1, 10), (2, 20)]
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_database_assigns_ids_next_to_other_writers,
+        test_failed_batch_is_written_row_by_row,
+    ]
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            print(f"✗ {test.__name__}: {e}")
+            sys.exit(1)
+    print("\n✓ All tests passed!")
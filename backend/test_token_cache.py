@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for the verified access token cache and token revocation
+
+Run with pytest or directly: python -m backend.test_token_cache
+"""
+
+import sys
+import time
+from datetime import timedelta
+
+from jose import jwt
+
+from backend.config import settings
+from backend.utils.auth import TokenCache, User, authenticate_token, create_access_token, token_cache
+
+# Far from the ids other tests use, since revocations are kept by the global cache
+USER_ID = 990001
+
+
+def _token(user_id: int, issued_at: int) -> str:
+    return jwt.encode({"sub": "ada", "user_id": user_id, "iat": issued_at, "exp": issued_at + 600},
+                      settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def test_least_recently_used_entry_is_evicted_at_max_size():
+    cache = TokenCache(max_size=2)
+    expires_at = time.time() + 60
+    for name in ("a", "b"):
+        cache.put(cache.digest(name), User(id=1, username=name), expires_at)
+    assert cache.get(cache.digest("a")).username == "a"
+    cache.put(cache.digest("c"), User(id=1, username="c"), expires_at)
+    assert cache.get(cache.digest("b")) is None
+    assert [cache.get(cache.digest(name)).username for name in ("a", "c")] == ["a", "c"]
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 1}
+
+    disabled = TokenCache(max_size=0)
+    disabled.put(disabled.digest("a"), User(id=1, username="a"), expires_at)
+    assert disabled.stats()["size"] == 0
+
+
+def test_entries_expire_at_the_token_expiry():
+    cache = TokenCache(max_size=10)
+    cache.put(cache.digest("old"), User(id=1, username="old"), time.time() - 1)
+    cache.put(cache.digest("soon"), User(id=1, username="soon"), time.time() + 0.05)
+    assert cache.get(cache.digest("old")) is None
+    assert cache.get(cache.digest("soon")).username == "soon"
+    time.sleep(0.1)
+    assert cache.get(cache.digest("soon")) is None
+    assert cache.stats()["size"] == 0
+
+    # An expired token is refused even though its signature is valid
+    expired = create_access_token({"sub": "ada", "user_id": USER_ID + 1}, expires_delta=timedelta(seconds=-5))
+    assert authenticate_token(expired) is None
+
+
+def test_revocation_evicts_cached_tokens_and_rejects_earlier_ones():
+    token = create_access_token({"sub": "ada", "user_id": USER_ID})
+    other = create_access_token({"sub": "bob", "user_id": USER_ID + 2})
+    try:
+        assert authenticate_token(token).id == USER_ID
+        assert authenticate_token(other).id == USER_ID + 2
+        digest = token_cache.digest(token)
+        assert token_cache.get(digest) is not None
+
+        token_cache.revoke_user(USER_ID)
+        assert token_cache.get(digest) is None
+        assert authenticate_token(token) is None
+        # Nobody else is affected
+        assert authenticate_token(other).id == USER_ID + 2
+
+        revoked_at = int(token_cache._revoked[USER_ID])
+        # Issued in the revocation's second: it may predate it, so it counts as revoked
+        assert authenticate_token(_token(USER_ID, revoked_at)) is None
+        assert authenticate_token(_token(USER_ID, revoked_at - 60)) is None
+        assert authenticate_token(_token(USER_ID, revoked_at + 1)).id == USER_ID
+        assert token_cache.is_revoked(USER_ID, None)
+        assert not token_cache.is_revoked(USER_ID + 2, int(time.time()))
+    finally:
+        token_cache._revoked.pop(USER_ID, None)
+        token_cache.clear()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_least_recently_used_entry_is_evicted_at_max_size,
+        test_entries_expire_at_the_token_expiry,
+        test_revocation_evicts_cached_tokens_and_rejects_earlier_ones,
+    ]
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            print(f"✗ {test.__name__}: {e}")
+            sys.exit(1)
+    print("\n✓ All tests passed!")
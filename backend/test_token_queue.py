@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for the expression token waiting line and hold-time limit
+
+Run with pytest or directly: python -m backend.test_token_queue
+"""
+
+import asyncio
+import json
+import sys
+
+from fastapi.websockets import WebSocketState
+
+from backend.backplane import InProcessBackplane
+from backend.token_arbiter import TokenArbiter
+from backend.token_queue import TokenQueue
+from backend.websocket import ConnectionManager
+
+
+class FakeWebSocket:
+    client_state = WebSocketState.CONNECTED
+
+    def __init__(self):
+        self.received = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        self.received.append(json.loads(message))
+
+
+def _events(websocket):
+    return [
+        (message["data"]["event_type"], message["data"]["participant_id"]) if message["type"] == "token_changed"
+        else ("line", message["data"]["waiting"])
+        for message in websocket.received
+    ]
+
+
+async def _room(name: str, max_hold: float):
+    manager = ConnectionManager(backplane=InProcessBackplane(name))
+    websocket = FakeWebSocket()
+    await manager.connect(websocket, 1)
+    return TokenQueue(TokenArbiter(), manager, max_hold_seconds=max_hold), websocket
+
+
+def test_release_hands_off_by_priority_then_arrival():
+    async def run():
+        queue, websocket = await _room("test-token-queue", max_hold=0)
+        event, _ = await queue.claim(1, 10)
+        assert event is not None
+        assert await queue.claim(1, 11) == (None, None)
+        assert await queue.claim(1, 11, wait=True) == (None, 1)
+        assert await queue.claim(1, 12, "observer", wait=True) == (None, None)
+        assert await queue.claim(1, 13, "facilitator", wait=True) == (None, 1)
+        assert await queue.claim(1, 14, wait=True) == (None, 3)
+        assert queue.leave(1, 14) and not queue.leave(1, 14)
+        assert await queue.release(1, 10) is not None
+        await asyncio.sleep(0.01)
+        return queue, websocket
+
+    queue, websocket = asyncio.run(run())
+    assert queue.arbiter.current_holder(1).participant_id == 13
+    assert queue.line(1) == [11]
+    assert _events(websocket) == [
+        ("claim", 10), ("line", [11]), ("line", [13, 11]), ("line", [13, 11, 14]), ("line", [13, 11]),
+        ("release", 10), ("claim", 13), ("line", [11]),
+    ]
+
+
+def test_hold_time_limit_passes_the_token_on():
+    async def run():
+        queue, websocket = await _room("test-token-queue-timeout", max_hold=0.05)
+        queue.start()
+        await queue.claim(1, 10)
+        await queue.claim(1, 11, wait=True)
+        await asyncio.sleep(0.08)
+        first_holder = queue.arbiter.current_holder(1)
+        # A release before the deadline leaves nothing for the scheduler to expire
+        await queue.release(1, 11)
+        await asyncio.sleep(0.08)
+        await queue.stop()
+        return queue, websocket, first_holder
+
+    queue, websocket, first_holder = asyncio.run(run())
+    assert first_holder.participant_id == 11
+    assert queue.timeouts == 1 and queue.hand_offs == 1
+    assert queue.arbiter.current_holder(1) is None
+    assert _events(websocket) == [
+        ("claim", 10), ("line", [11]), ("timeout", 10), ("claim", 11), ("line", []), ("release", 11),
+    ]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_release_hands_off_by_priority_then_arrival,
+        test_hold_time_limit_passes_the_token_on,
+    ]
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            print(f"✗ {test.__name__}: {e}")
+            sys.exit(1)
+    print("\n✓ All tests passed!")
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Tests for the room connection manager: sequence stamping, the
+slow-consumer policies of the outbound queues and resuming clients
+
+Run with pytest or directly: python -m backend.test_websocket
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+
+from fastapi.testclient import TestClient
+from fastapi.websockets import WebSocketState
+
+from backend.backplane import InProcessBackplane
+from backend.test_heartbeat import _meeting_app
+from backend.utils.auth import create_access_token
+from backend.websocket import COALESCE, DISCONNECT, DROP_OLDEST, ConnectionManager, RoomEvents
+
+
+class FakeWebSocket:
+    client_state = WebSocketState.CONNECTED
+
+    def __init__(self):
+        self.received = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        self.received.append(message)
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0.01)
+
+
+def _types(websocket: FakeWebSocket):
+    return [json.loads(message)["type"] for message in websocket.received]
+
+
+def test_record_stamps_objects_and_keeps_frames():
+    events = RoomEvents(size=10)
+    assert json.loads(events.record({"type": "a", "data": {"seq": "mine"}})) == {
+        "type": "a", "data": {"seq": "mine"}, "seq": 1,
+    }
+    assert json.loads(events.record({})) == {"seq": 2}
+    # A stale seq is replaced, not duplicated
+    assert json.loads(events.record({"seq": 99, "type": "b"})) == {"seq": 3, "type": "b"}
+    # Frames that are not JSON objects are numbered and replayed, but left untouched
+    for frame in ("hello", "[1, 2]", "", " {\"type\": \"c\"}"):
+        assert events.record(frame) == frame
+    assert events.seq == 7
+    assert events.since(5) == ["", " {\"type\": \"c\"}"]
+    assert events.since(7) == []
+
+
+async def _flooded(policy: str, messages):
+    """Queue messages for a connection whose writer has not run yet"""
+    room = ConnectionManager(max_queue=2, policy=policy, backplane=InProcessBackplane(f"test-{policy}"))
+    websocket = FakeWebSocket()
+    await room.connect(websocket, 1)
+    metrics = room.metrics_for(1)
+    for message, key in messages:
+        room.broadcast_nowait(message, 1, key)
+    await _settle()
+    await room.backplane.stop()
+    return room, websocket, metrics
+
+
+def test_drop_oldest_policy_keeps_the_newest_messages():
+    async def run():
+        return await _flooded(DROP_OLDEST, [({"type": f"m{n}"}, "k") for n in range(4)])
+
+    room, websocket, metrics = asyncio.run(run())
+    assert _types(websocket) == ["m2", "m3"]
+    assert metrics.messages_dropped == 2 and metrics.messages_coalesced == 0
+    assert websocket in room.senders
+
+
+def test_coalesce_policy_replaces_queued_messages_with_the_same_key():
+    async def run():
+        return await _flooded(COALESCE, [
+            ({"type": "token_1"}, "token"), ({"type": "joined"}, None), ({"type": "token_2"}, "token"),
+            ({"type": "token_3"}, "token"), ({"type": "left"}, None),
+        ])
+
+    room, websocket, metrics = asyncio.run(run())
+    # token_2 and then token_3 replace the queued token state at the tail; "left" has no
+    # key and drops the oldest message, which is now "joined"
+    assert _types(websocket) == ["token_3", "left"]
+    assert [json.loads(message)["seq"] for message in websocket.received] == [4, 5]
+    assert metrics.messages_coalesced == 2 and metrics.messages_dropped == 1
+
+    async def run_keyed():
+        return await _flooded(COALESCE, [
+            ({"type": "token_1"}, "token"), ({"type": "phase_1"}, "phase"), ({"type": "phase_2"}, "phase"),
+        ])
+
+    _, websocket, metrics = asyncio.run(run_keyed())
+    assert _types(websocket) == ["token_1", "phase_2"]
+    # Sequence numbers follow the broadcasts, so a coalesced one leaves a visible gap
+    assert [json.loads(message)["seq"] for message in websocket.received] == [1, 3]
+
+
+def test_disconnect_policy_drops_the_connection():
+    async def run():
+        return await _flooded(DISCONNECT, [({"type": f"m{n}"}, None) for n in range(3)])
+
+    room, websocket, metrics = asyncio.run(run())
+    assert websocket.close_code == 1008
+    assert websocket not in room.senders
+    assert 1 not in room.active_connections
+    assert metrics.slow_disconnects == 1
+    # Nothing was written before the writer task was cancelled
+    assert websocket.received == []
+
+
+def test_resume_replays_missed_events_or_sends_a_snapshot():
+    async def run():
+        room = ConnectionManager(backplane=InProcessBackplane("test-resume"))
+        snapshots = []
+
+        async def build_snapshot(meeting_id, seq):
+            snapshots.append(seq)
+            return {"epoch": room.epoch, "seq": seq}
+
+        room._build_snapshot = build_snapshot
+        listener = FakeWebSocket()
+        await room.connect(listener, 1)
+        room.room_events[1] = RoomEvents(size=3)
+        for n in range(5):
+            await room.broadcast({"type": "event", "data": {"n": n}}, 1)
+        await _settle()
+
+        async def resume(epoch, last_seq):
+            websocket = FakeWebSocket()
+            await room.connect(websocket, 1)
+            await room.resume(websocket, 1, epoch, last_seq)
+            await _settle()
+            room.disconnect(websocket, 1)
+            return [json.loads(message) for message in websocket.received]
+
+        results = {
+            "caught_up": await resume(room.epoch, 3),
+            "current": await resume(room.epoch, 5),
+            "too_old": await resume(room.epoch, 1),
+            "ahead": await resume(room.epoch, 9),
+            # Sequence numbers from before a restart mean nothing now
+            "other_epoch": await resume("previous-process", 3),
+            "fresh": await resume(None, None),
+        }
+        await room.backplane.stop()
+        return room, results, snapshots
+
+    room, results, snapshots = asyncio.run(run())
+    caught_up = results["caught_up"]
+    assert [(message["type"], message.get("seq")) for message in caught_up] == [
+        ("event", 4), ("event", 5), ("resumed", None),
+    ]
+    assert caught_up[0]["data"] == {"n": 3}
+    assert caught_up[-1]["data"] == {"epoch": room.epoch, "seq": 5, "replayed": 2}
+    assert results["current"] == [{"type": "resumed", "data": {"epoch": room.epoch, "seq": 5, "replayed": 0}}]
+    for name in ("too_old", "ahead", "other_epoch", "fresh"):
+        assert results[name] == [{"type": "snapshot", "data": {"epoch": room.epoch, "seq": 5}}], name
+    # Built once and served from the cache while the room has no new events
+    assert snapshots == [5]
+
+    # Malformed resume requests get an error and leave the connection open
+    with tempfile.TemporaryDirectory() as directory:
+        client = TestClient(_meeting_app(directory))
+        token = create_access_token({"sub": "ada", "user_id": 1})
+        with client.websocket_connect(f"/ws/meetings/4242?token={token}") as websocket:
+            connected = websocket.receive_json()
+            assert connected["type"] == "connected"
+            for bad in ({"epoch": connected["data"]["epoch"], "last_seq": "5"}, {"last_seq": -1},
+                        {"last_seq": True}, {"epoch": 7, "last_seq": 0}):
+                websocket.send_json({"type": "resume", **bad})
+                assert websocket.receive_json()["data"]["request"] == "resume", bad
+            websocket.send_json({"type": "join"})
+            assert websocket.receive_json()["type"] == "participant_joined"
+
+
+if __name__ == "__main__":
+    tests = [
+        test_record_stamps_objects_and_keeps_frames,
+        test_drop_oldest_policy_keeps_the_newest_messages,
+        test_coalesce_policy_replaces_queued_messages_with_the_same_key,
+        test_disconnect_policy_drops_the_connection,
+        test_resume_replays_missed_events_or_sends_a_snapshot,
+    ]
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError as e:
+            print(f"✗ {test.__name__}: {e}")
+            sys.exit(1)
+    print("\n✓ All tests passed!")
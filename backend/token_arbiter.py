@@ -0,0 +1,207 @@
+"""
+In-memory arbiter for the meeting expression token.
+
+The arbiter is the single authority on who holds each meeting's token.
+Claims, releases and force-releases are compare-and-set operations on an
+in-memory map guarded by one lock, so concurrent claimants can never both
+win. Every transition is appended to the ``tokenevent`` table by a
+background writer thread; on startup the arbiter rebuilds its state from
+that table.
+
+Event ids are assigned by the database when the writer inserts the row,
+so events handed out before that have ``id=None``. A release closes the
+meeting's active claim rows by meeting rather than by id.
+"""
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert, update
+from sqlmodel import Session, select
+
+from backend.config import settings
+from backend.models.tokens import TokenEvent, TokenEventRead
+
+logger = logging.getLogger(__name__)
+
+# Most events written in one transaction
+MAX_BATCH = 500
+
+class TokenArbiter:
+    def __init__(self, window_ms: Optional[float] = None):
+        self.window = (settings.TOKEN_LOG_WINDOW_MS if window_ms is None else window_ms) / 1000
+        self._lock = threading.Lock()
+        self._holders: Dict[int, TokenEventRead] = {}  # meeting_id -> active claim event
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue()
+        self._engine = None
+        self._writer: Optional[threading.Thread] = None
+        self.failed_events = 0
+
+    def start(self, engine):
+        """Rebuild token state from the event log and start the writer thread"""
+        self._engine = engine
+        with Session(engine) as session:
+            active = session.exec(
+                select(TokenEvent)
+                .where(TokenEvent.is_active == True)
+                .order_by(TokenEvent.id)
+            ).all()
+
+        with self._lock:
+            self._holders = {event.meeting_id: TokenEventRead.model_validate(event) for event in active}
+
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(
+                target=self._write_loop, name="token-arbiter-writer", daemon=True
+            )
+            self._writer.start()
+        logger.info(f"Token arbiter started with {len(self._holders)} active token(s)")
+
+    def stop(self):
+        """Flush pending events and stop the writer thread"""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._writer = None
+
+    def flush(self):
+        """Block until every queued event has been written"""
+        self._queue.join()
+
+    def current_holder(self, meeting_id: int) -> Optional[TokenEventRead]:
+        """Return the active claim event of a meeting, if any"""
+        return self._holders.get(meeting_id)
+
+    def holders(self) -> List[TokenEventRead]:
+        """Active claim events of every meeting"""
+        with self._lock:
+            return list(self._holders.values())
+
+    def claim(self, meeting_id: int, participant_id: Optional[int]) -> Optional[TokenEventRead]:
+        """Claim the token if it is free; return None if someone holds it"""
+        with self._lock:
+            if meeting_id in self._holders:
+                return None
+            event = self._record(meeting_id, participant_id, "claim", True)
+            self._holders[meeting_id] = event
+        return event
+
+    def release(self, meeting_id: int, participant_id: Optional[int]) -> Optional[TokenEventRead]:
+        """Release the token held by participant_id; return None if not the holder"""
+        with self._lock:
+            active = self._holders.get(meeting_id)
+            if active is None or active.participant_id != participant_id:
+                return None
+            del self._holders[meeting_id]
+            return self._record(meeting_id, participant_id, "release", False)
+
+    def force_release(self, meeting_id: int, released_by: Optional[int] = None,
+                      event_type: str = "force_release") -> Optional[TokenEventRead]:
+        """Release the token whoever holds it; return None if it is free.
+
+        ``event_type`` is "timeout" when the hold time ran out.
+        """
+        with self._lock:
+            active = self._holders.pop(meeting_id, None)
+            if active is None:
+                return None
+            participant_id = released_by if released_by is not None else active.participant_id
+            return self._record(meeting_id, participant_id, event_type, False)
+
+    def _record(
+        self,
+        meeting_id: int,
+        participant_id: Optional[int],
+        event_type: str,
+        is_active: bool,
+    ) -> TokenEventRead:
+        # Caller holds self._lock
+        now = datetime.utcnow()
+        row = {
+            "meeting_id": meeting_id,
+            "participant_id": participant_id,
+            "event_type": event_type,
+            "is_active": is_active,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self._queue.put(row)
+        # A plain read model: building a table model instance costs ~10x more
+        return TokenEventRead(
+            meeting_id=meeting_id,
+            participant_id=participant_id,
+            event_type=event_type,
+            is_active=is_active,
+            created_at=now,
+        )
+
+    def _write_loop(self):
+        while True:
+            batch: List[dict] = []
+            entry = self._queue.get()
+            stopping = entry is None
+            if not stopping:
+                batch.append(entry)
+                # Collect what else arrives within the window so bursts share one
+                # transaction; the thread blocks on the queue meanwhile, which
+                # leaves the GIL to the event loop fanning the change out
+                deadline = time.monotonic() + self.window
+                while len(batch) < MAX_BATCH:
+                    try:
+                        entry = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    if entry is None:
+                        stopping = True
+                        break
+                    batch.append(entry)
+
+            try:
+                if batch:
+                    self._persist(batch)
+            finally:
+                for _ in range(len(batch) + (1 if stopping else 0)):
+                    self._queue.task_done()
+
+            if stopping:
+                return
+
+    def _persist(self, batch: List[dict]):
+        try:
+            self._write_batch(batch)
+            return
+        except Exception as e:
+            logger.warning(f"Failed to persist {len(batch)} token event(s) together, retrying one by one: {e}")
+        for row in batch:
+            try:
+                self._write_batch([row])
+            except Exception:
+                self.failed_events += 1
+                logger.exception(f"Token event lost: {row}")
+
+    def _write_batch(self, batch: List[dict]):
+        with Session(self._engine) as session:
+            pending: List[dict] = []
+            for row in batch:
+                if not row["is_active"]:
+                    # Keep is_active meaning "currently held" on the claim rows;
+                    # claims queued ahead of this release must be inserted first
+                    if pending:
+                        session.execute(insert(TokenEvent), pending)
+                        pending = []
+                    session.execute(
+                        update(TokenEvent)
+                        .where(TokenEvent.meeting_id == row["meeting_id"], TokenEvent.is_active == True)
+                        .values(is_active=False)
+                    )
+                pending.append(row)
+            if pending:
+                session.execute(insert(TokenEvent), pending)
+            session.commit()
+
+
+# Global token arbiter instance
+token_arbiter = TokenArbiter()
@@ -0,0 +1,187 @@
+"""
+Waiting line and hold-time limit for the meeting expression token.
+
+Participants who ask for a held token wait in a per-meeting line ordered
+by role priority (facilitators first) and then by arrival. When the
+holder releases the token, is force-released, or keeps it longer than
+TOKEN_MAX_HOLD_SECONDS, the token passes straight to the first waiter;
+the release and the new claim are both broadcast, followed by the new
+state of the line.
+
+Hold-time limits are enforced by one scheduler task per process: every
+claim pushes its deadline on a heap, and the task sleeps until the
+earliest one. Deadlines of claims that ended early are skipped when they
+come up, so thousands of meetings cost one task and one heap.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+from bisect import insort
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from backend.config import settings
+from backend.models.tokens import TokenEventRead
+from backend.token_arbiter import TokenArbiter, token_arbiter
+from backend.websocket import ConnectionManager, manager as default_manager
+
+logger = logging.getLogger(__name__)
+
+# Lower goes first; roles missing here (observers) cannot wait for the token
+QUEUE_PRIORITY = {"admin": 0, "facilitator": 0, "participant": 1}
+
+# (priority, arrival, participant_id)
+_Waiter = Tuple[int, int, int]
+
+
+class TokenQueue:
+    def __init__(self, arbiter: Optional[TokenArbiter] = None, manager: Optional[ConnectionManager] = None,
+                 max_hold_seconds: Optional[float] = None):
+        self.arbiter = arbiter or token_arbiter
+        self.manager = manager or default_manager
+        self.max_hold = settings.TOKEN_MAX_HOLD_SECONDS if max_hold_seconds is None else max_hold_seconds
+        self.waiting: Dict[int, List[_Waiter]] = {}  # meeting_id -> waiters in serving order
+        self._arrivals = itertools.count()
+        # heap of (deadline, tie-breaker, claim event); a claim is only expired while it is
+        # still the very event object the arbiter holds
+        self._deadlines: List[Tuple[float, int, TokenEventRead]] = []
+        self._scheduled = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.hand_offs = 0
+        self.timeouts = 0
+
+    def start(self):
+        """Start the scheduler task, with deadlines for the claims restored by the arbiter"""
+        self._wakeup = asyncio.Event()
+        now = datetime.utcnow()
+        for holder in self.arbiter.holders():
+            self._schedule(holder, held_for=(now - holder.created_at).total_seconds())
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def claim(self, meeting_id: int, participant_id: int, role: str = "participant",
+                    wait: bool = False) -> Tuple[Optional[TokenEventRead], Optional[int]]:
+        """
+        Claim the token, or with ``wait`` join the line when it is held.
+
+        Returns (claim event, None) when the token was taken, (None, position)
+        when queued at that 1-based position, and (None, None) otherwise.
+        """
+        if not self.waiting.get(meeting_id):
+            event = self.arbiter.claim(meeting_id, participant_id)
+            if event is not None:
+                await self._claimed(event)
+                return event, None
+        holder = self.arbiter.current_holder(meeting_id)
+        if not wait or role not in QUEUE_PRIORITY or (holder is not None and holder.participant_id == participant_id):
+            return None, None
+        position = self._enqueue(meeting_id, participant_id, QUEUE_PRIORITY[role])
+        self._broadcast_line(meeting_id)
+        return None, position
+
+    async def release(self, meeting_id: int, participant_id: Optional[int]) -> Optional[TokenEventRead]:
+        """Release the token held by participant_id and pass it to the next waiter"""
+        event = self.arbiter.release(meeting_id, participant_id)
+        if event is not None:
+            await self.manager.broadcast_token_change(meeting_id, event)
+            await self._hand_off(meeting_id)
+        return event
+
+    async def force_release(self, meeting_id: int, released_by: Optional[int] = None,
+                            event_type: str = "force_release") -> Optional[TokenEventRead]:
+        """Take the token from its holder and pass it to the next waiter"""
+        event = self.arbiter.force_release(meeting_id, released_by, event_type)
+        if event is not None:
+            await self.manager.broadcast_token_change(meeting_id, event)
+            await self._hand_off(meeting_id)
+        return event
+
+    def leave(self, meeting_id: int, participant_id: int) -> bool:
+        """Remove a participant from the line; False if they were not waiting"""
+        waiters = self.waiting.get(meeting_id)
+        if not waiters or all(waiter[2] != participant_id for waiter in waiters):
+            return False
+        waiters[:] = [waiter for waiter in waiters if waiter[2] != participant_id]
+        if not waiters:
+            del self.waiting[meeting_id]
+        self._broadcast_line(meeting_id)
+        return True
+
+    def line(self, meeting_id: int) -> List[int]:
+        """Participant ids waiting for the token, next one first"""
+        return [participant_id for _, _, participant_id in self.waiting.get(meeting_id, ())]
+
+    def _enqueue(self, meeting_id: int, participant_id: int, priority: int) -> int:
+        waiters = self.waiting.setdefault(meeting_id, [])
+        for position, waiter in enumerate(waiters, 1):
+            if waiter[2] == participant_id:
+                return position
+        waiter = (priority, next(self._arrivals), participant_id)
+        insort(waiters, waiter)
+        return waiters.index(waiter) + 1
+
+    async def _hand_off(self, meeting_id: int):
+        waiters = self.waiting.get(meeting_id)
+        if not waiters:
+            return
+        event = self.arbiter.claim(meeting_id, waiters[0][2])
+        if event is None:
+            # Claimed by someone else in between; the line keeps its order
+            return
+        waiters.pop(0)
+        if not waiters:
+            del self.waiting[meeting_id]
+        self.hand_offs += 1
+        await self._claimed(event)
+        self._broadcast_line(meeting_id)
+
+    async def _claimed(self, event: TokenEventRead):
+        self._schedule(event)
+        await self.manager.broadcast_token_change(event.meeting_id, event)
+
+    def _broadcast_line(self, meeting_id: int):
+        message = {"type": "token_queue", "data": {"waiting": self.line(meeting_id)}}
+        self.manager.broadcast_nowait(message, meeting_id, key="token_queue")
+
+    def _schedule(self, event: TokenEventRead, held_for: float = 0.0):
+        if self.max_hold <= 0:
+            return
+        deadline = asyncio.get_running_loop().time() + max(self.max_hold - held_for, 0.0)
+        heapq.heappush(self._deadlines, (deadline, next(self._scheduled), event))
+        # Only an earlier deadline changes how long the scheduler sleeps
+        if self._wakeup is not None and self._deadlines[0][0] == deadline:
+            self._wakeup.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            while self._deadlines and self._deadlines[0][0] <= loop.time():
+                _, _, event = heapq.heappop(self._deadlines)
+                meeting_id = event.meeting_id
+                if self.arbiter.current_holder(meeting_id) is not event:
+                    continue
+                self.timeouts += 1
+                try:
+                    await self.force_release(meeting_id, event_type="timeout")
+                except Exception as e:
+                    logger.exception(f"Could not expire the token of meeting {meeting_id}: {e}")
+            self._wakeup.clear()
+            timeout = self._deadlines[0][0] - loop.time() if self._deadlines else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+# Global token queue instance
+token_queue = TokenQueue()
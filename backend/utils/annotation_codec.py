@@ -0,0 +1,188 @@
+"""
+Compact storage format for drawing and shape annotations.
+
+Freehand strokes carry thousands of points, which dominate both the
+database and response payloads when stored as JSON. For packed annotation
+types the ``points`` list is moved out of the JSON content into a binary
+blob; the rest of the content (color, width, ...) stays JSON.
+
+Blob layout (little-endian)::
+
+    magic "NCP" | version u8 | flags u8 | point count u32 | payload
+
+Payload is either the first point as two int32 followed by int16 deltas
+(exact, used when every coordinate is an integer and every step fits in
+int16) or every point as two float32. Float32 keeps about 7 significant
+digits, so fractional coordinates come back within float32 precision;
+integer points only take it when every coordinate is exactly
+representable (|v| <= 2**24), and points float32 cannot hold at all stay
+JSON. The payload may then be compressed with zlib or, when the
+``zstandard`` package is installed, zstd.
+"""
+import json
+import struct
+import zlib
+from itertools import accumulate
+from datetime import timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional
+    zstandard = None
+
+PACKED_ANNOTATION_TYPES = ("drawing", "shape")
+
+MAGIC = b"NCP"
+VERSION = 1
+HEADER = struct.Struct("<3sBBI")
+
+FLAG_FLOAT32 = 0x01
+FLAG_ZLIB = 0x02
+FLAG_ZSTD = 0x04
+
+# Binary annotation list response: u32 record count, then per record
+# id i64 | participant_id i64 (-1 if none) | timestamp_ms i64 |
+# created_at f64 (UTC epoch seconds) | type, content and packed lengths
+# (u16, u32, u32) followed by those three byte strings. Content is the
+# stored JSON text and packed the stored points blob, both sent as is.
+BINARY_MEDIA_TYPE = "application/vnd.nexchamps.annotations"
+RECORD_HEADER = struct.Struct("<qqqdHII")
+
+INT16_MIN, INT16_MAX = -32768, 32767
+INT32_MIN, INT32_MAX = -(2 ** 31), 2 ** 31 - 1
+# Largest float32 and the range where float32 holds every integer exactly
+FLOAT32_MAX = 3.4028234663852886e38
+FLOAT32_EXACT_INT = 2 ** 24
+
+
+def _flatten(points: Any) -> Optional[List[float]]:
+    """Return points as a flat [x0, y0, x1, y1, ...] list, or None if they are not 2-number pairs"""
+    if not isinstance(points, list) or not points:
+        return None
+    if not all(isinstance(point, (list, tuple)) and len(point) == 2 for point in points):
+        return None
+    flat = [value for point in points for value in point]
+    if not all(type(value) in (int, float) for value in flat):
+        return None
+    return flat
+
+
+def _int16_deltas(flat: List[float]) -> Optional[bytes]:
+    if not all(type(value) is int for value in flat):
+        return None
+    if not (INT32_MIN <= min(flat[0], flat[1]) and max(flat[0], flat[1]) <= INT32_MAX):
+        return None
+    # flat[i + 2] - flat[i] interleaves the x and y steps
+    deltas = [b - a for a, b in zip(flat, flat[2:])]
+    if deltas and (min(deltas) < INT16_MIN or max(deltas) > INT16_MAX):
+        return None
+    return struct.pack(f"<ii{len(deltas)}h", flat[0], flat[1], *deltas)
+
+
+def _float32(flat: List[float]) -> Optional[bytes]:
+    if all(type(value) is int for value in flat):
+        limit = FLOAT32_EXACT_INT
+    else:
+        limit = FLOAT32_MAX
+    if max(abs(min(flat)), abs(max(flat))) > limit:
+        return None
+    return struct.pack(f"<{len(flat)}f", *flat)
+
+
+def pack_points(points: Any, compression: str = "zlib", level: int = 6) -> Optional[bytes]:
+    """Pack a list of [x, y] points; return None if the points cannot be packed"""
+    flat = _flatten(points)
+    if flat is None:
+        return None
+
+    flags = 0
+    payload = _int16_deltas(flat)
+    if payload is None:
+        flags |= FLAG_FLOAT32
+        payload = _float32(flat)
+        if payload is None:
+            return None
+
+    if compression == "zlib":
+        compressed = zlib.compress(payload, level)
+        if len(compressed) < len(payload):
+            flags |= FLAG_ZLIB
+            payload = compressed
+    elif compression == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        compressed = zstandard.ZstdCompressor(level=level).compress(payload)
+        if len(compressed) < len(payload):
+            flags |= FLAG_ZSTD
+            payload = compressed
+    elif compression != "none":
+        raise ValueError(f"Unknown compression: {compression}")
+
+    return HEADER.pack(MAGIC, VERSION, flags, len(flat) // 2) + payload
+
+
+def unpack_points(blob: bytes) -> List[List[float]]:
+    """Decode a blob produced by pack_points back into [x, y] points"""
+    magic, version, flags, count = HEADER.unpack_from(blob)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a packed annotation blob")
+    payload = blob[HEADER.size:]
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+    elif flags & FLAG_ZSTD:
+        if zstandard is None:
+            raise ValueError("zstd-compressed annotation requires the zstandard package")
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+
+    if flags & FLAG_FLOAT32:
+        values = struct.unpack(f"<{count * 2}f", payload)
+    else:
+        values = struct.unpack(f"<ii{(count - 1) * 2}h", payload)
+        xs = accumulate(values[0::2])
+        ys = accumulate(values[1::2])
+        return [[x, y] for x, y in zip(xs, ys)]
+    return [[x, y] for x, y in zip(values[0::2], values[1::2])]
+
+
+def encode_content(
+    annotation_type: str, content: Dict[str, Any], compression: str = "zlib", level: int = 6
+) -> Tuple[str, Optional[bytes]]:
+    """Split content into (JSON text, packed points blob or None) for storage"""
+    if annotation_type in PACKED_ANNOTATION_TYPES and "points" in content:
+        packed = pack_points(content["points"], compression, level)
+        if packed is not None:
+            rest = {key: value for key, value in content.items() if key != "points"}
+            return json.dumps(rest, separators=(",", ":")), packed
+    return json.dumps(content, separators=(",", ":")), None
+
+
+def decode_content(content: Optional[str], packed: Optional[bytes]) -> Dict[str, Any]:
+    """Rebuild the original content from the stored JSON text and packed points"""
+    decoded = json.loads(content) if content else {}
+    if packed:
+        decoded["points"] = unpack_points(packed)
+    return decoded
+
+
+def pack_annotation_records(annotations: Iterable[Any]) -> bytes:
+    """Serialize stored annotations to the binary list format without decoding them"""
+    parts = [b""]
+    count = 0
+    for annotation in annotations:
+        annotation_type = annotation.annotation_type.encode()
+        content = (annotation.content or "").encode()
+        packed = annotation.content_packed or b""
+        parts.append(RECORD_HEADER.pack(
+            annotation.id,
+            annotation.participant_id if annotation.participant_id is not None else -1,
+            annotation.timestamp_ms,
+            annotation.created_at.replace(tzinfo=timezone.utc).timestamp(),
+            len(annotation_type),
+            len(content),
+            len(packed),
+        ))
+        parts.extend((annotation_type, content, packed))
+        count += 1
+    parts[0] = struct.pack("<I", count)
+    return b"".join(parts)
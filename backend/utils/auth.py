@@ -1,5 +1,9 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Set, Tuple
+import hashlib
+import threading
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -31,6 +35,85 @@ class User(BaseModel):
     full_name: Optional[str] = None
     disabled: Optional[bool] = None
 
+class TokenCache:
+    """
+    Bounded LRU cache of verified access tokens.
+
+    Keyed on the SHA-256 digest of the token; each entry holds the decoded
+    User until the token's ``exp``. revoke_user() evicts a user's entries and
+    rejects tokens issued to them before the revocation.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[bytes, Tuple[User, float]]" = OrderedDict()  # digest -> (user, exp)
+        self._by_user: Dict[int, Set[bytes]] = {}  # user_id -> digests
+        self._revoked: Dict[int, float] = {}  # user_id -> revocation time
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, digest: bytes) -> Optional["User"]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                if entry[1] > time.time():
+                    self._entries.move_to_end(digest)
+                    self.hits += 1
+                    return entry[0]
+                self._remove(digest)
+            self.misses += 1
+            return None
+
+    def put(self, digest: bytes, user: "User", expires_at: float):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[digest] = (user, expires_at)
+            self._entries.move_to_end(digest)
+            if user.id is not None:
+                self._by_user.setdefault(user.id, set()).add(digest)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def is_revoked(self, user_id: Optional[int], issued_at: Optional[float]) -> bool:
+        revoked_at = self._revoked.get(user_id)
+        if revoked_at is None:
+            return False
+        # iat has whole seconds, so a token from the revocation's second may predate it;
+        # those count as revoked too and the user signs in again a second later
+        return issued_at is None or int(issued_at) <= int(revoked_at)
+
+    def revoke_user(self, user_id: int):
+        """Evict a user's cached tokens and reject the ones already issued"""
+        with self._lock:
+            self._revoked[user_id] = time.time()
+            for digest in self._by_user.pop(user_id, set()):
+                self._entries.pop(digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _remove(self, digest: bytes):
+        user, _ = self._entries.pop(digest)
+        digests = self._by_user.get(user.id)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._by_user[user.id]
+
+# Verified access tokens, shared by every request
+token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
+
 def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -60,37 +143,64 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+def authenticate_token(token: str) -> Optional[User]:
     """
-    Validate JWT token and extract user info
+    Verify an access token and return its user, or None when it is invalid,
+    expired or revoked.
+
+    Tokens already verified are served from token_cache until they expire.
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+    digest = token_cache.digest(token)
+    user = token_cache.get(digest)
+    if user is not None:
+        return user
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        user_id: int = payload.get("user_id")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username, user_id=user_id)
     except JWTError:
-        raise credentials_exception
+        return None
+    username: str = payload.get("sub")
+    if username is None:
+        return None
+    token_data = TokenData(username=username, user_id=payload.get("user_id"))
+    if token_cache.is_revoked(token_data.user_id, payload.get("iat")):
+        return None
 
     # Return user info extracted from token
     user = User(id=token_data.user_id, username=token_data.username, disabled=False)
+    if payload.get("exp") is not None:
+        token_cache.put(digest, user, payload["exp"])
     return user
 
-def get_current_active_user(current_user: User = Depends(get_current_user)):
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    """
+    Validate JWT token and extract user info.
+    """
+    user = authenticate_token(token)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+async def get_current_active_user(current_user: User = Depends(get_current_user)):
     """
     Check that the user is active
     """
     if current_user.disabled:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def get_current_admin_user(current_user: User = Depends(get_current_active_user)):
+    """
+    Check that the user is one of settings.ADMIN_USERNAMES
+    """
+    if current_user.username not in settings.ADMIN_USERNAMES:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
@@ -0,0 +1,129 @@
+"""
+Wire formats for WebSocket frames.
+
+Clients pick an encoding and a compression when they connect (query
+parameters ``encoding`` / ``compression`` or a ``hello`` message):
+
+* ``json`` + ``none`` -- JSON text frames, the default;
+* ``json`` + ``deflate`` -- JSON text frames, except messages of at least
+  WS_COMPRESSION_MIN_BYTES, which are sent as zlib-compressed binary frames;
+* ``msgpack`` + ``none`` -- MessagePack binary frames (needs the msgpack
+  package);
+* ``msgpack`` + ``deflate`` -- MessagePack binary frames, zlib-compressed
+  above the threshold. Every message is a map, so an uncompressed frame
+  starts with 0x80-0x8f, 0xde or 0xdf and a compressed one with 0x78.
+
+Messages are produced as JSON text. FrameCache converts one message to
+each format at most once, however many recipients use that format.
+"""
+import json
+import zlib
+from typing import Any, Dict, NamedTuple, Optional, Union
+
+try:
+    import msgpack
+except ImportError:  # MessagePack frames are optional
+    msgpack = None
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from backend.config import settings
+
+JSON = "json"
+MSGPACK = "msgpack"
+NONE = "none"
+DEFLATE = "deflate"
+
+Frame = Union[str, bytes]
+
+
+class WireFormat(NamedTuple):
+    encoding: str = JSON
+    compression: str = NONE
+
+
+DEFAULT_FORMAT = WireFormat()
+
+
+def negotiate(encoding: Optional[str] = None, compression: Optional[str] = None) -> WireFormat:
+    """Validate a client's requested format; raises ValueError if it cannot be served"""
+    wire_format = WireFormat(encoding or JSON, compression or NONE)
+    if wire_format.encoding not in (JSON, MSGPACK):
+        raise ValueError(f"Unknown encoding: {wire_format.encoding}")
+    if wire_format.encoding == MSGPACK and msgpack is None:
+        raise ValueError("MessagePack frames require the msgpack package")
+    if wire_format.compression not in (NONE, DEFLATE):
+        raise ValueError(f"Unknown compression: {wire_format.compression}")
+    return wire_format
+
+
+class FrameCache:
+    """One outgoing message and its encodings, built on first use"""
+
+    __slots__ = ("message", "_parsed", "_frames")
+
+    def __init__(self, message: str):
+        self.message = message
+        self._parsed: Any = None
+        self._frames: Dict[WireFormat, Frame] = {}
+
+    def frame(self, wire_format: WireFormat) -> Frame:
+        if wire_format == DEFAULT_FORMAT:
+            return self.message
+        frame = self._frames.get(wire_format)
+        if frame is None:
+            frame = self._frames[wire_format] = self._encode(wire_format)
+        return frame
+
+    def _encode(self, wire_format: WireFormat) -> Frame:
+        if wire_format.encoding == MSGPACK:
+            if self._parsed is None:
+                self._parsed = json.loads(self.message)
+            data = msgpack.packb(self._parsed)
+        else:
+            data = self.message.encode()
+        if wire_format.compression == DEFLATE and len(data) >= settings.WS_COMPRESSION_MIN_BYTES:
+            return zlib.compress(data, settings.WS_COMPRESSION_LEVEL)
+        return data if wire_format.encoding == MSGPACK else self.message
+
+
+def encode(message: str, wire_format: WireFormat) -> Frame:
+    """Encode a single message for one recipient"""
+    return FrameCache(message).frame(wire_format)
+
+
+def decode(frame: Frame) -> Any:
+    """Decode an incoming frame in any of the formats"""
+    if isinstance(frame, str):
+        return json.loads(frame)
+    if frame[:1] == b"\x78":
+        try:
+            frame = zlib.decompress(frame)
+        except zlib.error as e:
+            raise ValueError(f"Invalid compressed frame: {e}") from e
+    if frame[:1] in (b"{", b"["):
+        return json.loads(frame)
+    if msgpack is None:
+        raise ValueError("MessagePack frames require the msgpack package")
+    try:
+        return msgpack.unpackb(frame)
+    except Exception as e:
+        raise ValueError(f"Invalid MessagePack frame: {e}") from e
+
+
+async def receive(websocket: WebSocket) -> Dict[str, Any]:
+    """Receive and decode the next text or binary frame.
+
+    Raises ValueError for a frame that is not a well-formed message object;
+    the connection can keep going after one.
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    if message.get("text") is not None:
+        decoded = decode(message["text"])
+    else:
+        decoded = decode(message["bytes"])
+    if not isinstance(decoded, dict):
+        raise ValueError("Messages must be objects")
+    return decoded
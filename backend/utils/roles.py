@@ -11,6 +11,7 @@ class Role(str, Enum):
 # Role permissions matrix
 ROLE_PERMISSIONS = {
     Role.ADMIN: {
+        "claim_token": True,
         "create_meeting": True,
         "delete_meeting": True,
         "manage_phases": True,
@@ -22,6 +23,7 @@ ROLE_PERMISSIONS = {
         "export_audit": True,
     },
     Role.FACILITATOR: {
+        "claim_token": True,
         "create_meeting": True,
         "delete_meeting": False,
         "manage_phases": True,
@@ -33,6 +35,7 @@ ROLE_PERMISSIONS = {
         "export_audit": True,
     },
     Role.PARTICIPANT: {
+        "claim_token": True,
         "create_meeting": False,
         "delete_meeting": False,
         "manage_phases": False,
@@ -44,6 +47,7 @@ ROLE_PERMISSIONS = {
         "export_audit": False,
     },
     Role.OBSERVER: {
+        "claim_token": False,
         "create_meeting": False,
         "delete_meeting": False,
         "manage_phases": False,
@@ -1,44 +1,446 @@
 from fastapi import WebSocket, WebSocketDisconnect
 from fastapi.websockets import WebSocketState
-from typing import Dict, List
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+from sqlmodel import select
+import asyncio
 import json
-from backend.models.tokens import TokenEvent
-from backend.models.phases import Phase
-from backend.models.annotations import Annotation
+import logging
+import time
+import uuid
+from backend.backplane import Backplane, backplane as default_backplane
+from backend.config import settings
+from backend.heartbeat import PING_MESSAGE, TIMEOUT_CLOSE_CODE
+from backend.metrics import Histogram
+from backend.models.tokens import TokenEventRead
+from backend.models.phases import Phase, PhaseRead
+from backend.models.annotations import Annotation, AnnotationRead
+from backend.models.decisions import Decision, DecisionRead
+from backend.models.meetings import Meeting, MeetingRead
+from backend.models.participants import Participant
+from backend.utils.auth import User
+from backend.utils.roles import ROLE_PERMISSIONS
+from backend.utils.frame_codec import DEFAULT_FORMAT, Frame, FrameCache, WireFormat, encode
+
+logger = logging.getLogger(__name__)
+
+# Slow-consumer policies applied when a connection's outbound queue is full
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+DISCONNECT = "disconnect"
+SLOW_CONSUMER_POLICIES = (DROP_OLDEST, COALESCE, DISCONNECT)
+
+# A room broadcast: a JSON object, serialized once with its sequence number
+# stamped in, or an already-serialized frame sent as is
+Message = Union[Dict[str, Any], str]
+
+
+def serialize(message: Message) -> str:
+    return json.dumps(message, separators=(",", ":")) if isinstance(message, dict) else message
+
+
+class RoomMetrics:
+    """Send counters and latencies for one meeting room"""
 
-class ConnectionManager:
     def __init__(self):
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.messages_dropped = 0
+        self.messages_coalesced = 0
+        self.slow_disconnects = 0
+        self.send_latency_total = 0.0
+        self.send_latency_max = 0.0
+
+    def record_send(self, latency: float, size: int):
+        self.messages_sent += 1
+        self.bytes_sent += size
+        self.send_latency_total += latency
+        if latency > self.send_latency_max:
+            self.send_latency_max = latency
+
+
+class RoomEvents:
+    """Sequence numbers and a ring buffer of the recent broadcasts of one room"""
+
+    def __init__(self, size: int):
+        self.seq = 0
+        self.buffer: Deque[Tuple[int, str]] = deque(maxlen=size)
+        self.idle_since: Optional[float] = None  # last local connection left
+
+    def record(self, message: Message) -> str:
+        """Assign the next sequence number and return the message serialized with it.
+
+        Only JSON objects carry ``seq``; a pre-serialized frame is buffered
+        for replay as is.
+        """
+        self.seq += 1
+        if isinstance(message, dict):
+            message = {**message, "seq": self.seq}
+        serialized = serialize(message)
+        self.buffer.append((self.seq, serialized))
+        return serialized
+
+    def since(self, last_seq: int) -> Optional[List[str]]:
+        """Events after last_seq, or None when some of them are no longer buffered"""
+        if last_seq > self.seq:
+            return None
+        oldest = self.buffer[0][0] if self.buffer else self.seq + 1
+        if last_seq + 1 < oldest:
+            return None
+        return [message for seq, message in self.buffer if seq > last_seq]
+
+
+class ConnectionIdentity:
+    """The authenticated user behind a connection and their participant row.
+
+    Resolved once at the handshake so handling a message never needs the
+    database to know who sent it or what their role allows.
+    """
+
+    __slots__ = ("user", "participant_id", "participant_name", "role", "permissions")
+
+    def __init__(self, user: User, participant: Participant):
+        self.user = user
+        self.participant_id = participant.id
+        self.participant_name = participant.name
+        self.role = participant.role
+        self.permissions = ROLE_PERMISSIONS.get(participant.role, {})
+
+    def can(self, permission: str) -> bool:
+        return self.permissions.get(permission, False)
+
+
+class ConnectionSender:
+    """Bounded outbound queue and writer task of one WebSocket connection"""
+
+    def __init__(self, websocket: WebSocket, meeting_id: int, manager: "ConnectionManager",
+                 max_queue: int, policy: str, wire_format: WireFormat = DEFAULT_FORMAT,
+                 identity: Optional[ConnectionIdentity] = None):
+        self.websocket = websocket
+        self.meeting_id = meeting_id
+        self.manager = manager
+        self.max_queue = max_queue
+        self.policy = policy
+        self.wire_format = wire_format
+        self.identity = identity
+        # (coalesce key, encoded frame, enqueue time)
+        self.queue: Deque[Tuple[Optional[str], Frame, float]] = deque()
+        self.last_seen = time.monotonic()  # last frame received, for the heartbeat
+        self._ready = asyncio.Event()
+        self.task = asyncio.create_task(self._run())
+
+    def enqueue(self, message: Frame, key: Optional[str] = None):
+        """Queue a payload without waiting, applying the slow-consumer policy when full"""
+        metrics = self.manager.metrics_for(self.meeting_id)
+        if len(self.queue) >= self.max_queue:
+            if self.policy == DISCONNECT:
+                metrics.slow_disconnects += 1
+                self.manager.disconnect(self.websocket, self.meeting_id)
+                asyncio.create_task(self._close())
+                return
+            if self.policy == COALESCE and key is not None:
+                # The newer message supersedes the queued one and moves to the tail:
+                # delivery order (and seq) is kept and it is not the next one evicted
+                for index, (queued_key, _, queued_at) in enumerate(self.queue):
+                    if queued_key == key:
+                        del self.queue[index]
+                        self.queue.append((key, message, queued_at))
+                        metrics.messages_coalesced += 1
+                        self._ready.set()
+                        return
+            self.queue.popleft()
+            metrics.messages_dropped += 1
+        self.queue.append((key, message, time.perf_counter()))
+        self._ready.set()
+
+    def close(self):
+        self.task.cancel()
+
+    async def _close(self, code: int = 1008):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def _run(self):
+        try:
+            while True:
+                if not self.queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                _, message, queued_at = self.queue.popleft()
+                if self.websocket.client_state != WebSocketState.CONNECTED:
+                    continue
+                if isinstance(message, bytes):
+                    await self.websocket.send_bytes(message)
+                else:
+                    await self.websocket.send_text(message)
+                latency = time.perf_counter() - queued_at
+                self.manager.metrics_for(self.meeting_id).record_send(latency, len(message))
+                self.manager.send_latency.observe(latency)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.info(f"Dropping WebSocket in meeting {self.meeting_id} after send failure: {e}")
+            self.manager.disconnect(self.websocket, self.meeting_id)
+
+
+class ConnectionManager:
+    def __init__(self, max_queue: Optional[int] = None, policy: Optional[str] = None,
+                 backplane: Optional[Backplane] = None):
         self.active_connections: Dict[int, List[WebSocket]] = {}  # meeting_id -> list of websockets
         self.meeting_rooms: Dict[int, Dict] = {}  # meeting_id -> meeting state
+        self.senders: Dict[WebSocket, ConnectionSender] = {}
+        self.metrics: Dict[int, RoomMetrics] = {}  # meeting_id -> room metrics
+        # Time from queueing a message to writing it to the socket, all rooms
+        self.send_latency = Histogram()
+        self.room_events: Dict[int, RoomEvents] = {}  # meeting_id -> recent broadcasts
+        # Sequence numbers are per process; clients resuming with another epoch get a snapshot
+        self.epoch = uuid.uuid4().hex
+        self.snapshots: Dict[int, Tuple[int, float, str]] = {}  # meeting_id -> (seq, built at, payload)
+        self.snapshot_locks: Dict[int, asyncio.Lock] = {}
+        self.max_queue = max_queue or settings.WS_SEND_QUEUE_SIZE
+        self.policy = policy or settings.WS_SLOW_CONSUMER_POLICY
+        if self.policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy: {self.policy}")
+        # Rooms may have members on other workers; see backend.backplane
+        self.backplane = backplane or default_backplane
+        self.backplane.subscribe("room_broadcast", self._on_remote_broadcast)
 
-    async def connect(self, websocket: WebSocket, meeting_id: int):
+    async def connect(self, websocket: WebSocket, meeting_id: int, wire_format: WireFormat = DEFAULT_FORMAT,
+                      identity: Optional[ConnectionIdentity] = None):
         await websocket.accept()
         if meeting_id not in self.active_connections:
             self.active_connections[meeting_id] = []
+        if meeting_id not in self.meeting_rooms:
             self.meeting_rooms[meeting_id] = {
                 "current_token_holder": None,
                 "current_phase": "ideation",
                 "participants": {}
             }
+            self.room_events[meeting_id] = RoomEvents(settings.WS_EVENT_BUFFER_SIZE)
+        self.room_events[meeting_id].idle_since = None
         self.active_connections[meeting_id].append(websocket)
+        self.senders[websocket] = ConnectionSender(
+            websocket, meeting_id, self, self.max_queue, self.policy, wire_format, identity
+        )
+
+    def identity(self, websocket: WebSocket) -> Optional[ConnectionIdentity]:
+        """Who authenticated on a connection, as bound at the handshake"""
+        sender = self.senders.get(websocket)
+        return sender.identity if sender is not None else None
+
+    def set_format(self, websocket: WebSocket, wire_format: WireFormat):
+        """Switch the frames sent to a connection to another negotiated format"""
+        sender = self.senders.get(websocket)
+        if sender is not None:
+            sender.wire_format = wire_format
+
+    def touch(self, websocket: WebSocket):
+        """Record that a frame arrived from a connection"""
+        sender = self.senders.get(websocket)
+        if sender is not None:
+            sender.last_seen = time.monotonic()
 
     def disconnect(self, websocket: WebSocket, meeting_id: int):
-        if meeting_id in self.active_connections:
+        """Forget a connection; safe to call more than once"""
+        sender = self.senders.pop(websocket, None)
+        if sender is not None:
+            sender.close()
+        room = self.meeting_rooms.get(meeting_id)
+        if room is not None:
+            for participant_id, participant in list(room["participants"].items()):
+                if participant.get("websocket") is websocket:
+                    del room["participants"][participant_id]
+                    self.broadcast_nowait({
+                        "type": "participant_left",
+                        "data": {"participant_id": participant_id}
+                    }, meeting_id)
+        if meeting_id in self.active_connections and websocket in self.active_connections[meeting_id]:
             self.active_connections[meeting_id].remove(websocket)
             if not self.active_connections[meeting_id]:
+                # Room state and recent events stay for clients that reconnect
                 del self.active_connections[meeting_id]
-                del self.meeting_rooms[meeting_id]
+                self.metrics.pop(meeting_id, None)
+                self.room_events[meeting_id].idle_since = time.monotonic()
+                self._expire_idle_rooms()
+
+    def _expire_idle_rooms(self):
+        cutoff = time.monotonic() - settings.WS_ROOM_IDLE_SECONDS
+        for meeting_id, events in list(self.room_events.items()):
+            if events.idle_since is not None and events.idle_since < cutoff:
+                del self.room_events[meeting_id]
+                self.meeting_rooms.pop(meeting_id, None)
+                self.snapshots.pop(meeting_id, None)
+                self.snapshot_locks.pop(meeting_id, None)
+
+    def ping(self, idle_since: float) -> int:
+        """Heartbeat: queue a ping for every connection silent since idle_since"""
+        frames = FrameCache(PING_MESSAGE)
+        quiet = [sender for sender in self.senders.values() if sender.last_seen < idle_since]
+        for sender in quiet:
+            sender.enqueue(frames.frame(sender.wire_format))
+        return len(quiet)
+
+    def reap(self, cutoff: float) -> int:
+        """Heartbeat: drop and close the connections silent since cutoff"""
+        stale = [sender for sender in self.senders.values() if sender.last_seen < cutoff]
+        for sender in stale:
+            logger.info(f"Dropping WebSocket in meeting {sender.meeting_id} after missed heartbeats")
+            self.disconnect(sender.websocket, sender.meeting_id)
+            asyncio.create_task(sender._close(TIMEOUT_CLOSE_CODE))
+        return len(stale)
+
+    def connection_counts(self) -> Dict[int, int]:
+        """Live connections per meeting room on this worker"""
+        return {meeting_id: len(connections) for meeting_id, connections in self.active_connections.items()}
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
+        sender = self.senders.get(websocket)
+        if sender is not None:
+            sender.enqueue(encode(message, sender.wire_format))
+        else:
+            await websocket.send_text(message)
+
+    async def broadcast(self, message: Message, meeting_id: int, key: Optional[str] = None):
+        """Queue a message for every connection of a room.
+
+        Never waits on a socket: each connection drains its own queue, so a
+        slow client only delays itself. ``key`` identifies messages that
+        supersede each other under the coalesce policy. The message is also
+        published to the other workers through the backplane.
+        """
+        self.broadcast_nowait(message, meeting_id, key)
+
+    def broadcast_nowait(self, message: Message, meeting_id: int, key: Optional[str] = None):
+        """broadcast() for callers that cannot await"""
+        self._enqueue_local(message, meeting_id, key)
+        self.backplane.publish("room_broadcast", {"meeting_id": meeting_id, "message": message, "key": key})
+
+    def _enqueue_local(self, message: Message, meeting_id: int, key: Optional[str] = None):
+        events = self.room_events.get(meeting_id)
+        serialized = events.record(message) if events is not None else serialize(message)
+        # Encoded once per wire format, not once per connection
+        frames = FrameCache(serialized)
+        for connection in list(self.active_connections.get(meeting_id, ())):
+            sender = self.senders.get(connection)
+            if sender is not None:
+                sender.enqueue(frames.frame(sender.wire_format), key)
 
-    async def broadcast(self, message: str, meeting_id: int):
-        if meeting_id in self.active_connections:
-            for connection in self.active_connections[meeting_id]:
-                if connection.client_state == WebSocketState.CONNECTED:
-                    await connection.send_text(message)
+    def _on_remote_broadcast(self, data: Dict):
+        self._enqueue_local(data["message"], data["meeting_id"], data["key"])
 
-    async def broadcast_token_change(self, meeting_id: int, token_event: TokenEvent):
+    def room_seq(self, meeting_id: int) -> int:
+        events = self.room_events.get(meeting_id)
+        return events.seq if events is not None else 0
+
+    async def resume(self, websocket: WebSocket, meeting_id: int, epoch: Optional[str], last_seq: Optional[int]):
+        """
+        Catch a reconnecting client up from its last sequence number.
+
+        Sends the missed events followed by ``resumed`` when they are all
+        still buffered, otherwise a single ``snapshot`` of the room.
+        """
+        events = self.room_events.get(meeting_id)
+        missed = None
+        if events is not None and epoch == self.epoch and last_seq is not None:
+            missed = events.since(last_seq)
+        if missed is None:
+            await self.send_personal_message(await self.snapshot(meeting_id), websocket)
+            return
+        for message in missed:
+            await self.send_personal_message(message, websocket)
+        await self.send_personal_message(json.dumps({
+            "type": "resumed",
+            "data": {"epoch": self.epoch, "seq": events.seq, "replayed": len(missed)}
+        }), websocket)
+
+    async def snapshot(self, meeting_id: int) -> str:
+        """Serialized snapshot of a room, shared by clients reconnecting at the same time"""
+        lock = self.snapshot_locks.setdefault(meeting_id, asyncio.Lock())
+        async with lock:
+            seq = self.room_seq(meeting_id)
+            cached = self.snapshots.get(meeting_id)
+            if cached is not None and cached[0] == seq and time.monotonic() - cached[1] < settings.WS_SNAPSHOT_TTL_SECONDS:
+                return cached[2]
+            payload = json.dumps({"type": "snapshot", "data": await self._build_snapshot(meeting_id, seq)})
+            if meeting_id in self.room_events:
+                self.snapshots[meeting_id] = (seq, time.monotonic(), payload)
+            return payload
+
+    async def _build_snapshot(self, meeting_id: int, seq: int) -> Dict:
+        # Imported here: the database and index modules import the models this module uses
+        from backend.annotation_index import annotation_index
+        from backend.database import async_session_maker
+        from backend.token_arbiter import token_arbiter
+        from backend.token_queue import token_queue
+
+        async with async_session_maker() as db:
+            meeting = await db.get(Meeting, meeting_id)
+            phase = (await db.exec(
+                select(Phase).where(Phase.meeting_id == meeting_id, Phase.is_current == True)
+            )).first()
+            decisions = (await db.exec(
+                select(Decision).where(Decision.meeting_id == meeting_id).order_by(Decision.created_at, Decision.id)
+            )).all()
+            if annotation_index.enabled:
+                annotations = await annotation_index.query(db, meeting_id)
+            else:
+                annotations = (await db.exec(
+                    select(Annotation)
+                    .where(Annotation.meeting_id == meeting_id)
+                    .order_by(Annotation.timestamp_ms, Annotation.id)
+                )).all()
+
+        holder = token_arbiter.current_holder(meeting_id)
+        room = self.meeting_rooms.get(meeting_id, {})
+        return {
+            "epoch": self.epoch,
+            "seq": seq,
+            "meeting": MeetingRead.model_validate(meeting).model_dump(mode="json") if meeting else None,
+            "phase": PhaseRead.model_validate(phase).model_dump(mode="json") if phase else None,
+            "token": TokenEventRead.model_validate(holder).model_dump(mode="json") if holder else None,
+            "token_queue": token_queue.line(meeting_id),
+            "participants": [
+                {"participant_id": participant_id, "participant_name": participant["name"]}
+                for participant_id, participant in room.get("participants", {}).items()
+            ],
+            "annotations": [AnnotationRead.model_validate(annotation).model_dump(mode="json") for annotation in annotations],
+            "decisions": [DecisionRead.model_validate(decision).model_dump(mode="json") for decision in decisions],
+        }
+
+    def metrics_for(self, meeting_id: int) -> RoomMetrics:
+        metrics = self.metrics.get(meeting_id)
+        if metrics is None:
+            metrics = self.metrics[meeting_id] = RoomMetrics()
+        return metrics
+
+    def room_metrics(self, meeting_id: int) -> Dict:
+        """Snapshot of queue depth and send latency for a room"""
+        metrics = self.metrics.get(meeting_id) or RoomMetrics()
+        depths = [
+            len(self.senders[ws].queue)
+            for ws in self.active_connections.get(meeting_id, ())
+            if ws in self.senders
+        ]
+        return {
+            "meeting_id": meeting_id,
+            "connections": len(depths),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "messages_sent": metrics.messages_sent,
+            "bytes_sent": metrics.bytes_sent,
+            "messages_dropped": metrics.messages_dropped,
+            "messages_coalesced": metrics.messages_coalesced,
+            "slow_disconnects": metrics.slow_disconnects,
+            "send_latency_avg_ms": (
+                metrics.send_latency_total / metrics.messages_sent * 1000 if metrics.messages_sent else 0.0
+            ),
+            "send_latency_max_ms": metrics.send_latency_max * 1000,
+        }
+
+    async def broadcast_token_change(self, meeting_id: int, token_event: TokenEventRead):
         message = {
             "type": "token_changed",
             "data": {
@@ -49,7 +451,7 @@ class ConnectionManager:
                 "timestamp": token_event.created_at.isoformat()
             }
         }
-        await self.broadcast(json.dumps(message), meeting_id)
+        await self.broadcast(message, meeting_id, key="token_changed")
 
     async def broadcast_phase_change(self, meeting_id: int, phase: Phase):
         message = {
@@ -62,7 +464,7 @@ class ConnectionManager:
                 "timestamp": phase.created_at.isoformat()
             }
         }
-        await self.broadcast(json.dumps(message), meeting_id)
+        await self.broadcast(message, meeting_id, key="phase_changed")
 
     async def broadcast_annotation(self, meeting_id: int, annotation: Annotation):
         message = {
@@ -76,6 +478,24 @@ class ConnectionManager:
                 "created_at": annotation.created_at.isoformat()
             }
         }
-        await self.broadcast(json.dumps(message), meeting_id)
+        await self.broadcast(message, meeting_id)
+
+    async def broadcast_annotations(self, meeting_id: int, annotations: List[AnnotationRead]):
+        """Broadcast a batch of new annotations as one message"""
+        message = {
+            "type": "annotations_created",
+            "data": [
+                {
+                    "annotation_id": annotation.id,
+                    "participant_id": annotation.participant_id,
+                    "annotation_type": annotation.annotation_type,
+                    "content": annotation.content,
+                    "timestamp_ms": annotation.timestamp_ms,
+                    "created_at": annotation.created_at.isoformat()
+                }
+                for annotation in annotations
+            ]
+        }
+        await self.broadcast(message, meeting_id)
 
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
@@ -817,6 +817,11 @@ export class MeetingWebSocket {
       this.ws.onmessage = (event) => {
         try {
           const message: WebSocketMessage = JSON.parse(event.data);
+          // Answer the server heartbeat, or the connection is dropped as dead
+          if (message.type === 'ping') {
+            this.ws?.send(JSON.stringify({ type: 'pong' }));
+            return;
+          }
           this.handleMessage(message);
         } catch (error) {
           console.error('Failed to parse WebSocket message:', error);
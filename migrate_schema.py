@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Migration script to bring an existing database up to the current models
+(new nullable columns and the meeting-scoped composite indexes)
+"""
+import sys
+sys.path.insert(0, '.')
+
+from backend.database import engine, ensure_columns, ensure_indexes
+
+def migrate_database():
+    """Add missing columns, then every missing model index"""
+    try:
+        for name in ensure_columns(engine):
+            print(f"✓ Added column {name}")
+        created = ensure_indexes(engine)
+        for name in created:
+            print(f"✓ Created index {name}")
+        if not created:
+            print("✓ All indexes already exist")
+        print("\n✓ Database migration completed successfully!")
+    except Exception as e:
+        print(f"✗ Migration error: {e}")
+        raise
+
+if __name__ == "__main__":
+    print("Starting database migration...")
+    migrate_database()